@@ -0,0 +1,581 @@
+"""
+Micro-benchmarks for the retrieval stack. Run `python benchmark.py <name> --help` for options.
+Results are printed as JSON.
+"""
+import os
+import json
+import time
+import argparse
+import tempfile
+import numpy as np
+
+
+def _synthetic_vectors(n: int, dim: int, seed: int = 0, clusters: int = 0) -> np.ndarray:
+    """Random unit-norm float32 vectors, shape (n, dim).
+
+    With `clusters`, vectors are drawn around that many random centers, which is closer to
+    real text embeddings than isotropic noise (and is what ANN indexes are tuned for).
+    """
+    rng = np.random.default_rng(seed)
+    x = rng.standard_normal((n, dim), dtype=np.float32)
+    if clusters:
+        centers = np.random.default_rng(12345).standard_normal((clusters, dim), dtype=np.float32)
+        x = centers[rng.integers(0, clusters, size=n)] * 2.0 + x
+    x /= np.linalg.norm(x, axis=1, keepdims=True)
+    return x
+
+
+def _percentiles(samples_s) -> dict:
+    """p50/p95/p99 of a list of durations in seconds, reported in milliseconds."""
+    ms = np.asarray(samples_s) * 1000.0
+    return {f"p{q}_ms": float(np.percentile(ms, q)) for q in (50, 95, 99)}
+
+
+def bench_batch_search(n: int = 100_000, dim: int = 384, queries: int = 256, k: int = 20) -> dict:
+    """Queries/sec of one-at-a-time `search_faiss`-style lookups vs one batched search."""
+    import faiss
+    from index import FaissIndexManager, write_index_atomic
+
+    base = _synthetic_vectors(n, dim, seed=0)
+    q = _synthetic_vectors(queries, dim, seed=1)
+    index = faiss.IndexIDMap(faiss.IndexFlatIP(dim))
+    index.add_with_ids(base, np.arange(n, dtype=np.int64))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.index")
+        write_index_atomic(index, path)
+        manager = FaissIndexManager(path)
+        manager.search(q[:1], k)  # load outside the timed region
+
+        start = time.perf_counter()
+        single_ids = np.vstack([manager.search(q[i:i + 1], k)[1] for i in range(queries)])
+        single_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        _, batch_ids = manager.search(q, k)
+        batch_s = time.perf_counter() - start
+
+    return {
+        "n": n, "dim": dim, "queries": queries, "k": k,
+        "single_qps": queries / single_s,
+        "batch_qps": queries / batch_s,
+        "speedup": single_s / batch_s,
+        "results_match": bool(np.array_equal(single_ids, batch_ids)),
+    }
+
+
+def bench_index_types(n: int = 100_000, dim: int = 128, queries: int = 500, k: int = 10,
+                      types: str = "flat,ivfflat,hnsw,ivfpq", nprobes: str = "1,8,32",
+                      ef_searches: str = "16,64,256") -> dict:
+    """Recall@k against the exact flat index, per-query p50/p99 latency, build time and
+    serialized size for each index type and query-time setting."""
+    import faiss
+    from index import make_index, train_index, search_params
+
+    base = _synthetic_vectors(n, dim, seed=0, clusters=256)
+    q = _synthetic_vectors(queries, dim, seed=1, clusters=256)
+    ids = np.arange(n, dtype=np.int64)
+
+    results = {"n": n, "dim": dim, "queries": queries, "k": k, "runs": []}
+    truth = None
+    for index_type in types.split(","):
+        start = time.perf_counter()
+        index = make_index(index_type, dim, n=n)
+        train_index(index, base[np.random.default_rng(0).choice(n, size=min(n, 100_000), replace=False)])
+        index.add_with_ids(base, ids)
+        build_s = time.perf_counter() - start
+        size_mb = len(faiss.serialize_index(index)) / 2**20
+
+        if index_type.startswith("ivf"):
+            settings = [{"nprobe": int(v)} for v in nprobes.split(",")]
+        elif index_type == "hnsw":
+            settings = [{"ef_search": int(v)} for v in ef_searches.split(",")]
+        else:
+            settings = [{}]
+        for setting in settings:
+            params = search_params(index, **setting)
+            latencies = []
+            found = np.empty((queries, k), dtype=np.int64)
+            for i in range(queries):
+                t0 = time.perf_counter()
+                found[i] = index.search(q[i:i + 1], k, params=params)[1][0]
+                latencies.append(time.perf_counter() - t0)
+            if index_type == "flat":
+                truth = found
+            recall = None
+            if truth is not None:
+                recall = float(np.mean([len(np.intersect1d(a, b)) / k for a, b in zip(found, truth)]))
+            results["runs"].append({
+                "index_type": index_type, **setting, f"recall@{k}": recall,
+                **_percentiles(latencies), "build_s": build_s, "size_mb": size_mb,
+            })
+    return results
+
+
+def _use_temp_database(directory: str) -> None:
+    """Point DATABASE_URL at a scratch SQLite file. Must run before `database` is imported."""
+    import sys
+    if "database" in sys.modules:
+        raise RuntimeError("database was imported before the benchmark could redirect DATABASE_URL")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+
+
+def _synthetic_postings(n: int, seed: int = 0) -> list[dict]:
+    """Posting rows with realistic-looking structured fields (job ids drawn from job_skills.csv)."""
+    import pandas as pd
+    rng = np.random.default_rng(seed)
+    job_ids = pd.read_csv(os.path.join(os.path.dirname(__file__), "linkedin_data", "jobs", "job_skills.csv"),
+                          usecols=["job_id"], dtype=str)["job_id"].unique()
+    levels = ["Internship", "Entry level", "Associate", "Mid-Senior level", "Director", "Executive", None]
+    cities = ["Princeton, NJ", "Newark, NJ", "Austin, TX", "Denver, CO", "New York, NY", "United States"]
+    words = ["python", "sales", "marketing", "nurse", "sql", "design", "finance", "manager", "engineer", "remote"]
+    # descriptions draw from a Zipf-distributed vocabulary, like real text
+    vocab = np.array(words + [f"term{i}" for i in range(20_000)])
+    zipf = 1.0 / np.arange(1, len(vocab) + 1)
+    zipf /= zipf.sum()
+    return [{
+        "job_id": f"{job_ids[i % len(job_ids)]}" if i < len(job_ids) else f"synthetic-{i}",
+        "title": " ".join(rng.choice(words, size=3)),
+        "description": " ".join(rng.choice(vocab, size=60, p=zipf)),
+        "normalized_salary": float(rng.integers(30_000, 200_000)) if rng.random() < 0.7 else None,
+        "formatted_experience_level": levels[rng.integers(len(levels))],
+        "remote_allowed": "1.0" if rng.random() < 0.3 else None,
+        "location": cities[rng.integers(len(cities))],
+        "work_type": ["FULL_TIME", "PART_TIME", "CONTRACT"][rng.integers(3)],
+    } for i in range(n)]
+
+
+def bench_rerank(k: int = 200, repeats: int = 200, budget_ms: float = 25.0) -> dict:
+    """Latency of phase-2 re-ranking for k candidates, checked against a p99 budget.
+
+    Reports the pure scoring step (`score_candidates`) and the full `phase2_recommend`
+    including the candidate-block database read. The run fails (exit status 1) if the full
+    phase-2 p99 exceeds `budget_ms`.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        _use_temp_database(tmp)
+        import database
+        import recommender
+        from sqlalchemy import insert
+
+        database.init_db()
+        with database.engine.begin() as conn:
+            conn.execute(insert(database.Posting), _synthetic_postings(k))
+        ids = np.arange(1, k + 1, dtype=np.int64)
+        similarity = np.random.default_rng(0).random(k)
+        preferences = {"target_salary": 90_000, "experience_level": "Entry level", "remote": True,
+                       "location": "Princeton, NJ", "skills": ["IT", "SALE", "MRKT"]}
+
+        recommender.phase2_recommend("", ids, similarity, preferences)  # warm caches
+        block = recommender._load_candidate_block(ids)
+        score_only, full = [], []
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            recommender.score_candidates(block, similarity, preferences)
+            score_only.append(time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            recommender.phase2_recommend("", ids, similarity, preferences)
+            full.append(time.perf_counter() - t0)
+        database.engine.dispose()
+
+    full_stats = _percentiles(full)
+    return {
+        "k": k, "repeats": repeats, "budget_ms": budget_ms,
+        "score_candidates": _percentiles(score_only),
+        "phase2_recommend": full_stats,
+        "within_budget": full_stats["p99_ms"] <= budget_ms,
+    }
+
+
+def bench_sqlite_profiles(rows: int = 20_000, batch: int = 500, commits: int = 500, readers: int = 8,
+                          reads: int = 300, profiles: str = "default,performance") -> dict:
+    """Insert throughput and read latency under a concurrent writer, per SQLite engine profile.
+
+    For each profile in `profiles` (see `database.SQLITE_PROFILES`), on a fresh database file:
+    - bulk inserts `rows` postings in transactions of `batch` rows,
+    - inserts `commits` postings in one transaction each (where `synchronous` matters most),
+    - runs `readers` threads doing `reads` lookups of 20 random postings each, while a writer
+      thread keeps committing small updates. Reports read p50/p95/p99, how many writes landed
+      meanwhile, and lock errors.
+    """
+    import threading
+    from sqlalchemy import insert, select, update
+
+    results = {"rows": rows, "batch": batch, "commits": commits, "readers": readers, "reads": reads, "profiles": {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        _use_temp_database(tmp)
+        import database
+        from database import Posting
+
+        postings = _synthetic_postings(rows)
+        for profile in profiles.split(","):
+            engine = database.make_engine(f"sqlite:///{os.path.join(tmp, profile + '.db')}", profile,
+                                          pool_size=readers + 1)
+            database.Base.metadata.create_all(engine)
+
+            start = time.perf_counter()
+            for i in range(0, rows, batch):
+                with engine.begin() as conn:
+                    conn.execute(insert(Posting), postings[i:i + batch])
+            bulk_s = time.perf_counter() - start
+
+            start = time.perf_counter()
+            for i in range(commits):
+                with engine.begin() as conn:
+                    conn.execute(insert(Posting), [dict(postings[i], job_id=f"single-{i}")])
+            commit_s = time.perf_counter() - start
+
+            stop = threading.Event()
+            writes, errors, latencies = [0], [], []
+            lock = threading.Lock()
+
+            def write():
+                rng = np.random.default_rng(1)
+                while not stop.is_set():
+                    try:
+                        with engine.begin() as conn:
+                            conn.execute(update(Posting).where(Posting.id == int(rng.integers(1, rows + 1)))
+                                         .values(views=Posting.views + 1))
+                        writes[0] += 1
+                    except Exception as e:
+                        errors.append(repr(e))
+
+            def read(seed):
+                rng = np.random.default_rng(seed)
+                mine = []
+                for _ in range(reads):
+                    ids = rng.integers(1, rows + 1, size=20).tolist()
+                    t0 = time.perf_counter()
+                    try:
+                        with engine.connect() as conn:
+                            conn.execute(select(Posting.id, Posting.title, Posting.normalized_salary)
+                                         .where(Posting.id.in_(ids))).all()
+                    except Exception as e:
+                        errors.append(repr(e))
+                        continue
+                    mine.append(time.perf_counter() - t0)
+                with lock:
+                    latencies.extend(mine)
+
+            writer = threading.Thread(target=write, daemon=True)
+            threads = [threading.Thread(target=read, args=(seed,)) for seed in range(readers)]
+            writer.start()
+            start = time.perf_counter()
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            read_s = time.perf_counter() - start
+            stop.set()
+            writer.join()
+            engine.dispose()
+
+            results["profiles"][profile] = {
+                "bulk_rows_per_s": rows / bulk_s,
+                "single_commits_per_s": commits / commit_s,
+                "concurrent_reads": {**_percentiles(latencies), "reads_per_s": len(latencies) / read_s},
+                "concurrent_writes_per_s": writes[0] / read_s,
+                "lock_errors": len(errors),
+            }
+    return results
+
+
+def bench_hybrid(n: int = 50_000, dim: int = 128, vocab: int = 50_000, queries: int = 200, query_terms: int = 30,
+                 k: int = 20, budget_ms: float = 50.0) -> dict:
+    """Latency of BM25 search (with and without MaxScore pruning), FAISS search and their
+    reciprocal rank fusion, checked against a p99 budget for the fused query.
+
+    Documents and resume-like queries draw terms from a Zipf-distributed vocabulary, so common
+    terms have the long postings lists that pruning is meant to skip. Also checks that the
+    pruned and exhaustive BM25 searches return the same top k.
+    """
+    import faiss
+    from lexical_index import BM25Index
+    from recommender import reciprocal_rank_fusion
+
+    rng = np.random.default_rng(0)
+    p = 1.0 / np.arange(1, vocab + 1)
+    p /= p.sum()
+    words = np.array([f"term{i}" for i in range(vocab)])
+    lengths = rng.integers(50, 300, size=n)
+    tokens = words[rng.choice(vocab, size=int(lengths.sum()), p=p)].tolist()
+    bounds = np.concatenate([[0], np.cumsum(lengths)])
+    docs = [tokens[bounds[i]:bounds[i + 1]] for i in range(n)]
+    query_docs = [words[rng.choice(vocab, size=query_terms, p=p)].tolist() for _ in range(queries)]
+
+    start = time.perf_counter()
+    lexical = BM25Index()
+    for i in range(0, n, 5000):
+        lexical.add(np.arange(i, min(i + 5000, n)) + 1, docs[i:i + 5000])
+    lexical.merge()
+    build_s = time.perf_counter() - start
+
+    dense = faiss.IndexIDMap(faiss.IndexFlatIP(dim))
+    dense.add_with_ids(_synthetic_vectors(n, dim, seed=0), np.arange(1, n + 1, dtype=np.int64))
+    q = _synthetic_vectors(queries, dim, seed=1)
+
+    pruned, exhaustive, dense_s, fused, matches = [], [], [], [], 0
+    for i, query in enumerate(query_docs):
+        t0 = time.perf_counter()
+        a_scores, a_ids = lexical.search(query, k=k)
+        pruned.append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        b_scores, b_ids = lexical.search(query, k=k, prune=False)
+        exhaustive.append(time.perf_counter() - t0)
+        matches += bool(np.allclose(a_scores, b_scores, rtol=1e-5))
+        t0 = time.perf_counter()
+        _, d_ids = dense.search(q[i:i + 1], k)
+        dense_s.append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        _, d_ids = dense.search(q[i:i + 1], k)
+        _, l_ids = lexical.search(query, k=k)
+        reciprocal_rank_fusion([d_ids[0], l_ids])
+        fused.append(time.perf_counter() - t0)
+
+    fused_stats = _percentiles(fused)
+    return {
+        "n": n, "vocab": vocab, "queries": queries, "query_terms": query_terms, "k": k, "budget_ms": budget_ms,
+        "lexical_build_s": build_s,
+        "bm25_maxscore": _percentiles(pruned),
+        "bm25_exhaustive": _percentiles(exhaustive),
+        "faiss": _percentiles(dense_s),
+        "fused": fused_stats,
+        "maxscore_matches_exhaustive": matches == queries,
+        "within_budget": fused_stats["p99_ms"] <= budget_ms,
+    }
+
+
+def bench_end_to_end(n: int = 10_000, dim: int = 384, queries: int = 200, batch_size: int = 256, k: int = 20,
+                     index_type: str = "flat", auxiliary: bool = True) -> dict:
+    """The whole pipeline on `n` synthetic postings, stage by stage.
+
+    Runs CSV ingest (plus the auxiliary LinkedIn CSVs with `auxiliary`), embedding with a stub
+    embedder that returns random unit vectors, FAISS and BM25 index builds, then `queries`
+    single `recommend` calls and the same resumes through `recommend_many`. Each stage reports
+    its wall time, throughput and the process's peak RSS after it; the `metrics` section has the
+    per-function timings from the `metrics` hooks, as production would emit with METRICS=1.
+    """
+    import sys
+    import zlib
+    import functools
+    import contextlib
+    import pandas as pd
+    import metrics
+
+    def stub_embed(texts):
+        rng = np.random.default_rng(zlib.crc32(texts[0].encode("utf-8")) if texts else 0)
+        vectors = rng.standard_normal((len(texts), dim), dtype=np.float32)
+        return list(vectors / np.linalg.norm(vectors, axis=1, keepdims=True))
+
+    results = {"n": n, "dim": dim, "queries": queries, "batch_size": batch_size, "k": k,
+               "index_type": index_type, "stages": {}}
+
+    def stage(name, fn, items=None):
+        """Run one stage; `items` is the count it processes, or None to use its return value."""
+        start = time.perf_counter()
+        out = fn()
+        seconds = time.perf_counter() - start
+        items = out if items is None else items
+        results["stages"][name] = {"seconds": seconds, "items": items, "items_per_s": items / seconds,
+                                   "peak_rss_mb": metrics.peak_rss_mb()}
+
+    # progress prints go to stderr so stdout stays pure JSON
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(sys.stderr):
+        _use_temp_database(tmp)
+        metrics.set_enabled(True)
+        metrics.reset()
+        import database
+        import index
+        import lexical_index
+        import recommender
+        from embed import posting_text
+        from embedding_store import EmbeddingStore
+
+        csv_path = os.path.join(tmp, "postings.csv")
+        pd.DataFrame(_synthetic_postings(n)).to_csv(csv_path, index=False)
+        database.init_db()
+        stage("ingest", lambda: database.bulk_import_postings_from_csv(csv_path, chunksize=10_000))
+        if auxiliary:
+            stage("ingest_auxiliary", lambda: sum(database.bulk_import_auxiliary_csvs().values()))
+
+        store = EmbeddingStore(os.path.join(tmp, "embeddings"))
+        embed_fn = lambda posts: stub_embed([posting_text(p) for p in posts])
+        stage("embed", lambda: database.embed_all_postings(batch_size=500, store=store, embed_fn=embed_fn))
+
+        index_path = os.path.join(tmp, "faiss.index")
+        lexical_path = os.path.join(tmp, "lexical.npz")
+        stage("faiss_build", lambda: index.init_faiss_index(store=store, path=index_path, index_type=index_type), n)
+        stage("lexical_build", lambda: lexical_index.build_lexical_index(lexical_path), n)
+
+        index.get_index_manager(index_path)
+        recommender.embed_resume = lambda text: stub_embed([text])[0]
+        recommender.embed_resumes = lambda texts, batch_size=32: stub_embed(texts)
+        recommender.search_lexical = functools.partial(lexical_index.search_lexical, path=lexical_path)
+        resumes = [" ".join(p["description"].split()[:40]) for p in _synthetic_postings(queries, seed=1)]
+        preferences = {"target_salary": 90_000, "remote": True, "location": "Austin, TX"}
+
+        recommender.recommend(resumes[0], preferences, k=k)  # load indexes and skill table
+        latencies = []
+        start = time.perf_counter()
+        for resume in resumes:
+            t0 = time.perf_counter()
+            recommender.recommend(resume, preferences, k=k)
+            latencies.append(time.perf_counter() - t0)
+        single_s = time.perf_counter() - start
+        results["single_query"] = {**_percentiles(latencies), "qps": queries / single_s,
+                                   "peak_rss_mb": metrics.peak_rss_mb()}
+
+        start = time.perf_counter()
+        recommender.recommend_many(resumes, k=k, batch_size=batch_size)
+        batch_s = time.perf_counter() - start
+        results["batch_query"] = {"seconds": batch_s, "qps": queries / batch_s, "peak_rss_mb": metrics.peak_rss_mb()}
+
+        results["metrics"] = metrics.snapshot()
+        database.engine.dispose()
+    return results
+
+
+def bench_sharded(n: int = 200_000, dim: int = 128, shards: int = 4, queries: int = 256, k: int = 20,
+                  workers: int | None = None) -> dict:
+    """Sharded vs single-process flat index: build time, query latency, and an exact-match check.
+
+    The embedding store gets `n` vectors under shuffled, gapped posting ids, and then a
+    re-embedded copy of 1% of them (only the latest copy may be indexed). The merged top k
+    from the sharded index must match the unsharded flat index exactly (same ids in the same
+    order and the same scores); the run fails (exit status 1) otherwise.
+    """
+    import faiss
+    from embedding_store import EmbeddingStore
+
+    rng = np.random.default_rng(0)
+    ids = rng.permutation(np.arange(1, 3 * n + 1, dtype=np.int64))[:n]
+    vectors = _synthetic_vectors(n, dim, seed=0, clusters=256)
+    q = _synthetic_vectors(queries, dim, seed=1, clusters=256)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _use_temp_database(tmp)
+        import database
+        import index
+
+        database.init_db()
+        store = EmbeddingStore(os.path.join(tmp, "embeddings"))
+        store.append(ids, vectors)
+        redo = rng.choice(n, size=max(1, n // 100), replace=False)
+        store.append(ids[redo], _synthetic_vectors(len(redo), dim, seed=2, clusters=256))
+
+        single_path = os.path.join(tmp, "single.index")
+        start = time.perf_counter()
+        index.init_faiss_index(store=store, path=single_path, index_type="flat")
+        single_build_s = time.perf_counter() - start
+
+        sharded_path = os.path.join(tmp, "sharded.index")
+        start = time.perf_counter()
+        manifest = index.init_sharded_faiss_index(shards, store=store, path=sharded_path, index_type="flat",
+                                                  workers=workers)
+        sharded_build_s = time.perf_counter() - start
+
+        single = faiss.read_index(single_path)
+        sharded = index.ShardedIndex(sharded_path)
+        expected_scores, expected_ids = single.search(q, k)
+        got_scores, got_ids = sharded.search(q, k)
+
+        single_lat, sharded_lat = [], []
+        for i in range(queries):
+            t0 = time.perf_counter()
+            single.search(q[i:i + 1], k)
+            single_lat.append(time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            sharded.search(q[i:i + 1], k)
+            sharded_lat.append(time.perf_counter() - t0)
+        sharded.close()
+
+    return {
+        "n": n, "dim": dim, "shards": len(manifest["shards"]), "queries": queries, "k": k,
+        "shard_sizes": [shard["count"] for shard in manifest["shards"]],
+        "single_build_s": single_build_s,
+        "sharded_build_s": sharded_build_s,
+        "single_query": _percentiles(single_lat),
+        "sharded_query": _percentiles(sharded_lat),
+        "indexed": int(single.ntotal),
+        "exact_match": bool(np.array_equal(expected_ids, got_ids) and np.array_equal(expected_scores, got_scores)),
+    }
+
+
+BENCHMARKS = {
+    "index-types": bench_index_types,
+    "rerank": bench_rerank,
+    "batch-search": bench_batch_search,
+    "sqlite-profiles": bench_sqlite_profiles,
+    "hybrid": bench_hybrid,
+    "end-to-end": bench_end_to_end,
+    "sharded": bench_sharded,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    p = sub.add_parser("batch-search", help="single vs batched FAISS queries")
+    p.add_argument("--n", type=int, default=100_000)
+    p.add_argument("--dim", type=int, default=384)
+    p.add_argument("--queries", type=int, default=256)
+    p.add_argument("--k", type=int, default=20)
+
+    p = sub.add_parser("index-types", help="recall/latency/memory of flat, IVF, HNSW and IVFPQ indexes")
+    p.add_argument("--n", type=int, default=100_000)
+    p.add_argument("--dim", type=int, default=128)
+    p.add_argument("--queries", type=int, default=500)
+    p.add_argument("--k", type=int, default=10)
+    p.add_argument("--types", default="flat,ivfflat,hnsw,ivfpq", help="comma-separated; put flat first for recall")
+    p.add_argument("--nprobes", default="1,8,32")
+    p.add_argument("--ef-searches", dest="ef_searches", default="16,64,256")
+
+    p = sub.add_parser("rerank", help="phase-2 re-ranking latency against a budget")
+    p.add_argument("--k", type=int, default=200)
+    p.add_argument("--repeats", type=int, default=200)
+    p.add_argument("--budget-ms", dest="budget_ms", type=float, default=25.0)
+
+    p = sub.add_parser("sqlite-profiles", help="insert throughput and concurrent read latency per SQLite profile")
+    p.add_argument("--rows", type=int, default=20_000)
+    p.add_argument("--batch", type=int, default=500)
+    p.add_argument("--commits", type=int, default=500)
+    p.add_argument("--readers", type=int, default=8)
+    p.add_argument("--reads", type=int, default=300)
+    p.add_argument("--profiles", default="default,performance", help="comma-separated names from SQLITE_PROFILES")
+
+    p = sub.add_parser("hybrid", help="BM25 (MaxScore vs exhaustive), FAISS and fused query latency against a budget")
+    p.add_argument("--n", type=int, default=50_000)
+    p.add_argument("--dim", type=int, default=128)
+    p.add_argument("--vocab", type=int, default=50_000)
+    p.add_argument("--queries", type=int, default=200)
+    p.add_argument("--query-terms", dest="query_terms", type=int, default=30)
+    p.add_argument("--k", type=int, default=20)
+    p.add_argument("--budget-ms", dest="budget_ms", type=float, default=50.0)
+
+    p = sub.add_parser("end-to-end", help="ingest, embed, index build and query stages on synthetic postings")
+    p.add_argument("--n", type=int, default=10_000, help="number of synthetic postings (10k-1M)")
+    p.add_argument("--dim", type=int, default=384)
+    p.add_argument("--queries", type=int, default=200)
+    p.add_argument("--batch-size", dest="batch_size", type=int, default=256)
+    p.add_argument("--k", type=int, default=20)
+    p.add_argument("--index-type", dest="index_type", default="flat")
+    p.add_argument("--no-auxiliary", dest="auxiliary", action="store_false", help="skip loading the auxiliary CSVs")
+
+    p = sub.add_parser("sharded", help="sharded vs single flat index; merged results must match exactly")
+    p.add_argument("--n", type=int, default=200_000)
+    p.add_argument("--dim", type=int, default=128)
+    p.add_argument("--shards", type=int, default=4)
+    p.add_argument("--queries", type=int, default=256)
+    p.add_argument("--k", type=int, default=20)
+    p.add_argument("--workers", type=int, default=None)
+
+    args = vars(parser.parse_args())
+    result = BENCHMARKS[args.pop("bench")](**args)
+    print(json.dumps(result, indent=2))
+    if result.get("within_budget") is False or result.get("exact_match") is False:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
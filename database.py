@@ -1,11 +1,18 @@
 import os
-from sqlalchemy import create_engine, Column, Integer, String, ForeignKey, Float, select, Text, UniqueConstraint 
-from sqlalchemy.orm import sessionmaker, relationship, Session, declarative_base
-from sqlalchemy.exc import IntegrityError, SQLAlchemyError
-from embed import embed_posting
+import time
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import create_engine, event, inspect, func, text, Column, Integer, String, ForeignKey, Float, select, update, Text, LargeBinary, Index, cast, or_, make_url
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import sessionmaker, declarative_base
+from embed import embed_postings, get_embedding_cache, EMBEDDING_MODEL_VERSION, EMBEDDING_CACHE_ENABLED
+from embedding_store import EmbeddingStore
+from metrics import timed, incr
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///postings.db")
 FAISS_INDEX_PATH = os.path.join(os.path.dirname(__file__), "faiss_index.index")
+LINKEDIN_DATA_DIR = os.path.join(os.path.dirname(__file__), "linkedin_data")
 
 Base = declarative_base()
 
@@ -48,12 +55,107 @@ class Posting(Base):
     normalized_salary = Column(Float, nullable=True)
     zip_code = Column(String, nullable=True)
     fips = Column(String, nullable=True)
-    embedding = Column(Text, nullable=True)  # Store embedding as string representation of array
+    embedding = Column(LargeBinary, nullable=True)  # raw float32 bytes, see encode_embedding/decode_embedding
+    embedding_dim = Column(Integer, nullable=True)
+    embedding_model = Column(String, nullable=True)
 
     def __repr__(self) -> str:  # pragma: no cover - small helper
         return f"<Posting(id={self.id} job_id={self.job_id} title={self.title})>"
 
 
+class EmbeddingFailure(Base):
+    """A posting whose embedding failed. Postings with `attempts >= max_attempts` are skipped
+    by `embed_all_postings` instead of being retried forever."""
+    __tablename__ = "embedding_failures"
+    posting_id = Column(Integer, ForeignKey("postings.id"), primary_key=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    last_attempt = Column(Float, nullable=True)  # epoch seconds
+
+
+class Skill(Base):
+    """Skill category from mappings/skills.csv (e.g. "IT" -> "Information Technology")."""
+    __tablename__ = "skills"
+    skill_abr = Column(String, primary_key=True)
+    skill_name = Column(String, nullable=True)
+
+
+class Industry(Base):
+    """Industry from mappings/industries.csv."""
+    __tablename__ = "industries"
+    industry_id = Column(Integer, primary_key=True, autoincrement=False)
+    industry_name = Column(String, nullable=True)
+
+
+# The jobs/ and companies/ CSVs cover many more jobs than postings.csv, so their job_id and
+# company_id foreign keys are declared but not enforced (SQLite leaves them off by default).
+
+class JobSkill(Base):
+    """Skill categories of a job, from jobs/job_skills.csv."""
+    __tablename__ = "job_skills"
+    job_id = Column(String, ForeignKey("postings.job_id"), primary_key=True)
+    skill_abr = Column(String, ForeignKey("skills.skill_abr"), primary_key=True)
+    __table_args__ = (Index("ix_job_skills_skill_abr_job_id", "skill_abr", "job_id"),)
+
+
+class JobIndustry(Base):
+    """Industries of a job, from jobs/job_industries.csv."""
+    __tablename__ = "job_industries"
+    job_id = Column(String, ForeignKey("postings.job_id"), primary_key=True)
+    industry_id = Column(Integer, ForeignKey("industries.industry_id"), primary_key=True)
+    __table_args__ = (Index("ix_job_industries_industry_id_job_id", "industry_id", "job_id"),)
+
+
+class Benefit(Base):
+    """Benefits listed for a job, from jobs/benefits.csv. `inferred` is 1 when LinkedIn inferred it."""
+    __tablename__ = "benefits"
+    job_id = Column(String, ForeignKey("postings.job_id"), primary_key=True)
+    type = Column(String, primary_key=True)
+    inferred = Column(Integer, nullable=True)
+
+
+class Salary(Base):
+    """Salary details of a job, from jobs/salaries.csv."""
+    __tablename__ = "salaries"
+    salary_id = Column(Integer, primary_key=True, autoincrement=False)
+    job_id = Column(String, ForeignKey("postings.job_id"), nullable=False, index=True)
+    max_salary = Column(Float, nullable=True)
+    med_salary = Column(Float, nullable=True)
+    min_salary = Column(Float, nullable=True)
+    pay_period = Column(String, nullable=True)
+    currency = Column(String, nullable=True)
+    compensation_type = Column(String, nullable=True)
+
+
+class CompanyIndustry(Base):
+    """Industries of a company, from companies/company_industries.csv (by industry name)."""
+    __tablename__ = "company_industries"
+    company_id = Column(String, primary_key=True)
+    industry = Column(String, primary_key=True)
+    __table_args__ = (Index("ix_company_industries_industry_company_id", "industry", "company_id"),)
+
+
+class EmployeeCount(Base):
+    """Employee/follower count snapshots of a company, from companies/employee_counts.csv."""
+    __tablename__ = "employee_counts"
+    company_id = Column(String, primary_key=True)
+    time_recorded = Column(Integer, primary_key=True, autoincrement=False)  # epoch seconds
+    employee_count = Column(Integer, nullable=True)
+    follower_count = Column(Integer, nullable=True)
+
+
+def encode_embedding(vector) -> bytes:
+    """Serialize an embedding vector to raw float32 bytes for `Posting.embedding`."""
+    import numpy as np
+    return np.ascontiguousarray(vector, dtype=np.float32).reshape(-1).tobytes()
+
+
+def decode_embedding(blob: bytes):
+    """Decode raw float32 bytes into a 1-D array. The array is a read-only view over `blob` (no copy)."""
+    import numpy as np
+    return np.frombuffer(blob, dtype=np.float32)
+
+
 def _parse_float(val):
     try:
         if val is None:
@@ -175,12 +277,292 @@ def import_postings_from_csv(csv_path: str = "linkedin_data/postings.csv", commi
         return inserted
     finally:
         sess.close()
-    
-engine = create_engine(DATABASE_URL)
+
+
+# CSV columns that map 1:1 onto Posting fields (everything except the surrogate key and embedding)
+POSTING_CSV_COLUMNS = [c.name for c in Posting.__table__.columns if c.name not in ("id", "embedding", "embedding_dim", "embedding_model")]
+_FLOAT_COLUMNS = ("max_salary", "med_salary", "min_salary", "normalized_salary")
+_INT_COLUMNS = ("views", "applies")
+
+
+def _prepare_posting_chunk(chunk):
+    """Vectorized equivalent of the per-row mapping in `import_postings_from_csv`.
+
+    Takes a raw (all-string) CSV chunk and returns a list of dicts keyed by Posting column
+    names, ready to be passed to a Core insert as executemany parameters.
+    """
+    import numpy as np
+    import pandas as pd
+
+    # missing CSV columns become all-null columns instead of needing per-row checks; reindex
+    # makes those float NaN columns, so cast back to object for the .str accessors below
+    df = chunk.reindex(columns=POSTING_CSV_COLUMNS).astype(object)
+
+    for col in _FLOAT_COLUMNS + _INT_COLUMNS:
+        df[col] = pd.to_numeric(df[col].str.strip().str.replace(",", "", regex=False), errors="coerce")
+    for col in _INT_COLUMNS:
+        df[col] = np.floor(df[col])
+    # pandas exported company_id as a float ("1234.0"); strip it so it joins the companies tables
+    df["company_id"] = df["company_id"].str.replace(r"\.0$", "", regex=True)
+
+    # normalized salary, computed as in `import_postings_from_csv` (the CSV column is ignored):
+    # prefer med, else average of min/max, else min or max
+    df["normalized_salary"] = (
+        df["med_salary"]
+        .fillna((df["min_salary"] + df["max_salary"]) / 2.0)
+        .fillna(df["min_salary"])
+        .fillna(df["max_salary"])
+    )
+
+    df = df.astype(object).where(df.notna(), None)
+    records = df.to_dict("records")
+    for rec in records:
+        for col in _INT_COLUMNS:
+            if rec[col] is not None:
+                rec[col] = int(rec[col])
+    return records
+
+
+@timed("ingest.postings")
+def bulk_import_postings_from_csv(csv_path: str = "linkedin_data/postings.csv", chunksize: int = 5000, upsert: bool = True):
+    """Bulk import postings from the CSV into the database.
+
+    Faster alternative to `import_postings_from_csv`:
+    - Column mapping, salary parsing and the `normalized_salary` infill run as vectorized
+      pandas operations per chunk instead of per row.
+    - Each chunk is written with a single Core executemany insert inside one transaction.
+    - With `upsert=True` rows whose `job_id` already exists are updated in place, so re-running
+      the import is idempotent. With `upsert=False` they are left untouched.
+
+    Returns the number of rows written.
+    """
+    try:
+        import pandas as pd
+    except Exception as e:
+        raise RuntimeError("pandas is required to import CSV files. Install it in your environment.") from e
+
+    stmt = sqlite_insert(Posting.__table__)
+    if upsert:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Posting.job_id],
+            set_={c: stmt.excluded[c] for c in POSTING_CSV_COLUMNS if c != "job_id"},
+        )
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=[Posting.job_id])
+
+    written = 0
+    start = time.perf_counter()
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize, dtype=str, na_values=["", "NA", "None"]):
+        records = _prepare_posting_chunk(chunk)
+        if not records:
+            continue
+        with engine.begin() as conn:
+            conn.execute(stmt, records)
+        written += len(records)
+
+    incr("ingest.postings.rows", written)
+    elapsed = time.perf_counter() - start
+    rate = written / elapsed if elapsed > 0 else float("inf")
+    print(f"Bulk imported {written} postings in {elapsed:.2f}s ({rate:,.0f} rows/sec)")
+    return written
+
+
+# Auxiliary LinkedIn CSVs, relative to LINKEDIN_DATA_DIR, in load order (mappings first)
+AUXILIARY_CSV_TABLES = [
+    (Skill, os.path.join("mappings", "skills.csv")),
+    (Industry, os.path.join("mappings", "industries.csv")),
+    (JobSkill, os.path.join("jobs", "job_skills.csv")),
+    (JobIndustry, os.path.join("jobs", "job_industries.csv")),
+    (Benefit, os.path.join("jobs", "benefits.csv")),
+    (Salary, os.path.join("jobs", "salaries.csv")),
+    (CompanyIndustry, os.path.join("companies", "company_industries.csv")),
+    (EmployeeCount, os.path.join("companies", "employee_counts.csv")),
+]
+
+
+def _prepare_table_chunk(table, chunk):
+    """Map a raw (all-string) CSV chunk onto `table`'s columns as executemany parameters.
+
+    Numeric columns are parsed with pandas, rows missing a primary key value are dropped and
+    rows repeating a primary key keep the last occurrence.
+    """
+    import pandas as pd
+
+    columns = [c.name for c in table.columns]
+    primary_key = [c.name for c in table.primary_key.columns]
+    # columns missing from the CSV (or all empty in this chunk) come out of reindex/read_csv as
+    # float NaN; object dtype keeps the .str accessors below working on them
+    df = chunk.reindex(columns=columns).astype(object)
+    for col in table.columns:
+        if isinstance(col.type, (Integer, Float)):
+            df[col.name] = pd.to_numeric(df[col.name].str.strip().str.replace(",", "", regex=False), errors="coerce")
+            if isinstance(col.type, Integer):
+                df[col.name] = df[col.name].round().astype("Int64")
+        else:
+            df[col.name] = df[col.name].str.strip()
+    df = df.dropna(subset=primary_key).drop_duplicates(subset=primary_key, keep="last")
+    df = df.astype(object).where(df.notna(), None)
+    return df.to_dict("records")
+
+
+def bulk_import_table_from_csv(model, csv_path: str, chunksize: int = 5000) -> int:
+    """Bulk load one CSV into `model`'s table, chunk by chunk, with one executemany per chunk.
+
+    Rows are upserted on the table's primary key, so re-running the import is idempotent.
+    Returns the number of rows written.
+    """
+    import pandas as pd
+
+    table = model.__table__
+    stmt = sqlite_insert(table)
+    primary_key = [c.name for c in table.primary_key.columns]
+    others = [c.name for c in table.columns if c.name not in primary_key]
+    if others:
+        stmt = stmt.on_conflict_do_update(index_elements=primary_key, set_={c: stmt.excluded[c] for c in others})
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=primary_key)
+
+    written = 0
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize, dtype=str, na_values=["", "NA", "None"]):
+        records = _prepare_table_chunk(table, chunk)
+        if not records:
+            continue
+        with engine.begin() as conn:
+            conn.execute(stmt, records)
+        written += len(records)
+    return written
+
+
+@timed("ingest.auxiliary")
+def bulk_import_auxiliary_csvs(data_dir: str = LINKEDIN_DATA_DIR, chunksize: int = 5000) -> dict:
+    """Load the skills, industries, benefits, salaries and company CSVs into the database.
+
+    Files that don't exist are skipped with a warning. Returns {table name: rows written}.
+    """
+    counts = {}
+    start = time.perf_counter()
+    for model, relpath in AUXILIARY_CSV_TABLES:
+        csv_path = os.path.join(data_dir, relpath)
+        if not os.path.exists(csv_path):
+            print(f"Warning: {csv_path} not found, skipping {model.__tablename__}")
+            continue
+        counts[model.__tablename__] = bulk_import_table_from_csv(model, csv_path, chunksize=chunksize)
+    elapsed = time.perf_counter() - start
+    total = sum(counts.values())
+    incr("ingest.auxiliary.rows", total)
+    rate = total / elapsed if elapsed > 0 else float("inf")
+    print(f"Bulk imported {total} auxiliary rows in {elapsed:.2f}s ({rate:,.0f} rows/sec): {counts}")
+    return counts
+
+
+# SQLite pragmas applied to every new connection, per profile. Select one with DATABASE_PROFILE.
+# - "default" (used unless DATABASE_PROFILE says otherwise): SQLite's own settings (rollback
+#   journal, synchronous=FULL, no mmap).
+# - "performance": WAL, so readers don't block the writer and vice versa, with synchronous=NORMAL
+#   (durable across application crashes; a power loss can drop the last commits), a 64 MB page
+#   cache, 256 MB of mmap and temp tables in memory.
+# - "durable": the same, but synchronous=FULL.
+SQLITE_PROFILES = {
+    "default": {},
+    "performance": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -64000,  # negative = KiB
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "MEMORY",
+    },
+    "durable": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "cache_size": -64000,
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "MEMORY",
+    },
+}
+DATABASE_PROFILE = os.getenv("DATABASE_PROFILE", "default")
+DATABASE_POOL_SIZE = int(os.getenv("DATABASE_POOL_SIZE", "8"))
+DATABASE_BUSY_TIMEOUT = float(os.getenv("DATABASE_BUSY_TIMEOUT", "30"))  # seconds
+
+
+def make_engine(url: str = DATABASE_URL, profile: str = DATABASE_PROFILE, pool_size: int = DATABASE_POOL_SIZE,
+                busy_timeout: float = DATABASE_BUSY_TIMEOUT):
+    """Create an engine for `url`, tuned for concurrent use when it is a SQLite file.
+
+    - The pragmas of `profile` (see SQLITE_PROFILES) are applied whenever the pool opens a
+      connection.
+    - Connections wait up to `busy_timeout` seconds for a lock instead of failing immediately
+      with "database is locked".
+    - Connections are pooled (`pool_size` kept open, as many again on overflow) and may be used
+      by any thread, so sessions created per helper call reuse them instead of reconnecting.
+
+    Other databases get SQLAlchemy's defaults plus `pool_size` and pre-ping.
+    """
+    if not url.startswith("sqlite"):
+        return create_engine(url, pool_size=pool_size, pool_pre_ping=True)
+    if profile not in SQLITE_PROFILES:
+        raise ValueError(f"Unknown database profile {profile!r}; expected one of {sorted(SQLITE_PROFILES)}")
+
+    options = {"connect_args": {"check_same_thread": False, "timeout": busy_timeout}}
+    in_memory = url in ("sqlite://", "sqlite:///:memory:") or "mode=memory" in url
+    if not in_memory:
+        options.update(pool_size=pool_size, max_overflow=pool_size)
+    new_engine = create_engine(url, **options)
+
+    pragmas = SQLITE_PROFILES[profile]
+    if pragmas:
+        @event.listens_for(new_engine, "connect")
+        def _apply_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            try:
+                for name, value in pragmas.items():
+                    cursor.execute(f"PRAGMA {name}={value}")
+            finally:
+                cursor.close()
+
+    return new_engine
+
+
+engine = make_engine()
 Session = sessionmaker(bind=engine)
 
+
+def database_identity(url: str = DATABASE_URL) -> str:
+    """`url` with a SQLite file path made absolute and any password hidden, naming one database."""
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database and parsed.database != ":memory:":
+        parsed = parsed.set(database=os.path.abspath(parsed.database))
+    return parsed.render_as_string(hide_password=True)
+
+def get_embedding_store() -> EmbeddingStore:
+    """The embedding store, tied to this database so a store left by another one is reset."""
+    return EmbeddingStore(database=database_identity())
+
+# Posting columns added after the first release, with their SQL types, for `init_db` to migrate
+_ADDED_POSTING_COLUMNS = {"embedding_dim": "INTEGER", "embedding_model": "VARCHAR"}
+
+def _migrate_postings(conn) -> None:
+    """Bring a postings table created by an older version up to the current schema.
+
+    Older databases lack the embedding metadata columns and store `embedding` as text (e.g.
+    'embedding_placeholder'), which cannot be decoded as float32 bytes. The missing columns are
+    added, and text embeddings are cleared so `embed_all_postings` recomputes them.
+    """
+    existing = {col["name"] for col in inspect(conn).get_columns(Posting.__tablename__)}
+    for name, sql_type in _ADDED_POSTING_COLUMNS.items():
+        if name not in existing:
+            conn.execute(text(f"ALTER TABLE {Posting.__tablename__} ADD COLUMN {name} {sql_type}"))
+    if conn.dialect.name == "sqlite":
+        cleared = conn.execute(
+            update(Posting).where(Posting.embedding.isnot(None), func.typeof(Posting.embedding) != "blob")
+            .values(embedding=None, embedding_dim=None, embedding_model=None)
+        ).rowcount
+        if cleared:
+            print(f"Cleared {cleared} text embeddings from an older schema; run embed_all_postings to recompute them.")
+
 def init_db():
     Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        _migrate_postings(conn)
 
 def add_posting(posting : Posting):
     session = Session()
@@ -204,60 +586,285 @@ def get_all_postings(embedded_only: bool = False):
     finally:
         session.close()
 
-def embed_all_postings(batch_size: int = 100, commit_every: int = 50):
-    """Compute and store embeddings for all postings that don't have them.
-    
-    Args:
-        batch_size: How many posts to load at once (memory efficiency).
-        commit_every: How often to commit changes to the database.
-    """
+def _iter_unembedded_postings(batch_size: int, max_attempts: int):
+    """Yield batches of detached Postings that still need an embedding, using keyset
+    pagination on id so each row is visited once per run (even if it fails again)."""
+    failed_too_often = select(EmbeddingFailure.posting_id).where(EmbeddingFailure.attempts >= max_attempts)
+    last_id = 0
     session = Session()
     try:
-        # Process posts that don't have embeddings yet
-        processed = 0
         while True:
-            # Get a batch of posts without embeddings
             posts = (
                 session.query(Posting)
-                .filter(Posting.embedding.is_(None))
+                .filter(Posting.embedding.is_(None), Posting.id > last_id, Posting.id.not_in(failed_too_often))
+                .order_by(Posting.id)
                 .limit(batch_size)
                 .all()
             )
             if not posts:
-                break  # No more posts to process
+                return
+            session.expunge_all()
+            last_id = posts[-1].id
+            yield posts
+    finally:
+        session.close()
 
-            for i, posting in enumerate(posts, 1):
-                try:
-                    # Get embedding as a string
-                    embedding = embed_posting(posting)
-                    if embedding is not None:
-                        # Store as string representation
-                        posting.embedding = embedding
-                        processed += 1
-                        
-                        # Commit periodically
-                        if processed % commit_every == 0:
-                            try:
-                                session.commit()
-                                print(f"Processed {processed} embeddings...")
-                            except Exception as e:
-                                print(f"Warning: commit failed at {processed}: {e}")
-                                session.rollback()
-                except Exception as e:
-                    print(f"Warning: embedding failed for posting {posting.id}: {e}")
-                    continue
+@timed("embed.batch")
+def _embed_batch(posts, embed_fn):
+    """Embed one batch. Returns (successes, failures): [(id, float32 vector)], [(id, error)].
+
+    If the batched call raises, rows are retried one by one so a single bad row doesn't fail
+    the whole batch.
+    """
+    import numpy as np
 
-            # Commit any remaining in this batch
+    try:
+        results = list(embed_fn(posts))
+        if len(results) != len(posts):
+            raise ValueError(f"embedder returned {len(results)} vectors for {len(posts)} postings")
+    except Exception:
+        results = []
+        for post in posts:
             try:
-                session.commit()
+                results.append(embed_fn([post])[0])
             except Exception as e:
-                print(f"Warning: final commit failed: {e}")
-                session.rollback()
+                results.append(e)
+
+    successes, failures = [], []
+    for post, result in zip(posts, results):
+        if isinstance(result, Exception):
+            failures.append((post.id, repr(result)))
+            continue
+        if result is None:
+            failures.append((post.id, "embedder returned None"))
+            continue
+        try:
+            successes.append((post.id, np.asarray(result, dtype=np.float32).reshape(-1)))
+        except (TypeError, ValueError) as e:
+            failures.append((post.id, repr(e)))
+    incr("embed.rows", len(successes))
+    incr("embed.failures", len(failures))
+    return successes, failures
 
-        print(f"Finished! Processed {processed} embeddings total.")
-        return processed
+@timed("embed.write")
+def _write_embedding_batch(session, successes, failures) -> None:
+    """Bulk-update embeddings and record failures in one transaction."""
+    if successes:
+        session.execute(update(Posting), [
+            {"id": pid, "embedding": encode_embedding(vec), "embedding_dim": len(vec),
+             "embedding_model": EMBEDDING_MODEL_VERSION}
+            for pid, vec in successes
+        ])
+        session.execute(EmbeddingFailure.__table__.delete().where(
+            EmbeddingFailure.posting_id.in_([pid for pid, _ in successes])))
+    if failures:
+        now = time.time()
+        stmt = sqlite_insert(EmbeddingFailure.__table__)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[EmbeddingFailure.posting_id],
+            set_={"attempts": EmbeddingFailure.attempts + 1, "error": stmt.excluded.error,
+                  "last_attempt": stmt.excluded.last_attempt},
+        )
+        session.execute(stmt, [{"posting_id": pid, "attempts": 1, "error": err, "last_attempt": now}
+                               for pid, err in failures])
+    session.commit()
+
+@timed("embed.all")
+def embed_all_postings(batch_size: int = 100, workers: int = 4, queue_size: int = 8, max_attempts: int = 3,
+                       store: EmbeddingStore | None = None, embed_fn=None, log_every: float = 10.0):
+    """Compute and store embeddings for all postings that don't have them.
+
+    Runs as a three-stage pipeline:
+    - a producer streams un-embedded postings in keyset-paginated batches of `batch_size`,
+    - `workers` threads embed whole batches with `embed_fn` (default `embed.embed_postings`).
+      Use several workers for remote embedding APIs, and a single worker for a local model
+      that already batches on the device,
+    - a single writer (the calling thread) appends each finished batch to the embedding store,
+      then bulk-updates the database and records failures in `embedding_failures`.
+
+    Both queues hold at most `queue_size` batches, so a slow writer or embedder applies
+    backpressure instead of buffering the table in memory. Postings that failed `max_attempts`
+    times are skipped. Progress and throughput are printed every `log_every` seconds.
+
+    Vectors go to the store before their rows are committed: if the run dies in between, the
+    postings are still un-embedded in the database and get re-embedded (and appended again,
+    superseding the earlier row) next time, instead of being marked embedded but missing from
+    the store. If the writer raises, the producer and workers are stopped, the queues drained
+    and the error re-raised.
+
+    Args:
+        store: Embedding store that vectors are appended to (defaults to the one next to the
+            database). Pass `False` to skip it.
+
+    Returns:
+        The number of postings embedded.
+    """
+    if store is None:
+        store = get_embedding_store()
+    if embed_fn is None:
+        embed_fn = embed_postings
+
+    work = queue.Queue(maxsize=queue_size)
+    results = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    errors = []
+    _done = object()
+
+    def put(q, item) -> bool:
+        """Block until `item` is queued or the pipeline is stopped. Returns False if stopped."""
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for posts in _iter_unembedded_postings(batch_size, max_attempts):
+                if not put(work, posts):
+                    return
+        except Exception as e:
+            errors.append(e)
+        finally:
+            for _ in range(workers):
+                put(work, _done)
+
+    def consume():
+        while not stop.is_set():
+            try:
+                posts = work.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if posts is _done:
+                put(results, _done)
+                return
+            try:
+                item = _embed_batch(posts, embed_fn)
+            except Exception as e:
+                item = ([], [(post.id, repr(e)) for post in posts])
+            put(results, item)
+
+    def drain(q):
+        while True:
+            try:
+                q.get_nowait()
+            except queue.Empty:
+                return
+
+    processed = failed = 0
+    start = last_log = time.perf_counter()
+    producer = threading.Thread(target=produce, name="embed-producer", daemon=True)
+    producer.start()
+    session = Session()
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="embed-worker") as pool:
+            for _ in range(workers):
+                pool.submit(consume)
+            try:
+                finished = 0
+                while finished < workers:
+                    item = results.get()
+                    if item is _done:
+                        finished += 1
+                        continue
+                    successes, failures = item
+                    if store and successes:
+                        store.append([pid for pid, _ in successes], [vec for _, vec in successes],
+                                     model=EMBEDDING_MODEL_VERSION)
+                    try:
+                        _write_embedding_batch(session, successes, failures)
+                    except Exception as e:
+                        print(f"Warning: failed to write embedding batch: {e}")
+                        session.rollback()
+                        continue
+                    processed += len(successes)
+                    failed += len(failures)
+                    now = time.perf_counter()
+                    if now - last_log >= log_every:
+                        last_log = now
+                        print(f"Processed {processed} embeddings ({failed} failed, "
+                              f"{processed / (now - start):,.1f}/sec)...")
+            except BaseException:
+                # unblock the producer and workers so the pool and producer can be joined
+                stop.set()
+                drain(work)
+                drain(results)
+                raise
     finally:
         session.close()
+        producer.join()
+    if errors:
+        raise errors[0]
+
+    elapsed = time.perf_counter() - start
+    rate = processed / elapsed if elapsed > 0 else 0.0
+    print(f"Finished! Processed {processed} embeddings total ({failed} failed) in {elapsed:.1f}s ({rate:,.1f}/sec).")
+    if embed_fn is embed_postings and EMBEDDING_CACHE_ENABLED:
+        print(f"Embedding cache: {get_embedding_cache().stats()}")
+    return processed
+
+def load_embedding_matrix(min_id: int | None = None):
+    """Load every stored embedding as one contiguous matrix.
+
+    Reads only the id/dimension/embedding columns in a single query and decodes all blobs at
+    once with `np.frombuffer`, instead of hydrating Posting objects and parsing each vector.
+    With `min_id`, only postings with `id > min_id` are loaded.
+
+    Returns:
+        (ids, embeddings): int64 array of shape (N,) and writable float32 array of shape (N, d).
+    """
+    import numpy as np
+
+    query = select(Posting.id, Posting.embedding_dim, Posting.embedding).where(Posting.embedding.isnot(None))
+    if min_id is not None:
+        query = query.where(Posting.id > min_id)
+    with engine.connect() as conn:
+        rows = conn.execute(query.order_by(Posting.id)).all()
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=np.float32)
+
+    dims = {dim or len(blob) // 4 for _, dim, blob in rows}
+    if len(dims) != 1:
+        raise ValueError(f"Stored embeddings have mixed dimensions: {sorted(dims)}")
+    dim = dims.pop()
+
+    ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+    # bytearray.join makes a single writable copy, so callers can normalize in place
+    buf = bytearray().join(r[2] for r in rows)
+    embeddings = np.frombuffer(buf, dtype=np.float32).reshape(len(rows), dim)
+    return ids, embeddings
+
+def rebuild_embedding_store(store: EmbeddingStore | None = None) -> int:
+    """Rewrite the embedding store from the embeddings saved in the database.
+
+    Useful after restoring a database or when the store and database have drifted apart.
+    Returns the number of vectors written.
+    """
+    if store is None:
+        store = get_embedding_store()
+    ids, embeddings = load_embedding_matrix()
+    store.reset()
+    store.append(ids, embeddings, model=EMBEDDING_MODEL_VERSION)
+    return len(ids)
+
+def get_inactive_posting_ids(now_ms: float | None = None):
+    """Ids of postings that are closed (`closed_time` set) or past their `expiry`.
+
+    `closed_time`/`expiry` hold epoch milliseconds as text; `now_ms` defaults to the current time.
+    """
+    import numpy as np
+
+    if now_ms is None:
+        now_ms = time.time() * 1000.0
+    query = select(Posting.id).where(or_(
+        Posting.closed_time.isnot(None),
+        cast(Posting.expiry, Float) < now_ms,
+    ))
+    with engine.connect() as conn:
+        ids = conn.execute(query).scalars().all()
+    return np.asarray(ids, dtype=np.int64)
 
 def get_posting_by_id(posting_id: int):
     session = Session()
@@ -268,9 +875,148 @@ def get_posting_by_id(posting_id: int):
         session.close()
 
 def get_postings_by_ids(posting_ids: list[int]):
+    """Postings for `posting_ids`, in the order given (ids that don't exist are skipped)."""
     session = Session()
     try:
-        postings = session.query(Posting).filter(Posting.id.in_(posting_ids)).all()
-        return postings
+        found = {}
+        for part in _chunks(dict.fromkeys(posting_ids)):
+            for posting in session.query(Posting).filter(Posting.id.in_(part)):
+                found[posting.id] = posting
+        return [found[pid] for pid in posting_ids if pid in found]
     finally:
         session.close()
+
+# Columns worth reading by default: everything except the long text and the embedding blob
+LIGHT_POSTING_COLUMNS = tuple(
+    c.name for c in Posting.__table__.columns
+    if c.name not in ("description", "skills_desc", "embedding")
+)
+POSTING_OUTPUTS = ("tuples", "dicts", "frame", "arrow")
+
+def _projection(columns):
+    """Posting columns to select for `columns` (names or Columns); `id` always comes first."""
+    names = [c if isinstance(c, str) else c.key for c in (columns or LIGHT_POSTING_COLUMNS)]
+    unknown = [n for n in names if n not in Posting.__table__.columns]
+    if unknown:
+        raise ValueError(f"Unknown Posting columns: {unknown}")
+    return [Posting.__table__.columns[n] for n in dict.fromkeys(["id"] + names)]
+
+def _format_rows(rows, projection, output: str):
+    """Rows of a projected select as tuples (SQLAlchemy Rows), dicts, a pandas frame indexed
+    by id, or a pyarrow Table."""
+    if output == "tuples":
+        return rows
+    if output == "dicts":
+        return [row._asdict() for row in rows]
+    if output in ("frame", "arrow"):
+        try:
+            import pandas as pd
+        except Exception as e:
+            raise RuntimeError("pandas is required for frame output. Install it in your environment.") from e
+        frame = pd.DataFrame.from_records(rows, columns=[c.key for c in projection])
+        if output == "frame":
+            return frame.set_index("id")
+        try:
+            import pyarrow as pa
+        except Exception as e:
+            raise RuntimeError("pyarrow is required for arrow output. Install it in your environment.") from e
+        return pa.Table.from_pandas(frame, preserve_index=False)
+    raise ValueError(f"Unknown output {output!r}; expected one of {POSTING_OUTPUTS}")
+
+@timed("db.fetch_postings")
+def fetch_postings(posting_ids, columns=None, output: str = "tuples"):
+    """Read selected columns of the postings in `posting_ids`, without building ORM objects.
+
+    Args:
+        posting_ids: Posting ids, e.g. FAISS results. The result follows this order (so rank
+            order is kept); ids that don't exist are skipped. Large lists are queried
+            IN_CHUNK_SIZE ids at a time.
+        columns: Posting column names to read (`id` is always included first). Defaults to
+            LIGHT_POSTING_COLUMNS, which leaves out description, skills_desc and embedding.
+        output: "tuples" (SQLAlchemy Rows, which also allow `row.title`), "dicts", "frame"
+            (pandas DataFrame indexed by id) or "arrow" (pyarrow Table).
+    """
+    projection = _projection(columns)
+    posting_ids = [int(pid) for pid in posting_ids]
+    found = {}
+    with engine.connect() as conn:
+        for part in _chunks(dict.fromkeys(posting_ids)):
+            for row in conn.execute(select(*projection).where(Posting.id.in_(part))):
+                found[row[0]] = row
+    rows = [found[pid] for pid in posting_ids if pid in found]
+    return _format_rows(rows, projection, output)
+
+def iter_postings(columns=None, batch_size: int = 1000, output: str = "tuples", where=None, min_id: int = 0):
+    """Stream postings in id order, `batch_size` rows at a time, in constant memory.
+
+    Uses keyset pagination (`id > last id seen ORDER BY id LIMIT batch_size`), so every batch
+    is an index range scan no matter how deep into the table it is, unlike OFFSET paging.
+    `columns` and `output` are as in `fetch_postings`; each yielded batch is one such result.
+    `where` is an optional extra SQLAlchemy condition, e.g. `Posting.embedding.is_(None)`.
+    """
+    projection = _projection(columns)
+    last_id = min_id
+    while True:
+        query = select(*projection).where(Posting.id > last_id)
+        if where is not None:
+            query = query.where(where)
+        with engine.connect() as conn:
+            rows = conn.execute(query.order_by(Posting.id).limit(batch_size)).all()
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        yield _format_rows(rows, projection, output)
+
+# Max bound parameters per IN (...) list; SQLite builds before 3.32 allow only 999 in total
+IN_CHUNK_SIZE = 900
+
+def _chunks(values, size: int = IN_CHUNK_SIZE):
+    values = list(values)
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+def _fetch_grouped(key_column, columns, keys) -> dict:
+    """Rows of `columns` whose `key_column` is in `keys`, grouped as {key: [row, ...]}.
+
+    One query per IN_CHUNK_SIZE keys instead of one per key. Keys without rows are absent.
+    """
+    grouped = {}
+    keys = list(dict.fromkeys(str(k) for k in keys if k is not None))
+    if not keys:
+        return grouped
+    with engine.connect() as conn:
+        for part in _chunks(keys):
+            query = select(key_column, *columns).where(key_column.in_(part)).order_by(key_column)
+            for row in conn.execute(query):
+                grouped.setdefault(row[0], []).append(tuple(row[1:]) if len(columns) > 1 else row[1])
+    return grouped
+
+def get_skills_for_jobs(job_ids) -> dict:
+    """{job_id: [skill_abr, ...]} for a batch of job ids."""
+    return _fetch_grouped(JobSkill.job_id, [JobSkill.skill_abr], job_ids)
+
+def get_industries_for_jobs(job_ids) -> dict:
+    """{job_id: [industry_id, ...]} for a batch of job ids."""
+    return _fetch_grouped(JobIndustry.job_id, [JobIndustry.industry_id], job_ids)
+
+def get_benefits_for_jobs(job_ids) -> dict:
+    """{job_id: [benefit type, ...]} for a batch of job ids."""
+    return _fetch_grouped(Benefit.job_id, [Benefit.type], job_ids)
+
+def get_salaries_for_jobs(job_ids) -> dict:
+    """{job_id: [(min_salary, med_salary, max_salary, pay_period, currency, compensation_type), ...]}."""
+    return _fetch_grouped(Salary.job_id, [
+        Salary.min_salary, Salary.med_salary, Salary.max_salary,
+        Salary.pay_period, Salary.currency, Salary.compensation_type,
+    ], job_ids)
+
+def get_industries_for_companies(company_ids) -> dict:
+    """{company_id: [industry name, ...]} for a batch of company ids."""
+    return _fetch_grouped(CompanyIndustry.company_id, [CompanyIndustry.industry], company_ids)
+
+def get_employee_counts(company_ids) -> dict:
+    """{company_id: (employee_count, follower_count, time_recorded)}, the latest snapshot per company."""
+    snapshots = _fetch_grouped(EmployeeCount.company_id, [
+        EmployeeCount.employee_count, EmployeeCount.follower_count, EmployeeCount.time_recorded,
+    ], company_ids)
+    return {company_id: max(rows, key=lambda r: r[2]) for company_id, rows in snapshots.items()}
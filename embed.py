@@ -1,5 +1,61 @@
-def embed_posting(posting) -> str:
-    return "embedding_placeholder"
+import os
+from embedding_cache import EmbeddingCache, cache_key
 
-def embed_resume(resume: str) -> str:
-    return "embedding_placeholder"
\ No newline at end of file
+# Bumped whenever the embedding model changes, so stored vectors can be told apart
+EMBEDDING_MODEL_VERSION = "placeholder-v0"
+# Set EMBEDDING_CACHE=0 to always call the model
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE", "1") != "0"
+
+_cache = None
+
+def get_embedding_cache() -> EmbeddingCache:
+    """The process-wide embedding cache, opened on first use."""
+    global _cache
+    if _cache is None:
+        _cache = EmbeddingCache()
+    return _cache
+
+def posting_text(posting) -> str:
+    """The text of a posting that gets embedded."""
+    parts = (posting.title, posting.description, posting.skills_desc)
+    return "\n".join(p for p in parts if p)
+
+def _embed_texts(texts: list[str]) -> list:
+    """The embedding model: one embedding per text, in order. A local model should run the
+    whole list through one forward pass."""
+    return ["embedding_placeholder" for _ in texts]
+
+def _cached_embed_texts(texts: list[str]) -> list:
+    """`_embed_texts` behind the content-hash cache. Only texts that are not cached are sent to
+    the model, and duplicate texts within the call are embedded once."""
+    if not EMBEDDING_CACHE_ENABLED:
+        return _embed_texts(texts)
+    cache = get_embedding_cache()
+    keys = [cache_key(t, EMBEDDING_MODEL_VERSION) for t in texts]
+    found = cache.get_many(keys)
+    todo = {}
+    for key, text in zip(keys, texts):
+        if key not in found and key not in todo:
+            todo[key] = text
+    if todo:
+        computed = dict(zip(todo, _embed_texts(list(todo.values()))))
+        cache.put_many(computed)
+        found.update(computed)
+    return [found[key] for key in keys]
+
+def embed_posting(posting):
+    return _cached_embed_texts([posting_text(posting)])[0]
+
+def embed_postings(postings: list) -> list:
+    """Embed a batch of postings, one result per posting in order."""
+    return _cached_embed_texts([posting_text(p) for p in postings])
+
+def embed_resume(resume: str):
+    return _cached_embed_texts([resume])[0]
+
+def embed_resumes(resumes: list[str], batch_size: int = 32) -> list:
+    """Embed many resumes, sending the model `batch_size` texts at a time."""
+    embeddings = []
+    for i in range(0, len(resumes), batch_size):
+        embeddings.extend(_cached_embed_texts(resumes[i:i + batch_size]))
+    return embeddings
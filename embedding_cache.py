@@ -0,0 +1,186 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+import numpy as np
+
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", os.path.join(os.path.dirname(__file__), "embedding_cache.db"))
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form of embedding input: NFKC, whitespace runs collapsed, ends stripped."""
+    return " ".join(unicodedata.normalize("NFKC", text or "").split())
+
+
+def cache_key(text: str, model_version: str) -> str:
+    """Content hash of the normalized text, scoped to the embedding model version."""
+    h = hashlib.sha256()
+    h.update(model_version.encode("utf-8"))
+    h.update(b"\0")
+    h.update(normalize_text(text).encode("utf-8"))
+    return h.hexdigest()
+
+
+class EmbeddingCache:
+    """Content-addressed embedding cache: an in-memory LRU in front of a SQLite table.
+
+    - Keys come from `cache_key`, so identical text (e.g. reposted jobs under new job_ids)
+      embeds once per model version.
+    - Vectors are stored as raw float32 bytes. Only numeric vectors are cached; anything that
+      doesn't convert to float32 is passed through uncached.
+    - The SQLite file is capped at `max_bytes` of vector data; the least recently used entries
+      are evicted first. `memory_items` bounds the in-memory front; hits served from it are
+      written back to `last_used` in batches (on the next SQLite lookup, `put` or `flush`).
+    - `stats()` reports hits, misses and the hit rate.
+
+    Safe to share between threads.
+    """
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, memory_items: int = 10_000, max_bytes: int = 1 << 30):
+        self.path = path
+        self.memory_items = memory_items
+        self.max_bytes = max_bytes
+        self._memory = OrderedDict()
+        self._touched = {}  # key -> last use, for memory hits not yet written to SQLite
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.memory_hits = 0
+        self.misses = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY, vector BLOB NOT NULL, nbytes INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+        self._disk_bytes = self._conn.execute("SELECT COALESCE(SUM(nbytes), 0) FROM embeddings").fetchone()[0]
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def get_many(self, keys) -> dict:
+        """Look up several keys at once. Returns {key: vector} for the keys that were found."""
+        found = {}
+        with self._lock:
+            missing = []
+            for key in dict.fromkeys(keys):
+                vec = self._memory.get(key)
+                if vec is None:
+                    missing.append(key)
+                else:
+                    self._memory.move_to_end(key)
+                    self._touched[key] = time.time()
+                    found[key] = vec
+                    self.memory_hits += 1
+            if missing:
+                self._flush_touched()
+                now = time.time()
+                for i in range(0, len(missing), 500):
+                    part = missing[i:i + 500]
+                    rows = self._conn.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(part))})", part
+                    ).fetchall()
+                    for key, blob in rows:
+                        vec = np.frombuffer(blob, dtype=np.float32)
+                        found[key] = vec
+                        self._remember(key, vec)
+                    if rows:
+                        self._conn.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?",
+                                               [(now, key) for key, _ in rows])
+                self._conn.commit()
+            self.hits += len(found)
+            self.misses += len(dict.fromkeys(keys)) - len(found)
+        return found
+
+    def get(self, key: str):
+        return self.get_many([key]).get(key)
+
+    def put_many(self, items) -> None:
+        """Store {key: vector} pairs (an iterable of pairs also works)."""
+        rows = []
+        now = time.time()
+        with self._lock:
+            for key, vector in (items.items() if isinstance(items, dict) else items):
+                try:
+                    vec = np.ascontiguousarray(vector, dtype=np.float32).reshape(-1)
+                except (TypeError, ValueError):
+                    continue
+                self._remember(key, vec)
+                blob = vec.tobytes()
+                rows.append((key, blob, len(blob), now))
+            if not rows:
+                return
+            self._flush_touched()
+            for key, _, _, _ in rows:
+                old = self._conn.execute("SELECT nbytes FROM embeddings WHERE key = ?", (key,)).fetchone()
+                if old:
+                    self._disk_bytes -= old[0]
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings (key, vector, nbytes, last_used) VALUES (?, ?, ?, ?)", rows)
+            self._disk_bytes += sum(r[2] for r in rows)
+            if self._disk_bytes > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def put(self, key: str, vector) -> None:
+        self.put_many([(key, vector)])
+
+    def _flush_touched(self) -> None:
+        """Write the last use of memory hits to SQLite so eviction sees them (caller commits)."""
+        if self._touched:
+            self._conn.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?",
+                                   [(used, key) for key, used in self._touched.items()])
+            self._touched.clear()
+
+    def flush(self) -> None:
+        """Persist pending `last_used` updates."""
+        with self._lock:
+            self._flush_touched()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """Drop least recently used entries until the table is at 90% of `max_bytes`."""
+        target = int(self.max_bytes * 0.9)
+        while self._disk_bytes > target:
+            victims = self._conn.execute(
+                "SELECT key, nbytes FROM embeddings ORDER BY last_used LIMIT 1000"
+            ).fetchall()
+            if not victims:
+                self._disk_bytes = 0
+                return
+            freed = 0
+            evicted = []
+            for key, nbytes in victims:
+                evicted.append((key,))
+                freed += nbytes
+                self._memory.pop(key, None)
+                if self._disk_bytes - freed <= target:
+                    break
+            self._conn.executemany("DELETE FROM embeddings WHERE key = ?", evicted)
+            self._disk_bytes -= freed
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "memory_hits": self.memory_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "memory_items": len(self._memory),
+            "disk_bytes": self._disk_bytes,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush_touched()
+            self._conn.commit()
+            self._conn.close()
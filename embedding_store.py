@@ -0,0 +1,180 @@
+import os
+import json
+import threading
+import numpy as np
+
+EMBEDDING_STORE_PATH = os.path.join(os.path.dirname(__file__), "embeddings")
+
+
+class EmbeddingStore:
+    """Append-only on-disk store of posting embeddings, read back with `np.memmap`.
+
+    Layout (all files share the `path` prefix):
+    - `<path>.f32`: raw float32 matrix of shape (count, dim), row-major.
+    - `<path>.ids`: raw int64 array of posting ids, parallel to the matrix rows.
+    - `<path>.meta.json`: {"dim", "count", "model", "database"}. `count` is only advanced after
+      the data files are flushed, so readers never see a partially written row.
+
+    A posting that is re-embedded is simply appended again; `latest_positions` resolves each id
+    to its most recent row.
+
+    Rows are keyed by posting id, which only means something within one database. Pass that
+    database's identity as `database`: it is recorded on append, and a store recorded for a
+    different database is reset when opened.
+    """
+
+    def __init__(self, path: str = EMBEDDING_STORE_PATH, database: str | None = None):
+        self.path = path
+        self.vectors_path = path + ".f32"
+        self.ids_path = path + ".ids"
+        self.meta_path = path + ".meta.json"
+        self.database = database
+        self._lock = threading.Lock()
+        if database is not None:
+            recorded = self._read_meta().get("database")
+            if recorded not in (None, database):
+                print(f"    Warning: embedding store {path} was built for {recorded}, not {database}; resetting it")
+                self.reset()
+
+    def _read_meta(self) -> dict:
+        if not os.path.exists(self.meta_path):
+            return {"dim": None, "count": 0, "model": None}
+        with open(self.meta_path, "r", encoding="utf-8") as fh:
+            return json.load(fh)
+
+    def _write_meta(self, meta: dict) -> None:
+        tmp = self.meta_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(meta, fh)
+        os.replace(tmp, self.meta_path)
+
+    @property
+    def count(self) -> int:
+        return self._read_meta()["count"]
+
+    @property
+    def dim(self):
+        return self._read_meta()["dim"]
+
+    @property
+    def model(self):
+        return self._read_meta()["model"]
+
+    def append(self, ids, vectors, model: str | None = None) -> int:
+        """Append rows to the store. Returns the new row count."""
+        ids = np.ascontiguousarray(ids, dtype=np.int64).reshape(-1)
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors.reshape(1, -1)
+        if len(ids) != vectors.shape[0]:
+            raise ValueError(f"Got {len(ids)} ids for {vectors.shape[0]} vectors")
+        if len(ids) == 0:
+            return self.count
+
+        with self._lock:
+            meta = self._read_meta()
+            if meta["dim"] is None:
+                meta["dim"] = int(vectors.shape[1])
+            elif meta["dim"] != vectors.shape[1]:
+                raise ValueError(f"Store has dim {meta['dim']}, got vectors of dim {vectors.shape[1]}")
+            if model is not None:
+                meta["model"] = model
+            if self.database is not None:
+                meta["database"] = self.database
+
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # truncate any bytes past `count` left behind by an interrupted append
+            for fpath, itemsize in ((self.vectors_path, 4 * meta["dim"]), (self.ids_path, 8)):
+                with open(fpath, "ab") as fh:
+                    if fh.tell() != meta["count"] * itemsize:
+                        fh.truncate(meta["count"] * itemsize)
+            with open(self.vectors_path, "ab") as fh:
+                fh.write(vectors.tobytes())
+                fh.flush()
+                os.fsync(fh.fileno())
+            with open(self.ids_path, "ab") as fh:
+                fh.write(ids.tobytes())
+                fh.flush()
+                os.fsync(fh.fileno())
+
+            meta["count"] += len(ids)
+            self._write_meta(meta)
+            return meta["count"]
+
+    def reset(self) -> None:
+        """Delete all stored embeddings."""
+        with self._lock:
+            for fpath in (self.vectors_path, self.ids_path, self.meta_path):
+                if os.path.exists(fpath):
+                    os.remove(fpath)
+
+    def open(self):
+        """Memory-map the store.
+
+        Returns:
+            (ids, vectors): read-only memmaps of shape (count,) and (count, dim). Nothing is
+            read from disk until the arrays are accessed.
+        """
+        meta = self._read_meta()
+        count, dim = meta["count"], meta["dim"]
+        if count == 0:
+            return np.empty(0, dtype=np.int64), np.empty((0, dim or 0), dtype=np.float32)
+        ids = np.memmap(self.ids_path, dtype=np.int64, mode="r", shape=(count,))
+        vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(count, dim))
+        return ids, vectors
+
+    def latest_positions(self, ids=None):
+        """Row positions of the most recent embedding for each distinct posting id, in row order."""
+        if ids is None:
+            ids, _ = self.open()
+        if len(ids) == 0:
+            return np.empty(0, dtype=np.int64)
+        _, last_from_end = np.unique(ids[::-1], return_index=True)
+        return np.sort(len(ids) - 1 - last_from_end)
+
+    def iter_blocks(self, block_size: int = 65536, start: int = 0, dedupe: bool = True):
+        """Yield (ids, vectors) blocks of at most `block_size` rows, paging them in from disk.
+
+        Yielded arrays are in-memory copies, so they are writable (e.g. for `faiss.normalize_L2`).
+        With `dedupe`, only the latest row for each posting id is yielded.
+        """
+        ids, vectors = self.open()
+        if dedupe:
+            positions = self.latest_positions(ids)
+            positions = positions[positions >= start]
+            for i in range(0, len(positions), block_size):
+                pos = positions[i:i + block_size]
+                yield np.asarray(ids[pos]), np.asarray(vectors[pos])
+        else:
+            for i in range(start, len(ids), block_size):
+                yield np.array(ids[i:i + block_size]), np.array(vectors[i:i + block_size])
+
+    def sample(self, n: int, seed: int = 0):
+        """Up to `n` distinct posting vectors chosen uniformly at random (e.g. for index training)."""
+        ids, vectors = self.open()
+        positions = self.latest_positions(ids)
+        if len(positions) > n:
+            rng = np.random.default_rng(seed)
+            positions = np.sort(rng.choice(positions, size=n, replace=False))
+        return np.asarray(vectors[positions])
+
+    def lookup(self, posting_ids):
+        """Fetch the latest vectors for `posting_ids`, in the order given.
+
+        Returns:
+            (found, vectors): boolean mask over `posting_ids` and a (found.sum(), dim) matrix.
+        """
+        posting_ids = np.asarray(posting_ids, dtype=np.int64)
+        ids, vectors = self.open()
+        positions = self.latest_positions(ids)
+        stored_ids = np.asarray(ids[positions])
+        order = np.argsort(stored_ids)
+        sorted_ids = stored_ids[order]
+        if len(sorted_ids) == 0:
+            return np.zeros(len(posting_ids), dtype=bool), np.empty((0, self.dim or 0), dtype=np.float32)
+        where = np.minimum(np.searchsorted(sorted_ids, posting_ids), len(sorted_ids) - 1)
+        found = sorted_ids[where] == posting_ids
+        rows = positions[order[where[found]]]
+        return found, np.asarray(vectors[rows])
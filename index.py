@@ -1,29 +1,789 @@
+import os
+import json
+import time
+import heapq
+import itertools
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import faiss
 import numpy as np
-from database import get_all_postings
+from sqlalchemy import inspect, select
+from database import load_embedding_matrix, embed_all_postings, get_inactive_posting_ids, iter_postings, engine, Posting, JobIndustry
+from database import get_embedding_store
+from database import FAISS_INDEX_PATH
+from embedding_store import EmbeddingStore
+from metrics import timed
 
-def init_faiss_index() -> None:
+INDEX_TYPES = ("flat", "ivfflat", "hnsw", "ivfpq")
+DEFAULT_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "flat")
+
+def default_nlist(n: int) -> int:
+    """Rule-of-thumb IVF list count (~4*sqrt(N)), kept small enough to train on N vectors."""
+    return int(max(1, min(4 * np.sqrt(max(n, 1)), n // 39 or 1)))
+
+def make_index(index_type: str, dim: int, n: int = 0, nlist: int | None = None, pq_m: int = 16, pq_bits: int = 8,
+               hnsw_m: int = 32, ef_construction: int = 200, nprobe: int = 16, ef_search: int = 64):
+    """Create an empty inner-product index of the given type that takes posting ids via `add_with_ids`.
+
+    Args:
+        index_type: "flat" (exact), "ivfflat", "hnsw" or "ivfpq".
+        dim: Vector dimension.
+        n: Expected number of vectors; used to pick `nlist` when it isn't given.
+        nlist: Number of IVF lists (IVF types).
+        pq_m, pq_bits: Sub-quantizers and bits per code (IVFPQ). `dim` must be divisible by `pq_m`.
+        hnsw_m, ef_construction: Graph degree and build-time beam width (HNSW).
+        nprobe, ef_search: Default query-time settings stored in the index; they can be
+            overridden per query with `search_params`.
+
+    Flat and HNSW indexes are wrapped in an IndexIDMap. IVF indexes store ids in their
+    inverted lists themselves and are returned unwrapped: IndexIDMap.remove_ids assumes the
+    wrapped index renumbers the vectors after the removed ones, which IVF does not, so the
+    id map would go out of sync. IVF types must be trained (`train_index`) before vectors are
+    added. HNSW does not support removing vectors.
+    """
+    metric = faiss.METRIC_INNER_PRODUCT
+    if index_type == "flat":
+        base = faiss.IndexFlatIP(dim)
+    elif index_type in ("ivfflat", "ivfpq"):
+        nlist = nlist or default_nlist(n)
+        quantizer = faiss.IndexFlatIP(dim)
+        if index_type == "ivfflat":
+            base = faiss.IndexIVFFlat(quantizer, dim, nlist, metric)
+        else:
+            if dim % pq_m:
+                raise ValueError(f"IVFPQ needs dim ({dim}) divisible by pq_m ({pq_m})")
+            base = faiss.IndexIVFPQ(quantizer, dim, nlist, pq_m, pq_bits, metric)
+        base.nprobe = min(nprobe, nlist)
+    elif index_type == "hnsw":
+        base = faiss.IndexHNSWFlat(dim, hnsw_m, metric)
+        base.hnsw.efConstruction = ef_construction
+        base.hnsw.efSearch = ef_search
+    else:
+        raise ValueError(f"Unknown index type {index_type!r}; expected one of {INDEX_TYPES}")
+    if isinstance(base, faiss.IndexIVF):
+        return base
+    return faiss.IndexIDMap(base)
+
+def base_index(index):
+    """The index inside an IndexIDMap (downcast to its concrete type), else `index` itself."""
+    return faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+
+def train_index(index, sample) -> None:
+    """Train `index` on a (normalized) sample if its type requires training."""
+    if not index.is_trained:
+        index.train(np.ascontiguousarray(sample, dtype='float32'))
+
+def search_params(index, nprobe: int | None = None, ef_search: int | None = None, sel=None):
+    """Per-query FAISS SearchParameters for `index` (any index built by `make_index`).
+
+    Returns None when nothing is overridden, so the settings stored in the index apply.
+    """
+    base = base_index(index)
+    if isinstance(base, faiss.IndexIVF):
+        params = faiss.SearchParametersIVF()
+        if nprobe is not None:
+            params.nprobe = nprobe
+        else:
+            params.nprobe = base.nprobe
+    elif isinstance(base, faiss.IndexHNSW):
+        params = faiss.SearchParametersHNSW()
+        params.efSearch = ef_search if ef_search is not None else base.hnsw.efSearch
+    else:
+        params = faiss.SearchParameters()
+    if sel is not None:
+        params.sel = sel
+    elif nprobe is None and ef_search is None:
+        return None
+    return params
+
+@timed("index.build")
+def init_faiss_index(recompute_embeddings: bool = False, store: EmbeddingStore | None = None, block_size: int = 65536,
+                     path: str = FAISS_INDEX_PATH, index_type: str = DEFAULT_INDEX_TYPE, train_size: int = 100_000,
+                     prune_inactive: bool = False, **index_options) -> None:
     """
     FAISS index initialization.
+
+    Vectors are paged in `block_size` rows at a time from the memory-mapped embedding store,
+    so no Posting objects are loaded. If the store is empty, the embeddings saved in the
+    database are used instead. If `recompute_embeddings` is set, postings without an
+    embedding are embedded first.
+
+    `index_type` (default: the FAISS_INDEX_TYPE environment variable, else "flat") selects the
+    index built by `make_index`; `index_options` are passed through to it. Index types that
+    need training are trained on a random sample of up to `train_size` vectors. With
+    `prune_inactive`, closed/expired postings are left out of the index.
+
+    The index is written atomically to `path`, so a running `FaissIndexManager` picks it up
+    without ever seeing a half-written file.
+    """
+    if recompute_embeddings:
+        embed_all_postings(store=store)
+    if store is None:
+        store = get_embedding_store()
+
+    store_rows = store.count
+    if store_rows > 0:
+        blocks = store.iter_blocks(block_size)
+        embed_dim = store.dim
+        n = len(store.latest_positions())
+        sample = store.sample(train_size)
+    else:
+        ids, embeddings = load_embedding_matrix()
+        if len(ids) == 0:
+            raise RuntimeError("No embedded postings found; run embed_all_postings first.")
+        blocks = [(ids, embeddings)]
+        embed_dim = embeddings.shape[1]
+        n = len(ids)
+        rng = np.random.default_rng(0)
+        sample = embeddings[np.sort(rng.choice(n, size=min(n, train_size), replace=False))]
+
+    index = make_index(index_type, embed_dim, n=n, **index_options)
+    if not index.is_trained:
+        sample = np.array(sample, dtype='float32')
+        faiss.normalize_L2(sample)
+        train_index(index, sample)
+    inactive = get_inactive_posting_ids() if prune_inactive else np.empty(0, dtype=np.int64)
+    max_id = -1
+    for ids, embeddings in blocks:
+        max_id = max(max_id, int(ids.max()))
+        if len(inactive):
+            keep = ~np.isin(ids, inactive)
+            ids, embeddings = ids[keep], np.ascontiguousarray(embeddings[keep])
+        faiss.normalize_L2(embeddings)
+        index.add_with_ids(embeddings, ids)
+
+    write_index_atomic(index, path)
+    # the build options are kept so update_faiss_index can rebuild the same kind of index
+    write_watermark(path, {"store_rows": store_rows, "max_posting_id": max_id, "index_type": index_type,
+                           "train_size": train_size, "index_options": index_options})
+
+def _watermark_path(path: str) -> str:
+    return path + ".watermark.json"
+
+def read_watermark(path: str = FAISS_INDEX_PATH) -> dict | None:
+    """What the index at `path` already contains, as recorded by the last build/update."""
+    wm_path = _watermark_path(path)
+    if not os.path.exists(wm_path):
+        return None
+    with open(wm_path, "r", encoding="utf-8") as fh:
+        return json.load(fh)
+
+def _rebuild_options(watermark: dict | None) -> dict:
+    """`init_faiss_index` arguments that rebuild the index recorded in `watermark` the same way."""
+    if watermark is None:
+        return {}
+    return {"index_type": watermark.get("index_type", "flat"), "train_size": watermark.get("train_size", 100_000),
+            **watermark.get("index_options", {})}
+
+def write_watermark(path: str, watermark: dict) -> None:
+    """Persist the watermark next to the index (written after the index itself)."""
+    watermark = dict(watermark, updated_at=time.time())
+    tmp = _watermark_path(path) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(watermark, fh)
+    os.replace(tmp, _watermark_path(path))
+
+@timed("index.update")
+def update_faiss_index(store: EmbeddingStore | None = None, path: str = FAISS_INDEX_PATH, block_size: int = 65536,
+                       prune_inactive: bool = False, now_ms: float | None = None) -> dict:
+    """
+    Incrementally bring the index at `path` up to date instead of rebuilding it.
+
+    - Embedding store rows appended since the watermark (new postings, or postings that were
+      re-embedded) are added with `add_with_ids`, after removing any older vector for the same id.
+      Without a store, postings with an id above the watermark's `max_posting_id` are added.
+    - With `prune_inactive`, closed or expired postings (`closed_time`, or `expiry` before
+      `now_ms`) are removed with `remove_ids`. Off by default, as in `init_faiss_index`: every
+      posting in the bundled dataset is already past its expiry, so pruning would empty the index.
+
+    Falls back to a full `init_faiss_index` when there is no index/watermark yet, the store was
+    reset since the last build, the index type cannot remove vectors (HNSW), or the index is an
+    IVF index that an older version wrapped in an IndexIDMap. The rebuild uses the index type
+    and options recorded in the watermark. Returns counts of added, replaced and removed vectors.
+    """
+    if store is None:
+        store = get_embedding_store()
+    watermark = read_watermark(path)
+    # a store that shrank was reset/rebuilt, so row offsets in the watermark no longer apply
+    if watermark is None or not os.path.exists(path) or store.count < watermark["store_rows"]:
+        init_faiss_index(store=store, path=path, block_size=block_size, prune_inactive=prune_inactive,
+                         **_rebuild_options(watermark))
+        return {"rebuilt": True, "added": 0, "replaced": 0, "removed": 0}
+
+    index = faiss.read_index(path)
+    if isinstance(index, faiss.IndexIDMap) and isinstance(base_index(index), faiss.IndexIVF):
+        # written before IVF indexes were stored unwrapped; removing from it would corrupt the id map
+        init_faiss_index(store=store, path=path, block_size=block_size, prune_inactive=prune_inactive,
+                         **_rebuild_options(watermark))
+        return {"rebuilt": True, "added": 0, "replaced": 0, "removed": 0}
+    store_rows = store.count
+    max_id = watermark["max_posting_id"]
+    if store_rows > 0:
+        blocks = store.iter_blocks(block_size, start=watermark["store_rows"])
+    else:
+        blocks = [load_embedding_matrix(min_id=max_id)]
+
+    added = replaced = removed = 0
+    try:
+        for ids, embeddings in blocks:
+            if len(ids) == 0:
+                continue
+            replaced += index.remove_ids(ids)
+            faiss.normalize_L2(embeddings)
+            index.add_with_ids(embeddings, ids)
+            added += len(ids)
+            max_id = max(max_id, int(ids.max()))
+        if prune_inactive:
+            inactive = get_inactive_posting_ids(now_ms)
+            if len(inactive):
+                removed += index.remove_ids(inactive)
+    except RuntimeError:
+        # e.g. HNSW, which has no remove_ids
+        init_faiss_index(store=store, path=path, block_size=block_size, prune_inactive=prune_inactive,
+                         **_rebuild_options(watermark))
+        return {"rebuilt": True, "added": 0, "replaced": 0, "removed": 0}
+
+    if added or removed:
+        write_index_atomic(index, path)
+    write_watermark(path, dict(watermark, store_rows=store_rows, max_posting_id=max_id))
+    return {"rebuilt": False, "added": added - replaced, "replaced": replaced, "removed": removed}
+
+def write_index_atomic(index, path: str = FAISS_INDEX_PATH) -> None:
+    """Write `index` to a temporary file and rename it over `path`."""
+    tmp = f"{path}.tmp.{os.getpid()}"
+    faiss.write_index(index, tmp)
+    os.replace(tmp, path)
+
+
+class _ReadWriteLock:
+    """Many concurrent readers or a single writer. Writers are preferred once waiting."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    def acquire_read(self):
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+
+    def release_read(self):
+        with self._cond:
+            self._readers -= 1
+            if self._readers == 0:
+                self._cond.notify_all()
+
+    def acquire_write(self):
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+
+    def release_write(self):
+        with self._cond:
+            self._writer = False
+            self._cond.notify_all()
+
+
+class FaissIndexManager:
+    """Long-lived holder of the FAISS index for a serving process.
+
+    - The index is read from disk once and shared by all searches (FAISS CPU search is
+      thread-safe on a read-only index), behind a read/write lock.
+    - With `use_mmap`, the index is opened with `faiss.IO_FLAG_MMAP` instead of being copied
+      into RAM.
+    - At most every `check_interval` seconds a search stats the index file. If its version
+      (inode, mtime, size) changed, the new index is loaded while the old one keeps serving,
+      and then swapped in under the write lock.
+    """
+
+    def __init__(self, path: str = FAISS_INDEX_PATH, use_mmap: bool = False, check_interval: float = 1.0):
+        self.path = path
+        self.use_mmap = use_mmap
+        self.check_interval = check_interval
+        self._index = None
+        self._version = None
+        self._last_check = 0.0
+        self._lock = _ReadWriteLock()
+        self._reload_lock = threading.Lock()
+
+    def _file_version(self):
+        st = os.stat(self.path)
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _read(self):
+        if self.use_mmap:
+            return faiss.read_index(self.path, faiss.IO_FLAG_MMAP)
+        return faiss.read_index(self.path)
+
+    def reload(self, force: bool = False) -> bool:
+        """Load the index file if it changed since the last load. Returns True if swapped."""
+        # only one thread reloads; the others keep searching the current index
+        if not self._reload_lock.acquire(blocking=self._index is None):
+            return False
+        try:
+            self._last_check = time.monotonic()
+            version = self._file_version()
+            if not force and version == self._version and self._index is not None:
+                return False
+            new_index = self._read()
+            self._lock.acquire_write()
+            try:
+                self._index, self._version = new_index, version
+            finally:
+                self._lock.release_write()
+            return True
+        finally:
+            self._reload_lock.release()
+
+    def _maybe_reload(self):
+        if self._index is None:
+            self.reload()
+        elif time.monotonic() - self._last_check >= self.check_interval:
+            try:
+                self.reload()
+            except OSError:
+                # file is missing or mid-replace; keep serving the loaded index
+                pass
+
+    @property
+    def index(self):
+        self._maybe_reload()
+        return self._index
+
+    def search(self, queries, k: int, nprobe: int | None = None, ef_search: int | None = None,
+               sel=None) -> tuple[np.ndarray, np.ndarray]:
+        """Search the current index with a (M, d) float32 query matrix.
+
+        `nprobe`, `ef_search` and the id selector `sel` are applied per call via `search_params`.
+        """
+        self._maybe_reload()
+        self._lock.acquire_read()
+        try:
+            params = search_params(self._index, nprobe=nprobe, ef_search=ef_search, sel=sel)
+            return self._index.search(queries, k, params=params)
+        finally:
+            self._lock.release_read()
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+def get_index_manager(path: str | None = None, use_mmap: bool | None = None) -> FaissIndexManager:
+    """Process-wide FaissIndexManager, created on first use.
+
+    `path` defaults to the current manager's path, else FAISS_INDEX_PATH; passing a different
+    path replaces the manager. `use_mmap` defaults to the FAISS_INDEX_MMAP environment variable.
+    """
+    global _manager
+    with _manager_lock:
+        if _manager is None or (path is not None and _manager.path != path):
+            if use_mmap is None:
+                use_mmap = os.getenv("FAISS_INDEX_MMAP", "0").lower() in ("1", "true", "yes")
+            _manager = FaissIndexManager(path or FAISS_INDEX_PATH, use_mmap=use_mmap)
+        return _manager
+
+def query_matrix(vectors) -> np.ndarray:
+    """Query vectors as a contiguous (M, d) float32 matrix, L2-normalized like the indexed
+    vectors so inner-product scores are cosine similarities in [-1, 1]. The input is not modified."""
+    queries = np.array(vectors, dtype='float32', order='C', ndmin=2)
+    faiss.normalize_L2(queries)
+    return queries
+
+@timed("index.search")
+def search_faiss(search_vector, k=5, nprobe: int | None = None, ef_search: int | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    FAISS SEARCH against the shared, hot-reloaded index. Scores are cosine similarities.
+
+    `nprobe` (IVF indexes) and `ef_search` (HNSW) override the index's stored query settings.
+    """
+    query = query_matrix(np.reshape(search_vector, (1, -1)))
+    scores, ids = get_index_manager().search(query, k, nprobe=nprobe, ef_search=ef_search)
+
+    return scores, ids
+
+@timed("index.search_batch")
+def search_faiss_batch(vectors, k=5, nprobe: int | None = None, ef_search: int | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    FAISS SEARCH for many queries at once.
+
+    `vectors` is an (M, d) array (or a list of M vectors). All queries go through a single
+    `index.search` call, which lets FAISS use its BLAS-backed batch path instead of M
+    separate searches. Returns (scores, ids), each of shape (M, k); row i belongs to query i.
+    `nprobe`/`ef_search` and the scores are as in `search_faiss`.
+    """
+    queries = query_matrix(vectors)
+    scores, ids = get_index_manager().search(queries, k, nprobe=nprobe, ef_search=ef_search)
+
+    return scores, ids
+
+
+def attribute_index_path(index_path: str = FAISS_INDEX_PATH) -> str:
+    """Where the attribute id lists for the FAISS index at `index_path` live."""
+    return index_path + ".attrs.npz"
+
+ATTRIBUTE_INDEX_PATH = attribute_index_path(FAISS_INDEX_PATH)
+# Filterable attributes: filter key -> Posting column (industry_id comes from the job_industries table)
+FILTER_ATTRIBUTES = {
+    "remote": "remote_allowed",
+    "work_type": "work_type",
+    "experience_level": "formatted_experience_level",
+    "location": "location",
+    "fips": "fips",
+    "industry_id": None,
+}
+
+# numeric codes stored with leading zeros ("08069"), so 8069 and "8069" find them too
+ZERO_PADDED_ATTRIBUTES = {"fips": 5}
+
+def _attribute_value(value, attr: str | None = None) -> str:
+    """Canonical string form of a value of `attr`, shared by build and query."""
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    text = str(value).strip().lower()
+    width = ZERO_PADDED_ATTRIBUTES.get(attr)
+    if width and text.removesuffix(".0").isdigit():
+        text = text.removesuffix(".0").zfill(width)
+    return text
+
+def build_attribute_index(path: str = ATTRIBUTE_INDEX_PATH) -> None:
+    """Precompute per-value posting id lists for filtered search and save them to `path`.
+
+    For every attribute in FILTER_ATTRIBUTES and every value it takes, the posting ids with
+    that value are stored as a sorted int64 array (key "attr=value" in an .npz file).
+    Salaries are stored as posting ids sorted by `normalized_salary` plus the parallel salary
+    values, so "salary above X" is a binary search. Written atomically, like the FAISS index.
+    Missing or empty tables give empty lists (filters then match nothing).
+    """
+    import pandas as pd
+
+    columns = ["job_id", "normalized_salary"] + [col for col in FILTER_ATTRIBUTES.values() if col]
+    tables = inspect(engine)
+    has_postings = tables.has_table(Posting.__tablename__)
+    batches = list(iter_postings(columns, batch_size=50_000, output="frame")) if has_postings else []
+    frame = pd.concat(batches).reset_index() if batches else pd.DataFrame(columns=["id"] + columns)
+    industry_rows = []
+    if has_postings and tables.has_table(JobIndustry.__tablename__):
+        with engine.connect() as conn:
+            industry_rows = conn.execute(
+                select(Posting.id, JobIndustry.industry_id).join(JobIndustry, JobIndustry.job_id == Posting.job_id)).all()
+    industry_pairs = pd.DataFrame(industry_rows, columns=["id", "industry_id"])
+
+    arrays = {}
+    for attr, col in FILTER_ATTRIBUTES.items():
+        if col is None:
+            pairs = industry_pairs.rename(columns={"industry_id": "value"})[["id", "value"]]
+        else:
+            pairs = frame[["id", col]].rename(columns={col: "value"})
+            if attr == "remote":
+                pairs = pairs.assign(value=pd.to_numeric(pairs["value"], errors="coerce").fillna(0) > 0)
+        pairs = pairs.dropna()
+        for value, ids in pairs.groupby(pairs["value"].map(lambda v: _attribute_value(v, attr)))["id"]:
+            arrays[f"{attr}={value}"] = np.unique(ids.to_numpy(np.int64))
+
+    salaried = frame.dropna(subset=["normalized_salary"]).sort_values("normalized_salary", kind="stable")
+    arrays["__salary_ids"] = salaried["id"].to_numpy(np.int64)
+    arrays["__salary_values"] = salaried["normalized_salary"].to_numpy(np.float64)
+    arrays["__max_id"] = np.array([frame["id"].max() if len(frame) else -1], dtype=np.int64)
+
+    tmp = f"{path}.tmp.{os.getpid()}.npz"
+    np.savez(tmp, **arrays)
+    os.replace(tmp, path)
+
+
+class AttributeIndex:
+    """Loaded attribute id lists, combined into FAISS IDSelectors for filtered search.
+
+    Filters are a dict of attribute -> value or list of values, e.g.
+    {"remote": True, "work_type": ["FULL_TIME", "CONTRACT"], "industry_id": 4, "min_salary": 80000}.
+    Values for one attribute are OR-ed, attributes are AND-ed. `min_salary`/`max_salary` bound
+    `normalized_salary` (inclusive).
+    """
+
+    def __init__(self, path: str = ATTRIBUTE_INDEX_PATH):
+        self.path = path
+        with np.load(path) as data:
+            self._arrays = {key: data[key] for key in data.files}
+        self.max_id = int(self._arrays["__max_id"][0])
+
+    def values(self, attr: str) -> list[str]:
+        prefix = attr + "="
+        return sorted(key[len(prefix):] for key in self._arrays if key.startswith(prefix))
+
+    def _ids_for_attr(self, attr: str, values) -> np.ndarray:
+        if attr not in FILTER_ATTRIBUTES:
+            raise ValueError(f"Unknown filter {attr!r}; expected one of {sorted(FILTER_ATTRIBUTES)} or min_salary/max_salary")
+        if not isinstance(values, (list, tuple, set)):
+            values = [values]
+        empty = np.empty(0, dtype=np.int64)
+        lists = [self._arrays.get(f"{attr}={_attribute_value(v, attr)}", empty) for v in values]
+        return lists[0] if len(lists) == 1 else np.unique(np.concatenate(lists))
+
+    def ids(self, filters: dict) -> np.ndarray | None:
+        """Sorted posting ids matching every filter, or None if `filters` is empty."""
+        parts = []
+        salaries = self._arrays["__salary_values"]
+        if filters.get("min_salary") is not None or filters.get("max_salary") is not None:
+            lo = np.searchsorted(salaries, filters["min_salary"], side="left") if filters.get("min_salary") is not None else 0
+            hi = np.searchsorted(salaries, filters["max_salary"], side="right") if filters.get("max_salary") is not None else len(salaries)
+            parts.append(np.sort(self._arrays["__salary_ids"][lo:hi]))
+        for attr, values in filters.items():
+            if attr in ("min_salary", "max_salary") or values is None:
+                continue
+            parts.append(self._ids_for_attr(attr, values))
+        if not parts:
+            return None
+        # intersect smallest first so every step is as cheap as possible
+        parts.sort(key=len)
+        result = parts[0]
+        for part in parts[1:]:
+            if len(result) == 0:
+                break
+            result = np.intersect1d(result, part, assume_unique=True)
+        return result
+
+    def selector(self, filters: dict):
+        """A FAISS IDSelectorBitmap admitting only postings that match `filters`.
+
+        Returns (selector, number of matching postings), or (None, None) if `filters` is empty.
+        """
+        ids = self.ids(filters)
+        if ids is None:
+            return None, None
+        bits = np.zeros(self.max_id + 1, dtype=bool)
+        bits[ids[ids <= self.max_id]] = True
+        bitmap = np.packbits(bits, bitorder="little")
+        # IDSelectorBitmap takes the bitmap's length in bytes, not bits
+        sel = faiss.IDSelectorBitmap(len(bitmap), faiss.swig_ptr(bitmap))
+        # the selector points into `bitmap`; keep it alive as long as the selector
+        sel.bitmap_array = bitmap
+        return sel, len(ids)
+
+
+_attribute_index = None
+_attribute_index_mtime = None
+
+def get_attribute_index(path: str = ATTRIBUTE_INDEX_PATH, index_path: str | None = None) -> AttributeIndex:
+    """Process-wide AttributeIndex, reloaded when the file on disk changes.
+
+    The file is built lazily by the first filtered search, and rebuilt when the FAISS index at
+    `index_path` was written after it, so building or updating an index never needs the
+    auxiliary tables.
+    """
+    global _attribute_index, _attribute_index_mtime
+    if not os.path.exists(path) or (index_path is not None and os.path.exists(index_path)
+                                    and os.stat(index_path).st_mtime_ns > os.stat(path).st_mtime_ns):
+        build_attribute_index(path)
+    mtime = os.stat(path).st_mtime_ns
+    if _attribute_index is None or _attribute_index.path != path or mtime != _attribute_index_mtime:
+        _attribute_index, _attribute_index_mtime = AttributeIndex(path), mtime
+    return _attribute_index
+
+@timed("index.search_filtered")
+def search_faiss_filtered(vectors, filters: dict, k=5, nprobe: int | None = None,
+                          ef_search: int | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    FAISS SEARCH restricted to postings matching `filters` (see AttributeIndex).
+
+    The filter is applied inside the search through an IDSelector, so the top k are taken
+    among matching postings only instead of post-filtering a larger result. With approximate
+    indexes a selective filter can leave too few matching vectors in the probed lists/graph
+    neighbourhood; in that case the search is retried with 4x wider nprobe/efSearch until k
+    results are found or the whole index has been probed.
+    """
+    queries = query_matrix(vectors)
+    manager = get_index_manager()
+    sel, matching = get_attribute_index(attribute_index_path(manager.path), manager.path).selector(filters)
+    scores, ids = manager.search(queries, k, nprobe=nprobe, ef_search=ef_search, sel=sel)
+    if sel is None:
+        return scores, ids
+
+    base = base_index(manager.index)
+    wanted = min(k, matching)
+    nlist = getattr(base, "nlist", None)
+    nprobe = nprobe or getattr(base, "nprobe", None)
+    ef_search = ef_search or (base.hnsw.efSearch if isinstance(base, faiss.IndexHNSW) else None)
+    while (ids != -1).sum(axis=1).min() < wanted:
+        if nlist is not None and nprobe < nlist:
+            nprobe = min(nlist, nprobe * 4)
+        elif ef_search is not None and ef_search < max(manager.index.ntotal, k):
+            ef_search = ef_search * 4
+        else:
+            break
+        scores, ids = manager.search(queries, k, nprobe=nprobe, ef_search=ef_search, sel=sel)
+
+    return scores, ids
+
+
+def shard_manifest_path(path: str = FAISS_INDEX_PATH) -> str:
+    """Where the manifest of the sharded index for `path` lives."""
+    return path + ".shards.json"
+
+def _build_shard(store_path: str, shard_path: str, min_id: int, max_id: int, index_type: str, train_size: int,
+                 block_size: int, omp_threads: int, index_options: dict) -> int:
+    """Build the index over the store's postings with min_id <= id < max_id and write it to
+    `shard_path`. Runs in a worker process. Returns the number of vectors indexed."""
+    faiss.omp_set_num_threads(omp_threads)
+    store = EmbeddingStore(store_path)
+    ids, vectors = store.open()
+    positions = store.latest_positions(ids)
+    posting_ids = np.asarray(ids[positions])
+    positions = positions[(posting_ids >= min_id) & (posting_ids < max_id)]
+
+    index = make_index(index_type, store.dim, n=len(positions), **index_options)
+    if not index.is_trained:
+        rng = np.random.default_rng(0)
+        sample = np.array(vectors[np.sort(rng.choice(positions, size=min(len(positions), train_size), replace=False))])
+        faiss.normalize_L2(sample)
+        train_index(index, sample)
+    for i in range(0, len(positions), block_size):
+        pos = positions[i:i + block_size]
+        embeddings = np.array(vectors[pos], dtype='float32')
+        faiss.normalize_L2(embeddings)
+        index.add_with_ids(embeddings, np.asarray(ids[pos]))
+    write_index_atomic(index, shard_path)
+    return len(positions)
+
+@timed("index.build_sharded")
+def init_sharded_faiss_index(num_shards: int = 4, store: EmbeddingStore | None = None, path: str = FAISS_INDEX_PATH,
+                             index_type: str = DEFAULT_INDEX_TYPE, workers: int | None = None,
+                             train_size: int = 100_000, block_size: int = 65536, **index_options) -> dict:
+    """
+    Build the FAISS index as `num_shards` independent shards, one worker process per shard.
+
+    Postings are partitioned into contiguous id ranges holding equal numbers of postings; the
+    last range is open-ended. Each worker memory-maps the embedding store, builds its shard
+    with `make_index(index_type, ..., **index_options)` and writes it to its own file next to
+    `path`, so no process ever holds more than one shard. Worker processes are spawned (not
+    forked) and split the CPU cores between their FAISS thread pools.
+
+    The shard list is written to `shard_manifest_path(path)` last; `ShardedIndex` serves it.
+    Returns the manifest.
     """
-    postings = get_all_postings(embedded_only=True)
-    ids = np.array([np.int64(posting["id"]) for posting in postings], dtype='int64')
-    embeddings = np.array([np.array(posting["embedding"], dtype='float32') for posting in postings])
-    faiss.normalize_L2(embeddings)
-    embed_dim = embeddings.shape[1]
+    if store is None:
+        store = get_embedding_store()
+    if store.count == 0:
+        raise RuntimeError("The embedding store is empty; run embed_all_postings or rebuild_embedding_store first.")
+    ids, _ = store.open()
+    unique_ids = np.unique(np.asarray(ids))
+    num_shards = max(1, min(num_shards, len(unique_ids)))
+    cuts = [int(unique_ids[i * len(unique_ids) // num_shards]) for i in range(1, num_shards)]
+    ranges = list(zip([0] + cuts, cuts + [np.iinfo(np.int64).max]))
 
-    index = faiss.IndexIDMap(faiss.IndexFlatIP(embed_dim))
-    index.add_with_ids(embeddings, ids)
+    workers = workers or min(num_shards, os.cpu_count() or 1)
+    omp_threads = max(1, (os.cpu_count() or 1) // workers)
+    shard_files = [f"{os.path.basename(path)}.shard{i}-of-{num_shards}" for i in range(num_shards)]
+    directory = os.path.dirname(path)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = [
+            pool.submit(_build_shard, store.path, os.path.join(directory, shard_file), lo, hi, index_type,
+                        train_size, block_size, omp_threads, index_options)
+            for shard_file, (lo, hi) in zip(shard_files, ranges)
+        ]
+        counts = [f.result() for f in futures]
 
-    with open('index.faiss', 'w'):
-        faiss.write_index(index, 'index.faiss')
+    manifest = {
+        "partition": "id_range",
+        "index_type": index_type,
+        "store_rows": store.count,
+        "shards": [{"path": shard_file, "min_id": lo, "max_id": hi, "count": count}
+                   for shard_file, (lo, hi), count in zip(shard_files, ranges, counts)],
+    }
+    manifest_path = shard_manifest_path(path)
+    tmp = manifest_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh)
+    os.replace(tmp, manifest_path)
+    return manifest
 
-def search_faiss(search_vector, k=5) -> tuple[np.ndarray, np.ndarray]:
+def merge_topk(results, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """Merge per-shard (scores, ids) results, each sorted best first, into the overall top k.
+
+    For every query the shard rows are combined with a k-way heap merge, which stops after
+    the first k valid entries. -1 padding is skipped, and missing slots are padded the way
+    FAISS pads them.
     """
-    FAISS SEARCH
+    num_queries = results[0][0].shape[0]
+    scores = np.full((num_queries, k), -np.finfo(np.float32).max, dtype=np.float32)
+    ids = np.full((num_queries, k), -1, dtype=np.int64)
+    for q in range(num_queries):
+        rows = [zip((-s[q]).tolist(), i[q].tolist()) for s, i in results]
+        merged = itertools.islice((entry for entry in heapq.merge(*rows) if entry[1] != -1), k)
+        for j, (neg_score, posting_id) in enumerate(merged):
+            scores[q, j], ids[q, j] = -neg_score, posting_id
+    return scores, ids
+
+
+class ShardedIndex:
+    """Query coordinator for an index built by `init_sharded_faiss_index`.
+
+    Each shard is served by its own `FaissIndexManager` (so rebuilt shard files are hot
+    reloaded). A search fans the query matrix out to all shards on a thread pool (FAISS
+    releases the GIL while searching, so shards are searched in parallel) and merges the
+    per-shard top k with `merge_topk`.
     """
-    with open('index.faiss', 'r'):
-        index = faiss.read_index('index.faiss')
-    scores, ids = index.search(np.array(search_vector, dtype='float32').reshape(1, -1), k)
 
-    return scores, ids
\ No newline at end of file
+    def __init__(self, path: str = FAISS_INDEX_PATH, use_mmap: bool = False, workers: int | None = None):
+        self.path = path
+        with open(shard_manifest_path(path), "r", encoding="utf-8") as fh:
+            self.manifest = json.load(fh)
+        directory = os.path.dirname(path)
+        self.managers = [FaissIndexManager(os.path.join(directory, shard["path"]), use_mmap=use_mmap)
+                         for shard in self.manifest["shards"]]
+        self._pool = ThreadPoolExecutor(max_workers=workers or len(self.managers), thread_name_prefix="faiss-shard")
+
+    @property
+    def ntotal(self) -> int:
+        return sum(manager.index.ntotal for manager in self.managers)
+
+    def search(self, queries, k: int, nprobe: int | None = None, ef_search: int | None = None):
+        queries = np.ascontiguousarray(queries, dtype='float32')
+        if queries.ndim == 1:
+            queries = queries.reshape(1, -1)
+        try:
+            futures = [self._pool.submit(manager.search, queries, k, nprobe, ef_search) for manager in self.managers]
+        except RuntimeError:
+            # closed by a reload after this search started; finish it on the calling thread
+            return merge_topk([manager.search(queries, k, nprobe, ef_search) for manager in self.managers], k)
+        return merge_topk([f.result() for f in futures], k)
+
+    def close(self, wait: bool = True) -> None:
+        """Shut down the fan-out thread pool. With `wait=False`, searches already running finish
+        in the background."""
+        self._pool.shutdown(wait=wait)
+
+
+_sharded_index = None
+_sharded_index_version = None
+_sharded_index_lock = threading.Lock()
+
+def get_sharded_index(path: str = FAISS_INDEX_PATH, use_mmap: bool | None = None) -> ShardedIndex:
+    """Process-wide ShardedIndex, reopened when the shard manifest changes. The replaced
+    instance's thread pool is shut down once its in-flight searches finish."""
+    global _sharded_index, _sharded_index_version
+    version = (path, os.stat(shard_manifest_path(path)).st_mtime_ns)
+    with _sharded_index_lock:
+        if _sharded_index is None or version != _sharded_index_version:
+            if use_mmap is None:
+                use_mmap = os.getenv("FAISS_INDEX_MMAP", "0").lower() in ("1", "true", "yes")
+            previous = _sharded_index
+            _sharded_index, _sharded_index_version = ShardedIndex(path, use_mmap=use_mmap), version
+            if previous is not None:
+                previous.close(wait=False)
+        return _sharded_index
+
+@timed("index.search_sharded")
+def search_faiss_sharded(vectors, k=5, nprobe: int | None = None, ef_search: int | None = None,
+                         path: str = FAISS_INDEX_PATH) -> tuple[np.ndarray, np.ndarray]:
+    """
+    FAISS SEARCH over the sharded index at `path`: same inputs and outputs as `search_faiss_batch`.
+    """
+    return get_sharded_index(path).search(query_matrix(vectors), k, nprobe=nprobe, ef_search=ef_search)
@@ -1,14 +1,21 @@
-from database import init_db, Posting, import_postings_from_csv
-from index import init_faiss_index
+from database import init_db, bulk_import_postings_from_csv, bulk_import_auxiliary_csvs, embed_all_postings
+from index import init_faiss_index, update_faiss_index
+from lexical_index import build_lexical_index, update_lexical_index
+from metrics import timed
 
+@timed("setup.database")
 def setup_database():
     """
-    Initialize the database and import job postings from a CSV file.
+    Initialize the database and import job postings, then the skills, industries, benefits,
+    salaries and company CSVs, and build the BM25 index over posting text.
     """
     init_db()
-    num_imported = import_postings_from_csv()
+    num_imported = bulk_import_postings_from_csv()
     print(f"Imported {num_imported} job postings.")
+    bulk_import_auxiliary_csvs()
+    build_lexical_index()
 
+@timed("setup.faiss_index")
 def setup_faiss_index():
     """
     Initialize the FAISS index for job postings.
@@ -16,6 +23,18 @@ def setup_faiss_index():
     init_faiss_index(recompute_embeddings=True)
     print("FAISS index initialized.")
 
+@timed("setup.refresh")
+def refresh_faiss_index(prune_inactive: bool = False):
+    """
+    Embed newly imported postings and apply them to the existing FAISS and lexical indexes
+    incrementally. With `prune_inactive`, closed/expired postings are also removed from both.
+    """
+    embed_all_postings()
+    stats = update_faiss_index(prune_inactive=prune_inactive)
+    print(f"FAISS index refreshed: {stats}")
+    stats = update_lexical_index(prune_inactive=prune_inactive)
+    print(f"Lexical index refreshed: {stats}")
+
 if __name__ == "__main__":
     setup_database()
     setup_faiss_index()
\ No newline at end of file
@@ -0,0 +1,352 @@
+import os
+import re
+import time
+import threading
+from collections import Counter
+import numpy as np
+from database import iter_postings, get_inactive_posting_ids
+from metrics import timed
+
+LEXICAL_INDEX_PATH = os.path.join(os.path.dirname(__file__), "lexical_index.npz")
+
+# Keeps tool names like "c++", "c#", "node.js", "ci/cd" and "aws-certified" as single terms
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#]*(?:[./\-][a-z0-9+#]+)*")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or our that the their this to "
+    "we will with you your".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercased terms of `text`, without stopwords."""
+    return [t for t in _TOKEN_RE.findall((text or "").lower()) if t not in STOPWORDS]
+
+
+def posting_terms(posting, title_boost: int = 2) -> list[str]:
+    """Terms of a posting (anything with title/description/skills_desc attributes). Title terms
+    are repeated `title_boost` times so job titles weigh more than body text."""
+    return (tokenize(posting.title) * title_boost + tokenize(posting.description)
+            + tokenize(posting.skills_desc))
+
+
+def _csr(terms, docs, tfs, n_terms: int):
+    """Sort (term, doc, tf) triples by term then doc; returns (offsets, docs, tfs)."""
+    order = np.lexsort((docs, terms))
+    offsets = np.zeros(n_terms + 1, dtype=np.int64)
+    np.cumsum(np.bincount(terms, minlength=n_terms), out=offsets[1:])
+    return offsets, docs[order], tfs[order]
+
+
+class BM25Index:
+    """Inverted index over posting text with BM25 top-k search.
+
+    Storage is array-backed: per segment, the postings of term t are `docs[offsets[t]:offsets[t+1]]`
+    (internal doc numbers, sorted) with their term frequencies in the parallel `tfs` array.
+    - New documents go into a small delta segment that is rebuilt on every `add`; it is merged
+      into the main segment once it exceeds `merge_ratio` of it (or on `merge`/`save`).
+    - Re-added or removed postings are tombstoned and dropped at the next merge. Document
+      frequencies count tombstoned postings until then.
+    - `search` is term-at-a-time with MaxScore pruning: terms are processed by decreasing score
+      upper bound, and once the k-th best score so far beats the bound of all remaining terms,
+      no new document can enter the top k, so the remaining (usually long, low-idf) postings
+      lists are only probed for the current candidates by binary search instead of scanned.
+
+    Writers must not run concurrently with searches; serving code loads a saved copy with
+    `get_lexical_index`.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75, merge_ratio: float = 0.1, merge_min: int = 10_000):
+        self.k1 = k1
+        self.b = b
+        self.merge_ratio = merge_ratio
+        self.merge_min = merge_min
+        self.max_indexed_id = 0
+        self.terms = []
+        self.vocab = {}
+        self._max_tf = np.zeros(0, dtype=np.int32)
+        self.posting_ids = np.zeros(0, dtype=np.int64)
+        self._lengths = np.zeros(0, dtype=np.float32)
+        self._live = np.zeros(0, dtype=bool)
+        self._doc_of = {}
+        self._main = self._empty_segment()
+        self._main_docs = 0
+        self._delta_triples = (np.zeros(0, np.int64), np.zeros(0, np.int32), np.zeros(0, np.uint16))
+        self._delta = self._empty_segment()
+        self._lock = threading.Lock()
+        self._refresh_stats()
+
+    @staticmethod
+    def _empty_segment():
+        return np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.uint16)
+
+    def __len__(self) -> int:
+        return self._n_live
+
+    def _refresh_stats(self) -> None:
+        self._n_live = int(self._live.sum())
+        lengths = self._lengths[self._live]
+        self._avgdl = float(lengths.mean()) if len(lengths) else 1.0
+        self._min_len = float(lengths.min()) if len(lengths) else 0.0
+        # per-document BM25 length normalization, k1 * (1 - b + b * len / avgdl)
+        self._norm = (self.k1 * (1.0 - self.b + self.b * self._lengths / self._avgdl)).astype(np.float32)
+
+    def add(self, posting_ids, documents) -> None:
+        """Index documents (term lists, or strings to `tokenize`). Postings already in the index
+        are replaced."""
+        posting_ids = np.asarray(posting_ids, dtype=np.int64).reshape(-1)
+        with self._lock:
+            self._tombstone(posting_ids)
+            start = len(self.posting_ids)
+            terms, docs, tfs, lengths = [], [], [], []
+            for i, doc in enumerate(documents):
+                tokens = tokenize(doc) if isinstance(doc, str) else doc
+                counts = Counter(tokens)
+                for term, tf in counts.items():
+                    tid = self.vocab.get(term)
+                    if tid is None:
+                        tid = self.vocab[term] = len(self.terms)
+                        self.terms.append(term)
+                    terms.append(tid)
+                    tfs.append(tf)
+                docs.extend([start + i] * len(counts))
+                lengths.append(len(tokens))
+            if len(lengths) != len(posting_ids):
+                raise ValueError(f"Got {len(posting_ids)} posting ids for {len(lengths)} documents")
+
+            terms = np.asarray(terms, dtype=np.int64)
+            docs = np.asarray(docs, dtype=np.int32)
+            tfs = np.minimum(np.asarray(tfs, dtype=np.int64), np.iinfo(np.uint16).max).astype(np.uint16)
+            self.posting_ids = np.concatenate([self.posting_ids, posting_ids])
+            self._lengths = np.concatenate([self._lengths, np.asarray(lengths, dtype=np.float32)])
+            self._live = np.concatenate([self._live, np.ones(len(posting_ids), dtype=bool)])
+            self._doc_of.update(zip(posting_ids.tolist(), range(start, start + len(posting_ids))))
+            if len(posting_ids):
+                self.max_indexed_id = max(self.max_indexed_id, int(posting_ids.max()))
+
+            self._max_tf = np.concatenate([self._max_tf, np.zeros(len(self.terms) - len(self._max_tf), np.int32)])
+            np.maximum.at(self._max_tf, terms, tfs.astype(np.int32))
+            old_terms, old_docs, old_tfs = self._delta_triples
+            self._delta_triples = (np.concatenate([old_terms, terms]), np.concatenate([old_docs, docs]),
+                                   np.concatenate([old_tfs, tfs]))
+            self._delta = _csr(*self._delta_triples, len(self.terms))
+            if len(self._delta_triples[0]) > max(self.merge_min, self.merge_ratio * len(self._main[1])):
+                self._merge()
+            else:
+                self._refresh_stats()
+
+    def remove(self, posting_ids) -> int:
+        """Tombstone postings. Returns how many were in the index."""
+        with self._lock:
+            removed = self._tombstone(np.asarray(posting_ids, dtype=np.int64).reshape(-1))
+            self._refresh_stats()
+            return removed
+
+    def _tombstone(self, posting_ids) -> int:
+        removed = 0
+        for pid in posting_ids.tolist():
+            doc = self._doc_of.pop(pid, None)
+            if doc is not None:
+                self._live[doc] = False
+                removed += 1
+        return removed
+
+    def merge(self) -> None:
+        """Fold the delta segment into the main one and drop tombstoned documents."""
+        with self._lock:
+            self._merge()
+
+    def _merge(self) -> None:
+        offsets, docs, tfs = self._main
+        main_terms = np.repeat(np.arange(len(offsets) - 1, dtype=np.int64), np.diff(offsets))
+        delta_terms, delta_docs, delta_tfs = self._delta_triples
+        terms = np.concatenate([main_terms, delta_terms])
+        docs = np.concatenate([docs, delta_docs])
+        tfs = np.concatenate([tfs, delta_tfs])
+
+        keep = self._live[docs]
+        renumber = (np.cumsum(self._live) - 1).astype(np.int32)
+        terms, docs, tfs = terms[keep], renumber[docs[keep]], tfs[keep]
+        self.posting_ids = self.posting_ids[self._live]
+        self._lengths = self._lengths[self._live]
+        self._live = np.ones(len(self.posting_ids), dtype=bool)
+        self._doc_of = dict(zip(self.posting_ids.tolist(), range(len(self.posting_ids))))
+
+        self._main = _csr(terms, docs, tfs, len(self.terms))
+        self._main_docs = len(self.posting_ids)
+        self._max_tf = np.zeros(len(self.terms), dtype=np.int32)
+        np.maximum.at(self._max_tf, terms, tfs.astype(np.int32))
+        self._delta_triples = (np.zeros(0, np.int64), np.zeros(0, np.int32), np.zeros(0, np.uint16))
+        self._delta = self._empty_segment()
+        self._refresh_stats()
+
+    def _postings(self, tid: int):
+        """(docs, tfs) of a term across both segments, docs sorted (delta docs number after main)."""
+        parts = []
+        for offsets, docs, tfs in (self._main, self._delta):
+            if tid < len(offsets) - 1 and offsets[tid + 1] > offsets[tid]:
+                parts.append((docs[offsets[tid]:offsets[tid + 1]], tfs[offsets[tid]:offsets[tid + 1]]))
+        if len(parts) == 1:
+            return parts[0]
+        if not parts:
+            return None
+        return np.concatenate([parts[0][0], parts[1][0]]), np.concatenate([parts[0][1], parts[1][1]])
+
+    def search(self, query, k: int = 10, max_query_terms: int = 64, prune: bool = True):
+        """BM25 top-k for `query` (a string or term list).
+
+        Long queries such as whole resumes keep their `max_query_terms` rarest terms. With
+        `prune=False` every postings list is scanned in full (same results, for comparison).
+
+        Returns:
+            (scores, posting_ids): float32 and int64 arrays of length <= k, best first.
+        """
+        tokens = tokenize(query) if isinstance(query, str) else query
+        n, k1 = self._n_live, self.k1
+        terms = []
+        for tid in dict.fromkeys(self.vocab[t] for t in tokens if t in self.vocab):
+            postings = self._postings(tid)
+            if postings is None:
+                continue
+            # tombstoned documents stay in the postings until the next merge; count live ones only
+            df = int(np.count_nonzero(self._live[postings[0]]))
+            if df == 0:
+                continue
+            idf = max(float(np.log(1.0 + (n - df + 0.5) / (df + 0.5))), 0.0)
+            max_tf = float(self._max_tf[tid])
+            bound = idf * max_tf * (k1 + 1.0) / (max_tf + k1 * (1.0 - self.b + self.b * self._min_len / self._avgdl))
+            terms.append((bound, idf, postings))
+        if not terms or n == 0 or k <= 0:
+            return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64)
+        if len(terms) > max_query_terms:
+            terms = sorted(terms, key=lambda t: -t[1])[:max_query_terms]
+        terms.sort(key=lambda t: -t[0])
+        remaining = np.cumsum([t[0] for t in terms][::-1])[::-1]  # bound of terms i.. end
+
+        acc = np.zeros(len(self.posting_ids), dtype=np.float32)
+        live = self._live.astype(np.float32)
+        candidates = None
+        threshold = 0.0
+        for i, (_, idf, (docs, tfs)) in enumerate(terms):
+            if prune and candidates is None and threshold > remaining[i]:
+                # no document scored 0 so far can reach the top k from here on
+                candidates = np.flatnonzero(acc)
+            if candidates is None:
+                tf = tfs.astype(np.float32)
+                acc[docs] += idf * tf * (k1 + 1.0) / (tf + self._norm[docs]) * live[docs]
+                # the k-th best among this term's documents is a lower bound of the k-th best
+                # overall, and costs no more than the update above
+                if prune and i + 1 < len(terms) and len(docs) >= k:
+                    scored = acc[docs]
+                    threshold = max(threshold, float(np.partition(scored, len(scored) - k)[len(scored) - k]))
+                continue
+            candidates = candidates[acc[candidates] + remaining[i] >= threshold]
+            pos = np.minimum(np.searchsorted(docs, candidates), len(docs) - 1)
+            hit = docs[pos] == candidates
+            found, tf = candidates[hit], tfs[pos[hit]].astype(np.float32)
+            acc[found] += idf * tf * (k1 + 1.0) / (tf + self._norm[found]) * live[found]
+            scored = acc[candidates]
+            if len(scored) >= k:
+                threshold = max(threshold, float(np.partition(scored, len(scored) - k)[len(scored) - k]))
+
+        pool = candidates if candidates is not None else np.flatnonzero(acc)
+        pool = pool[acc[pool] > 0]
+        if len(pool) > k:
+            pool = pool[np.argpartition(-acc[pool], k - 1)[:k]]
+        pool = pool[np.argsort(-acc[pool], kind="stable")]
+        return acc[pool], self.posting_ids[pool]
+
+    def save(self, path: str = LEXICAL_INDEX_PATH) -> None:
+        """Merge and write the index to `path` (.npz), atomically."""
+        with self._lock:
+            self._merge()
+            offsets, docs, tfs = self._main
+            tmp = f"{path}.tmp.{os.getpid()}.npz"
+            np.savez(
+                tmp, offsets=offsets, docs=docs, tfs=tfs, posting_ids=self.posting_ids, lengths=self._lengths,
+                # terms never contain newlines, so the vocabulary is stored as one utf-8 blob
+                terms=np.frombuffer("\n".join(self.terms).encode("utf-8"), dtype=np.uint8),
+                params=np.array([self.k1, self.b, self.max_indexed_id], dtype=np.float64),
+            )
+            os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str = LEXICAL_INDEX_PATH) -> "BM25Index":
+        with np.load(path) as data:
+            k1, b, max_indexed_id = data["params"].tolist()
+            index = cls(k1=k1, b=b)
+            blob = data["terms"].tobytes().decode("utf-8")
+            index.terms = blob.split("\n") if blob else []
+            index.vocab = {term: i for i, term in enumerate(index.terms)}
+            index._main = (data["offsets"], data["docs"], data["tfs"])
+            index.posting_ids = data["posting_ids"]
+            index._lengths = data["lengths"]
+        index.max_indexed_id = int(max_indexed_id)
+        index._main_docs = len(index.posting_ids)
+        index._live = np.ones(len(index.posting_ids), dtype=bool)
+        index._doc_of = dict(zip(index.posting_ids.tolist(), range(len(index.posting_ids))))
+        offsets, docs, tfs = index._main
+        index._max_tf = np.zeros(len(index.terms), dtype=np.int32)
+        np.maximum.at(index._max_tf, np.repeat(np.arange(len(offsets) - 1), np.diff(offsets)), tfs.astype(np.int32))
+        index._refresh_stats()
+        return index
+
+
+_TEXT_COLUMNS = ["title", "description", "skills_desc"]
+
+@timed("lexical.build")
+def build_lexical_index(path: str = LEXICAL_INDEX_PATH, batch_size: int = 5000, prune_inactive: bool = False) -> BM25Index:
+    """Build the BM25 index over every posting's title, description and skills_desc and save it.
+
+    Postings are streamed with keyset pagination, so memory holds the index, not the table.
+    Like `init_faiss_index`, closed/expired postings are only left out with `prune_inactive`.
+    """
+    start = time.perf_counter()
+    index = BM25Index()
+    inactive = set(get_inactive_posting_ids().tolist()) if prune_inactive else set()
+    for rows in iter_postings(_TEXT_COLUMNS, batch_size=batch_size):
+        rows = [r for r in rows if r.id not in inactive]
+        index.add([r.id for r in rows], [posting_terms(r) for r in rows])
+    index.save(path)
+    print(f"Built lexical index over {len(index)} postings ({len(index.terms)} terms) "
+          f"in {time.perf_counter() - start:.1f}s")
+    return index
+
+@timed("lexical.update")
+def update_lexical_index(path: str = LEXICAL_INDEX_PATH, batch_size: int = 5000, prune_inactive: bool = False) -> dict:
+    """Add postings imported since the index was saved, in place; with `prune_inactive`, also
+    drop closed/expired ones. Pruning is off by default, as in `update_faiss_index`, because the
+    bundled postings are all past their expiry.
+
+    Builds the index from scratch if there is none. Returns {"rebuilt", "added", "removed"}.
+    """
+    if not os.path.exists(path):
+        index = build_lexical_index(path, batch_size=batch_size, prune_inactive=prune_inactive)
+        return {"rebuilt": True, "added": len(index), "removed": 0}
+    index = BM25Index.load(path)
+    added = 0
+    for rows in iter_postings(_TEXT_COLUMNS, batch_size=batch_size, min_id=index.max_indexed_id):
+        index.add([r.id for r in rows], [posting_terms(r) for r in rows])
+        added += len(rows)
+    removed = index.remove(get_inactive_posting_ids()) if prune_inactive else 0
+    if added or removed:
+        index.save(path)
+    return {"rebuilt": False, "added": added, "removed": removed}
+
+
+_lexical_index = None
+_lexical_index_version = None
+_lexical_index_lock = threading.Lock()
+
+def get_lexical_index(path: str = LEXICAL_INDEX_PATH) -> BM25Index:
+    """Process-wide BM25Index, reloaded when the file on disk changes."""
+    global _lexical_index, _lexical_index_version
+    version = (path, os.stat(path).st_mtime_ns)
+    with _lexical_index_lock:
+        if _lexical_index is None or version != _lexical_index_version:
+            _lexical_index, _lexical_index_version = BM25Index.load(path), version
+        return _lexical_index
+
+@timed("lexical.search")
+def search_lexical(query: str, k: int = 20, path: str = LEXICAL_INDEX_PATH):
+    """BM25 top-k postings for `query`. Returns (scores, posting_ids), best first."""
+    return get_lexical_index(path).search(query, k=k)
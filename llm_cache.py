@@ -0,0 +1,179 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from datetime import datetime
+from llm_logging import query_logged_responses
+
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(os.path.dirname(__file__), "llm_cache.db"))
+
+
+def is_deterministic(temperature=None, top_p=None) -> bool:
+    """Only greedy decoding (temperature 0) gives repeatable responses worth caching."""
+    return temperature is not None and float(temperature) == 0.0
+
+
+def _number(value):
+    """Numeric parameters as floats, so equal values (0 and 0.0, 256 and 256.0) share a key."""
+    if value is None or isinstance(value, bool):
+        return value
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def response_key(model_name: str, prompt: str, temperature=None, top_p=None, max_tokens=None) -> str:
+    params = [_number(temperature), _number(top_p), _number(max_tokens)]
+    payload = json.dumps([model_name, prompt, *params], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _parse_timestamp(value) -> float | None:
+    """Epoch seconds for the ISO timestamps written by `get_response` (which end in '+00:00Z')."""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value).removesuffix("Z")).timestamp()
+    except ValueError:
+        return None
+
+
+class LLMResponseCache:
+    """Cache of LLM responses keyed by (model, prompt, temperature, top_p, max_tokens).
+
+    - Backed by a SQLite table with the key as primary key, so lookups are indexed instead of
+      scanning the JSONL history.
+    - Entries older than `ttl_seconds` are treated as misses and purged; beyond `max_entries`
+      the least recently used entries are evicted.
+    - `warm_from_log` imports deterministic, successful calls from a `llm_history.jsonl`
+      style log, remembering the newest entry it saw so later warms only read newer ones.
+    - Only `is_deterministic` settings are cached; `get`/`put` ignore everything else.
+
+    Safe to share between threads.
+    """
+
+    def __init__(self, path: str = LLM_CACHE_PATH, ttl_seconds: float = 30 * 24 * 3600, max_entries: int = 100_000):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, model TEXT, response TEXT NOT NULL,"
+            " created REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_responses_last_used ON responses (last_used)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_responses_created ON responses (created)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS warm_state (log_path TEXT PRIMARY KEY, last_ts REAL NOT NULL)")
+        self._conn.commit()
+
+    def get(self, model_name: str, prompt: str, temperature=None, top_p=None, max_tokens=None) -> str | None:
+        """Cached response, or None on a miss (or for non-deterministic settings)."""
+        if not is_deterministic(temperature, top_p):
+            return None
+        key = response_key(model_name, prompt, temperature, top_p, max_tokens)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, model_name: str, prompt: str, response: str, temperature=None, top_p=None, max_tokens=None,
+            created: float | None = None) -> None:
+        """Store a successful response. Error responses and non-deterministic settings are skipped."""
+        self.put_many([(model_name, prompt, response, temperature, top_p, max_tokens, created)])
+
+    def put_many(self, entries) -> int:
+        """Store (model, prompt, response, temperature, top_p, max_tokens, created) tuples. Returns rows stored."""
+        now = time.time()
+        rows = []
+        for model_name, prompt, response, temperature, top_p, max_tokens, created in entries:
+            if not is_deterministic(temperature, top_p) or not isinstance(response, str) or response.startswith("ERROR:"):
+                continue
+            created = created or now
+            if now - created > self.ttl_seconds:
+                continue
+            rows.append((response_key(model_name, prompt, temperature, top_p, max_tokens), model_name, response, created, created))
+        if not rows:
+            return 0
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO responses (key, model, response, created, last_used) VALUES (?, ?, ?, ?, ?)", rows
+            )
+            self._evict(now)
+            self._conn.commit()
+        return len(rows)
+
+    def _evict(self, now: float) -> None:
+        self._conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl_seconds,))
+        count = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        if count > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_used LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+    def warm_from_log(self, log_path: str = "llm_history.jsonl") -> int:
+        """Import cacheable entries logged to `log_path` since the last warm. Returns rows stored.
+
+        Reads through the log's offset index (`llm_logging.query_logged_responses`), so later warms
+        only decode entries newer than the last one seen, across rotated segments. Only entries
+        that recorded their temperature/top_p/max_tokens can be keyed, so history written before
+        those fields were logged is skipped.
+        """
+        if not os.path.exists(log_path) and not os.path.exists(log_path + ".idx"):
+            return 0
+        abspath = os.path.abspath(log_path)
+        with self._lock:
+            row = self._conn.execute("SELECT last_ts FROM warm_state WHERE log_path = ?", (abspath,)).fetchone()
+        last_ts = row[0] if row else None
+
+        entries = []
+        newest = last_ts
+        for obj in query_logged_responses(log_path, start=last_ts):
+            created = _parse_timestamp(obj.get("timestamp"))
+            if created is not None and (newest is None or created > newest):
+                newest = created
+            if obj.get("error") or "temperature" not in obj:
+                continue
+            entries.append((obj.get("model"), obj.get("prompt"), obj.get("response"), obj.get("temperature"),
+                            obj.get("top_p"), obj.get("max_tokens"), created))
+        stored = self.put_many(entries)
+        if newest is not None:
+            with self._lock:
+                self._conn.execute("INSERT OR REPLACE INTO warm_state (log_path, last_ts) VALUES (?, ?)", (abspath, newest))
+                self._conn.commit()
+        return stored
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
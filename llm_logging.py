@@ -1,59 +1,450 @@
 import os
+import gzip
 import json
+import time
+import atexit
+import sqlite3
+import threading
+from itertools import islice
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def _entry_time(obj: dict) -> float:
+    """Epoch seconds of a log entry's ISO `timestamp` (as written by `get_response`), else now."""
+    value = obj.get("timestamp") if isinstance(obj, dict) else None
+    if value:
+        try:
+            return datetime.fromisoformat(str(value).removesuffix("Z")).timestamp()
+        except ValueError:
+            pass
+    return time.time()
+
+
+class LogStore:
+    """Buffered, rotating JSONL log with a sidecar offset index.
+
+    Files, for a log at `path` (e.g. `llm_history.jsonl`):
+    - `path` is the active segment, a plain JSONL file, so existing readers keep working.
+    - Rotated segments are renamed to `<root>.<time_ns><ext>` (and gzipped with `compress`)
+      once the active segment exceeds `max_bytes` or is older than `max_age_seconds`.
+    - `path + ".idx"` is a SQLite index of every line: segment, byte offset, length,
+      timestamp and model. Tail reads, time ranges and per-model filters look up offsets
+      there and seek straight to the matching lines instead of decoding the whole history.
+      Offsets into gzipped segments are into the decompressed stream.
+
+    Writes are buffered in memory and flushed every `flush_every` records, every
+    `flush_interval` seconds, on `flush()`/`close()`, and at interpreter exit. A flush holds an
+    exclusive lock on `path + ".lock"`, so threads and separate processes can share one log.
+    Lines appended by other writers that bypass the store are indexed when it is opened.
+
+    With `read_only`, the existing segments and index are only read: no directory, index,
+    lock file or flusher thread is created, and lines the index hasn't caught up with yet are
+    decoded from the active segment on each read instead of being indexed.
+    """
+
+    def __init__(self, path: str, flush_every: int = 100, flush_interval: float = 1.0,
+                 max_bytes: int = 64 * 2**20, max_age_seconds: float | None = 24 * 3600, compress: bool = True,
+                 read_only: bool = False):
+        self.path = path
+        self.directory = os.path.dirname(path)
+        self.name = os.path.basename(path)
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.compress = compress
+        self.read_only = read_only
+        self._buffer = []
+        self._lock = threading.RLock()
+        self._closed = False
+        if read_only:
+            self._db = self._connect_read_only(path + ".idx")
+            self._flusher = None
+            return
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+        self._db = sqlite3.connect(path + ".idx", check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS entries (segment TEXT NOT NULL, offset INTEGER NOT NULL,"
+                         " length INTEGER NOT NULL, ts REAL NOT NULL, model TEXT)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS ix_entries_ts ON entries (ts)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS ix_entries_model_ts ON entries (model, ts)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS ix_entries_segment ON entries (segment, offset)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS segments (name TEXT PRIMARY KEY, created REAL NOT NULL,"
+                         " indexed_bytes INTEGER NOT NULL, active INTEGER NOT NULL)")
+        self._db.commit()
+        with self._file_lock():
+            self._index_unindexed_lines()
+        self._flusher = threading.Thread(target=self._flush_periodically, name="log-flusher", daemon=True)
+        self._flusher.start()
+
+    @staticmethod
+    def _connect_read_only(idx_path: str):
+        """Open the index without writing to disk, or None if there is no index yet."""
+        if not os.path.exists(idx_path):
+            return None
+        uri = "file:" + os.path.abspath(idx_path)
+        # a WAL index with no -wal file has no live writer and can be opened as immutable, which
+        # creates no -wal/-shm files; otherwise read through the writer's existing ones
+        uri += "?mode=ro" if os.path.exists(idx_path + "-wal") else "?immutable=1"
+        return sqlite3.connect(uri, uri=True, check_same_thread=False, timeout=30)
+
+    def _unindexed_entries(self) -> list:
+        """(ts, model, entry) for complete lines of the active segment past `indexed_bytes`."""
+        if not os.path.exists(self.path):
+            return []
+        indexed = 0
+        if self._db is not None:
+            with self._lock:
+                row = self._db.execute("SELECT indexed_bytes FROM segments WHERE name = ?", (self.name,)).fetchone()
+            indexed = row[0] if row else 0
+        if os.path.getsize(self.path) < indexed:
+            # replaced since it was indexed; the index entries for it are stale
+            indexed = 0
+        entries = []
+        with open(self.path, "rb") as fh:
+            fh.seek(indexed)
+            for raw in fh:
+                if not raw.endswith(b"\n"):
+                    break
+                try:
+                    obj = json.loads(raw)
+                except json.JSONDecodeError:
+                    continue
+                entries.append((_entry_time(obj), obj.get("model") if isinstance(obj, dict) else None, obj))
+        return entries
+
+    @contextmanager
+    def _file_lock(self):
+        """Exclusive cross-process lock (plus the in-process lock) for writing segments."""
+        with self._lock:
+            with open(self.path + ".lock", "a+b") as fh:
+                if fcntl is not None:
+                    fcntl.flock(fh, fcntl.LOCK_EX)
+                else:
+                    fh.seek(0)
+                    msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+                try:
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(fh, fcntl.LOCK_UN)
+                    else:
+                        fh.seek(0)
+                        msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _segment_path(self, segment: str) -> str:
+        return os.path.join(self.directory, segment)
+
+    def _active_segment(self):
+        """(created, indexed_bytes) of the active segment, registering it if needed."""
+        row = self._db.execute("SELECT created, indexed_bytes FROM segments WHERE name = ?", (self.name,)).fetchone()
+        if row is None:
+            created = os.path.getmtime(self.path) if os.path.exists(self.path) else time.time()
+            self._db.execute("INSERT INTO segments (name, created, indexed_bytes, active) VALUES (?, ?, 0, 1)",
+                             (self.name, created))
+            return created, 0
+        return row
+
+    def _index_unindexed_lines(self) -> None:
+        """Index complete lines past `indexed_bytes` in the active segment (e.g. a pre-existing log)."""
+        _, indexed = self._active_segment()
+        if os.path.exists(self.path) and os.path.getsize(self.path) < indexed:
+            # the file was replaced behind our back; forget its old index entries
+            self._db.execute("DELETE FROM entries WHERE segment = ?", (self.name,))
+            indexed = 0
+        rows = []
+        if os.path.exists(self.path):
+            with open(self.path, "rb") as fh:
+                fh.seek(indexed)
+                for raw in fh:
+                    if not raw.endswith(b"\n"):
+                        break
+                    try:
+                        obj = json.loads(raw)
+                    except json.JSONDecodeError:
+                        obj = None
+                    if obj is not None:
+                        rows.append((self.name, indexed, len(raw), _entry_time(obj),
+                                     obj.get("model") if isinstance(obj, dict) else None))
+                    indexed += len(raw)
+        self._db.executemany("INSERT INTO entries (segment, offset, length, ts, model) VALUES (?, ?, ?, ?, ?)", rows)
+        self._db.execute("UPDATE segments SET indexed_bytes = ? WHERE name = ?", (indexed, self.name))
+        self._db.commit()
+
+    def append(self, obj: dict) -> None:
+        """Queue one JSON object for writing."""
+        if self.read_only:
+            raise ValueError(f"Log {self.path} was opened read-only")
+        line = (json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            self._buffer.append((line, _entry_time(obj), obj.get("model") if isinstance(obj, dict) else None))
+            if len(self._buffer) >= self.flush_every:
+                self.flush()
+
+    def flush(self) -> None:
+        """Write buffered records to the active segment and index them."""
+        with self._lock:
+            if not self._buffer:
+                return
+            buffered, self._buffer = self._buffer, []
+            with self._file_lock():
+                self._maybe_rotate()
+                # pick up lines other processes/writers appended without indexing them
+                self._index_unindexed_lines()
+                try:
+                    with open(self.path, "ab") as fh:
+                        start = fh.seek(0, os.SEEK_END)
+                        fh.write(b"".join(line for line, _, _ in buffered))
+                except OSError:
+                    self._buffer[:0] = buffered
+                    raise
+                rows = []
+                offset = start
+                for line, ts, model in buffered:
+                    rows.append((self.name, offset, len(line), ts, model))
+                    offset += len(line)
+                self._db.executemany("INSERT INTO entries (segment, offset, length, ts, model) VALUES (?, ?, ?, ?, ?)", rows)
+                self._db.execute("UPDATE segments SET indexed_bytes = ? WHERE name = ?", (offset, self.name))
+                self._db.commit()
+
+    def _maybe_rotate(self) -> None:
+        created, _ = self._active_segment()
+        if not os.path.exists(self.path):
+            return
+        size = os.path.getsize(self.path)
+        too_big = self.max_bytes is not None and size >= self.max_bytes
+        too_old = self.max_age_seconds is not None and time.time() - created >= self.max_age_seconds
+        if size == 0 or not (too_big or too_old):
+            return
+        self._rotate()
+
+    def rotate(self) -> str | None:
+        """Flush, close the active segment and start a new one. Returns the rotated segment name."""
+        if self.read_only:
+            raise ValueError(f"Log {self.path} was opened read-only")
+        self.flush()
+        with self._file_lock():
+            return self._rotate()
+
+    def _rotate(self) -> str | None:
+        # caller holds the file lock
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return None
+        self._index_unindexed_lines()
+        root, ext = os.path.splitext(self.name)
+        rotated = f"{root}.{time.time_ns():020d}{ext}"
+        os.replace(self.path, self._segment_path(rotated))
+        if self.compress:
+            with open(self._segment_path(rotated), "rb") as src, gzip.open(self._segment_path(rotated + ".gz"), "wb") as dst:
+                while chunk := src.read(1 << 20):
+                    dst.write(chunk)
+            os.remove(self._segment_path(rotated))
+            rotated += ".gz"
+        self._db.execute("UPDATE entries SET segment = ? WHERE segment = ?", (rotated, self.name))
+        self._db.execute("UPDATE segments SET name = ?, active = 0 WHERE name = ?", (rotated, self.name))
+        self._db.execute("INSERT INTO segments (name, created, indexed_bytes, active) VALUES (?, ?, 0, 1)",
+                         (self.name, time.time()))
+        self._db.commit()
+        return rotated
+
+    def _flush_periodically(self) -> None:
+        while not self._closed:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Warning: failed to flush log {self.path}: {e}")
+
+    def close(self) -> None:
+        self._closed = True
+        self.flush()
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+
+    def segments(self) -> list[str]:
+        """Segment names, oldest first (the active segment last)."""
+        if self._db is None:
+            return [self.name]
+        rows = self._db.execute("SELECT name FROM segments ORDER BY active, created").fetchall()
+        names = [name for (name,) in rows]
+        return names if self.name in names else names + [self.name]
+
+    def _open_segment(self, segment: str):
+        path = self._segment_path(segment)
+        if segment.endswith(".gz"):
+            return gzip.open(path, "rb")
+        try:
+            return open(path, "rb")
+        except FileNotFoundError:
+            # compressed by a concurrent rotation since the index was read
+            return gzip.open(path + ".gz", "rb")
+
+    def _read_locations(self, locations) -> list:
+        """Decode the lines at (segment, offset, length) locations, preserving their order."""
+        by_segment = {}
+        for i, (segment, offset, length) in enumerate(locations):
+            by_segment.setdefault(segment, []).append((offset, length, i))
+        results = [None] * len(locations)
+        for segment, items in by_segment.items():
+            with self._open_segment(segment) as fh:
+                # ascending offsets keep gzip seeks forward-only
+                for offset, length, i in sorted(items):
+                    fh.seek(offset)
+                    try:
+                        results[i] = json.loads(fh.read(length))
+                    except json.JSONDecodeError:
+                        pass
+        return [r for r in results if r is not None]
+
+    def query(self, start: float | None = None, end: float | None = None, model: str | None = None,
+              limit: int | None = None, newest_first: bool = False) -> list:
+        """Entries with `start <= ts < end` (epoch seconds), optionally for one model, in time order."""
+        self.flush()
+        clauses, params = [], []
+        if start is not None:
+            clauses.append("ts >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append("ts < ?")
+            params.append(end)
+        if model is not None:
+            clauses.append("model = ?")
+            params.append(model)
+        sql = "SELECT segment, offset, length FROM entries"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY ts DESC, rowid DESC" if newest_first else " ORDER BY ts, rowid"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        locations = []
+        if self._db is not None:
+            with self._lock:
+                locations = self._db.execute(sql, params).fetchall()
+        results = self._read_locations(locations)
+        if not self.read_only:
+            return results
+
+        # a read-only store can't index new lines, so match them here
+        extra = [(ts, obj) for ts, entry_model, obj in self._unindexed_entries()
+                 if (start is None or ts >= start) and (end is None or ts < end)
+                 and (model is None or entry_model == model)]
+        if not extra:
+            return results
+        # (ts, position in the log) keeps ties in write order, as ORDER BY ts, rowid does
+        order = range(len(results) - 1, -1, -1) if newest_first else range(len(results))
+        merged = [(_entry_time(obj), pos, obj) for pos, obj in zip(order, results)]
+        merged += [(ts, len(results) + i, obj) for i, (ts, obj) in enumerate(extra)]
+        merged.sort(key=lambda item: (item[0], item[1]), reverse=newest_first)
+        return [obj for _, _, obj in merged[:limit]]
+
+    def tail(self, n: int, model: str | None = None) -> list:
+        """The last `n` entries (optionally for one model), oldest first."""
+        return list(reversed(self.query(model=model, limit=n, newest_first=True)))
+
+    def stream(self):
+        """Yield every entry from the oldest segment to the newest."""
+        self.flush()
+        for segment in self.segments():
+            try:
+                fh = self._open_segment(segment)
+            except FileNotFoundError:
+                continue
+            with fh:
+                for raw in fh:
+                    raw = raw.strip()
+                    if not raw:
+                        continue
+                    try:
+                        yield json.loads(raw)
+                    except json.JSONDecodeError:
+                        print(f"Warning: failed to decode JSON line in {segment}; skipping")
+
+
+_stores: dict[str, LogStore] = {}
+_stores_lock = threading.Lock()
+
+def get_log_store(path: str, **options) -> LogStore:
+    """Process-wide LogStore for `path`, created on first use."""
+    key = os.path.abspath(path)
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = LogStore(path, **options)
+        return _stores[key]
+
+@atexit.register
+def _close_log_stores() -> None:
+    for store in list(_stores.values()):
+        try:
+            store.close()
+        except Exception:
+            pass
+
+
 def _append_jsonl(path: str, obj: dict) -> None:
     """
     Append a single JSON object as a line to `path` (JSON Lines / NDJSON).
 
-    - Creates parent directory if needed.
-    - Uses utf-8 and ensures we don't load the whole file into memory.
+    Goes through the buffered `LogStore` for `path`, so the line may reach disk up to the
+    store's flush interval later (and at the latest at interpreter exit).
     """
-    directory = os.path.dirname(path)
-    if directory:
-        os.makedirs(directory, exist_ok=True)
-    # Ensure we write a single JSON object per line
-    with open(path, "a", encoding="utf-8") as fh:
-        fh.write(json.dumps(obj, ensure_ascii=False) + "\n")
+    get_log_store(path).append(obj)
+
+
+@contextmanager
+def _log_reader(path: str):
+    """The store to read `path` through: this process's writer if it has one (so buffered
+    entries are included), else a read-only store that is closed afterwards."""
+    with _stores_lock:
+        store = _stores.get(os.path.abspath(path))
+    if store is not None:
+        yield store
+        return
+    store = LogStore(path, read_only=True)
+    try:
+        yield store
+    finally:
+        store.close()
 
 
 def read_logged_responses(path: str, max_entries: int | None = None) -> list:
     """
-    Read a JSONL log file produced by `_append_jsonl` and return a list of dicts.
+    Read a JSONL log produced by `_append_jsonl` and return a list of dicts.
 
     - Skips empty lines and continues past JSON-decoding errors (prints a warning).
     - `max_entries` can be used to limit how many entries are read (from the start).
+    - Rotated segments are included, oldest first.
     """
-    results = []
-    if not os.path.exists(path):
-        return results
-    with open(path, "r", encoding="utf-8") as fh:
-        for i, line in enumerate(fh):
-            if max_entries is not None and i >= max_entries:
-                break
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                obj = json.loads(line)
-                results.append(obj)
-            except json.JSONDecodeError:
-                print(f"Warning: failed to decode JSON line {i+1} in {path}; skipping")
-                continue
-    return results
+    return list(islice(stream_logged_responses(path), max_entries))
 
 
 def stream_logged_responses(path: str):
-    """Generator that yields decoded JSON objects from a JSONL log file.
-    Useful for large files where you don't want to load everything into memory.
+    """Generator that yields decoded JSON objects from a JSONL log, including rotated segments
+    (oldest first). Useful for large files where you don't want to load everything into memory.
     """
-    if not os.path.exists(path):
+    if not os.path.exists(path) and not os.path.exists(path + ".idx"):
         return
-    with open(path, "r", encoding="utf-8") as fh:
-        for i, line in enumerate(fh):
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                yield json.loads(line)
-            except json.JSONDecodeError:
-                print(f"Warning: failed to decode JSON line {i+1} in {path}; skipping")
-                continue
\ No newline at end of file
+    with _log_reader(path) as store:
+        yield from store.stream()
+
+
+def tail_logged_responses(path: str, n: int = 10, model: str | None = None) -> list:
+    """The last `n` logged entries (optionally for one model), oldest first, read via the offset index."""
+    with _log_reader(path) as store:
+        return store.tail(n, model=model)
+
+
+def query_logged_responses(path: str, start: float | None = None, end: float | None = None,
+                           model: str | None = None, limit: int | None = None) -> list:
+    """Logged entries with timestamps in [start, end) (epoch seconds), optionally for one model."""
+    with _log_reader(path) as store:
+        return store.query(start=start, end=end, model=model, limit=limit)
@@ -1,9 +1,15 @@
 import os
 import time
+import random
+import asyncio
+import threading
+import weakref
 from datetime import datetime, UTC
 from dotenv import load_dotenv
-from openai import OpenAI
+import httpx
+from openai import OpenAI, AsyncOpenAI
 from llm_logging import _append_jsonl, read_logged_responses
+from llm_cache import LLMResponseCache, is_deterministic
 
 # Load environment variables from .env file
 load_dotenv()
@@ -12,9 +18,49 @@ client = OpenAI(api_key =GEMINI_API_KEY)
 client.base_url = os.getenv("GEMINI_API_BASE_URL") # 'https://generativelanguage.googleapis.com/v1beta/openai
 
 # Define the models and hyperparameters to test using LiteLLM model strings
+# Set LLM_CACHE=0 to disable the response cache
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE", "1") != "0"
+_response_cache = None
+_warmed_logs = set()
+_response_cache_lock = threading.Lock()
+
+def get_response_cache(log_file: str | None = "llm_history.jsonl") -> LLMResponseCache:
+    """The process-wide LLM response cache, warmed from `log_file` the first time it is seen."""
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = LLMResponseCache()
+        if log_file and log_file not in _warmed_logs:
+            _warmed_logs.add(log_file)
+            try:
+                _response_cache.warm_from_log(log_file)
+            except Exception as e:
+                print(f"    Warning: failed to warm LLM cache from {log_file}: {e}")
+        return _response_cache
+
+def _cache_response(response_cache, model_name: str, prompt: str, result: str, max_tokens, temperature, top_p) -> None:
+    # a cache write failure should not turn a successful call into a retry or an error
+    try:
+        response_cache.put(model_name, prompt, result, temperature, top_p, max_tokens)
+    except Exception as e:
+        print(f"    Warning: failed to write LLM cache: {e}")
+
+def _log_entry(model_name: str, prompt: str, response: str, max_tokens, temperature, top_p) -> dict:
+    # the sampling parameters are logged so the history can warm the response cache
+    return {
+        "timestamp": datetime.now(UTC).isoformat() + "Z",
+        "model": model_name,
+        "prompt": prompt,
+        "response": response,
+        "error": isinstance(response, str) and response.startswith("ERROR:"),
+        "max_tokens": max_tokens,
+        "temperature": temperature,
+        "top_p": top_p,
+    }
+
 def get_response(model_name : str, prompt : str,  # main parameters
                  max_tokens = None, temperature = None, top_p = None, # optional hyperparameters
-                 logging: bool = True, log_file: str = "llm_history.jsonl") -> str:
+                 logging: bool = True, log_file: str = "llm_history.jsonl", cache: bool = True) -> str:
     """
     Get a response from the specified model.
 
@@ -26,10 +72,19 @@ def get_response(model_name : str, prompt : str,  # main parameters
         temperature (float, optional): The temperature for sampling.
         top_p (float, optional): The nucleus sampling probability.
         logging (bool, optional): Whether to log errors and retries. Defaults to True.
+        cache (bool, optional): Whether to serve/store the response from the response cache. Only
+            deterministic calls (temperature=0) are cached. Defaults to True.
 
     Returns:
         str: The response from the model, or an error message beginning with "ERROR:" if the request fails.
     """
+    response_cache = None
+    if cache and LLM_CACHE_ENABLED and is_deterministic(temperature, top_p):
+        response_cache = get_response_cache(log_file if logging else None)
+        cached = response_cache.get(model_name, prompt, temperature, top_p, max_tokens)
+        if cached is not None:
+            return cached
+
     messages = [{"role": "user", "content": prompt}]
     
     api_params = {}
@@ -46,42 +101,188 @@ def get_response(model_name : str, prompt : str,  # main parameters
         try:
             response = client.chat.completions.create(model=model_name, messages=messages, **api_params)
             result = response.choices[0].message.content or "ERROR: NO_RESPONSE_FROM_MODEL"
-            # Log the prompt/response pair (append as JSON line)
-            if logging:
-                try:
-                    _append_jsonl(log_file, {
-                        "timestamp": datetime.now(UTC).isoformat() + "Z",
-                        "model": model_name,
-                        "prompt": prompt,
-                        "response": result,
-                        "error": isinstance(result, str) and result.startswith("ERROR:") == True
-                    })
-                except Exception as e:
-                    # Logging should not interrupt main flow; print a warning
-                    print(e)
-                    print(f"    Warning: failed to write log to {log_file}")
-            return result
         except Exception as e:
             print(f"    An API error occurred with {model_name}: {e}")
             if i < retries - 1:
                 print(f"    Retrying in {delay * (i + 1)} seconds...")
                 time.sleep(delay * (i + 1))
-            else:
-                err = f"ERROR: Failed after {retries} retries. Last error: {e}"
-                if logging:
-                    try:
-                        _append_jsonl(log_file, {
-                            "timestamp": datetime.now(UTC).isoformat() + "Z",
-                            "model": model_name,
-                            "prompt": prompt,
-                            "response": err,
-                            "error": True
-                        })
-                    except Exception:
-                        print(f"    Warning: failed to write log to {log_file}")
-                return err
+                continue
+            err = f"ERROR: Failed after {retries} retries. Last error: {e}"
+            if logging:
+                try:
+                    _append_jsonl(log_file, _log_entry(model_name, prompt, err, max_tokens, temperature, top_p))
+                except Exception:
+                    print(f"    Warning: failed to write log to {log_file}")
+            return err
+        if response_cache is not None:
+            _cache_response(response_cache, model_name, prompt, result, max_tokens, temperature, top_p)
+        # Log the prompt/response pair (append as JSON line)
+        if logging:
+            try:
+                _append_jsonl(log_file, _log_entry(model_name, prompt, result, max_tokens, temperature, top_p))
+            except Exception as e:
+                # Logging should not interrupt main flow; print a warning
+                print(e)
+                print(f"    Warning: failed to write log to {log_file}")
+        return result
     return f"ERROR: Model {model_name} failed to respond after multiple retries."
 
+# Async client settings. Requests per second are enforced per model with a token bucket;
+# LLM_RATE_LIMITS overrides individual models, e.g. "models/gemini-2.5-pro=0.5,models/gemini-2.0-flash=5".
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_REQUESTS_PER_SECOND = float(os.getenv("LLM_REQUESTS_PER_SECOND", "2"))
+LLM_RATE_LIMITS = {
+    name.strip(): float(rate)
+    for name, rate in (item.split("=", 1) for item in os.getenv("LLM_RATE_LIMITS", "").split(",") if "=" in item)
+}
+
+
+class TokenBucket:
+    """Token-bucket rate limiter for asyncio callers.
+
+    Each `acquire` reserves one token (the balance may go negative) and then sleeps until that
+    token would have been refilled, so concurrent callers are spaced out at `rate` per second
+    with bursts of up to `capacity`. It holds no asyncio primitives, so one bucket can be
+    shared across event loops.
+    """
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _reserve(self) -> float:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    async def acquire(self) -> None:
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+_buckets: dict[str, TokenBucket] = {}
+# the httpx pool and semaphore belong to one event loop, so keep one per running loop
+_async_clients = weakref.WeakKeyDictionary()
+_semaphores = weakref.WeakKeyDictionary()
+
+def _bucket_for(model_name: str) -> TokenBucket:
+    if model_name not in _buckets:
+        _buckets[model_name] = TokenBucket(LLM_RATE_LIMITS.get(model_name, LLM_REQUESTS_PER_SECOND))
+    return _buckets[model_name]
+
+def get_async_client() -> AsyncOpenAI:
+    """AsyncOpenAI client for the running event loop, sharing one pooled HTTP connection set.
+
+    Uses GEMINI_API_KEY / GEMINI_API_BASE_URL, so pointing GEMINI_API_BASE_URL at a local stub
+    server is enough to exercise the async path without the real API.
+    """
+    loop = asyncio.get_running_loop()
+    if loop not in _async_clients:
+        limits = httpx.Limits(max_connections=LLM_MAX_CONCURRENCY, max_keepalive_connections=LLM_MAX_CONCURRENCY)
+        _async_clients[loop] = AsyncOpenAI(
+            api_key=GEMINI_API_KEY or "unset",
+            base_url=os.getenv("GEMINI_API_BASE_URL"),
+            http_client=httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(60.0, connect=10.0)),
+            max_retries=0,  # retries are handled in aget_response
+        )
+    return _async_clients[loop]
+
+def _semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    if loop not in _semaphores:
+        _semaphores[loop] = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    return _semaphores[loop]
+
+async def aget_response(model_name : str, prompt : str,  # main parameters
+                        max_tokens = None, temperature = None, top_p = None, # optional hyperparameters
+                        logging: bool = True, log_file: str = "llm_history.jsonl", cache: bool = True,
+                        retries: int = 3, base_delay: float = 1.0, max_delay: float = 30.0) -> str:
+    """
+    Async version of `get_response`.
+
+    Calls share one pooled AsyncOpenAI client per event loop, run at most LLM_MAX_CONCURRENCY
+    at a time, and are rate limited per model by a token bucket. Failed calls are retried
+    with full-jitter exponential backoff: a random delay in [0, min(max_delay, base_delay * 2**attempt)].
+    Deterministic calls are served from / stored in the response cache as in `get_response`;
+    the cache's SQLite calls (and its first warm from `log_file`) run in a worker thread so
+    they don't block the event loop.
+
+    Returns:
+        str: The response from the model, or an error message beginning with "ERROR:" if the request fails.
+    """
+    response_cache = None
+    if cache and LLM_CACHE_ENABLED and is_deterministic(temperature, top_p):
+        response_cache = await asyncio.to_thread(get_response_cache, log_file if logging else None)
+        cached = await asyncio.to_thread(response_cache.get, model_name, prompt, temperature, top_p, max_tokens)
+        if cached is not None:
+            return cached
+
+    messages = [{"role": "user", "content": prompt}]
+
+    api_params = {}
+    if max_tokens is not None:
+        api_params["max_tokens"] = max_tokens
+    if temperature is not None:
+        api_params["temperature"] = temperature
+    if top_p is not None:
+        api_params["top_p"] = top_p
+
+    client = get_async_client()
+    last_error = None
+    for i in range(retries):
+        try:
+            await _bucket_for(model_name).acquire()
+            async with _semaphore():
+                response = await client.chat.completions.create(model=model_name, messages=messages, **api_params)
+            result = response.choices[0].message.content or "ERROR: NO_RESPONSE_FROM_MODEL"
+        except Exception as e:
+            last_error = e
+            print(f"    An API error occurred with {model_name}: {e}")
+            if i < retries - 1:
+                await asyncio.sleep(random.uniform(0, min(max_delay, base_delay * 2 ** i)))
+            continue
+        if response_cache is not None:
+            await asyncio.to_thread(_cache_response, response_cache, model_name, prompt, result,
+                                    max_tokens, temperature, top_p)
+        break
+    else:
+        result = f"ERROR: Failed after {retries} retries. Last error: {last_error}"
+
+    if logging:
+        try:
+            await asyncio.to_thread(_append_jsonl, log_file,
+                                    _log_entry(model_name, prompt, result, max_tokens, temperature, top_p))
+        except Exception:
+            print(f"    Warning: failed to write log to {log_file}")
+    return result
+
+async def gather_responses(requests: list[dict], **defaults) -> list[str]:
+    """
+    Run many `aget_response` calls concurrently and return the responses in request order.
+
+    Args:
+        requests (list[dict]): keyword arguments for each call, e.g.
+            {"model_name": "models/gemini-2.0-flash", "prompt": "..."}.
+        **defaults: keyword arguments applied to every request unless it overrides them.
+    """
+    return await asyncio.gather(*(aget_response(**{**defaults, **req}) for req in requests))
+
+def get_responses(requests: list[dict], **defaults) -> list[str]:
+    """Blocking wrapper around `gather_responses` for synchronous callers."""
+    async def run():
+        try:
+            return await gather_responses(requests, **defaults)
+        finally:
+            client = _async_clients.pop(asyncio.get_running_loop(), None)
+            if client is not None:
+                await client.close()
+    return asyncio.run(run())
+
 def list_models():
     """List available models from the Gemini API."""
     try:
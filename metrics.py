@@ -0,0 +1,123 @@
+"""
+Lightweight per-stage timings and counters for the ingest, embed, index and recommend paths.
+
+Off by default; set METRICS=1 to record. When METRICS_PATH is also set, a snapshot is appended
+to that file as one JSON line at exit (or whenever `dump_metrics` is called).
+"""
+import os
+import sys
+import json
+import time
+import atexit
+import threading
+import functools
+from collections import deque
+import numpy as np
+
+METRICS_PATH = os.getenv("METRICS_PATH")
+# Durations kept per stage for percentiles; counts and totals cover every call
+METRICS_SAMPLE_SIZE = int(os.getenv("METRICS_SAMPLE_SIZE", "10000"))
+
+_enabled = os.getenv("METRICS", "0").lower() in ("1", "true", "yes")
+_lock = threading.Lock()
+_stages = {}
+_counters = {}
+
+
+def set_enabled(enabled: bool = True) -> None:
+    global _enabled
+    _enabled = bool(enabled)
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def record(stage: str, seconds: float, error: bool = False) -> None:
+    """Record one run of `stage` that took `seconds`."""
+    with _lock:
+        entry = _stages.get(stage)
+        if entry is None:
+            entry = _stages[stage] = {"count": 0, "errors": 0, "total_s": 0.0,
+                                      "samples": deque(maxlen=METRICS_SAMPLE_SIZE)}
+        entry["count"] += 1
+        entry["errors"] += bool(error)
+        entry["total_s"] += seconds
+        entry["samples"].append(seconds)
+
+
+def incr(name: str, n: int = 1) -> None:
+    """Add `n` to counter `name` (e.g. rows written). A no-op unless metrics are enabled."""
+    if _enabled:
+        with _lock:
+            _counters[name] = _counters.get(name, 0) + n
+
+
+def timed(stage: str):
+    """Decorator recording the wall time of every call as `stage` while metrics are enabled.
+
+    When disabled the only overhead is one flag check per call.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            error = False
+            try:
+                return fn(*args, **kwargs)
+            except BaseException:
+                error = True
+                raise
+            finally:
+                record(stage, time.perf_counter() - start, error)
+        return wrapper
+    return decorator
+
+
+def peak_rss_mb() -> float | None:
+    """Peak resident set size of this process so far, in MB (None where unsupported)."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024.0 * 1024.0) if sys.platform == "darwin" else peak / 1024.0
+
+
+def snapshot() -> dict:
+    """Current metrics: per stage count, errors, total/mean time and p50/p95/p99 (ms); counters;
+    peak RSS."""
+    with _lock:
+        stages = {name: dict(entry, samples=np.asarray(entry["samples"])) for name, entry in _stages.items()}
+        counters = dict(_counters)
+    result = {}
+    for name, entry in sorted(stages.items()):
+        ms = entry.pop("samples") * 1000.0
+        entry["mean_ms"] = entry["total_s"] * 1000.0 / entry["count"]
+        entry.update({f"p{q}_ms": float(np.percentile(ms, q)) for q in (50, 95, 99)})
+        result[name] = entry
+    return {"stages": result, "counters": counters, "peak_rss_mb": peak_rss_mb()}
+
+
+def reset() -> None:
+    with _lock:
+        _stages.clear()
+        _counters.clear()
+
+
+def dump_metrics(path: str | None = METRICS_PATH) -> dict:
+    """Append a timestamped snapshot to `path` as a JSON line (if given) and return it."""
+    snap = dict(snapshot(), time=time.time(), pid=os.getpid())
+    if path:
+        with open(path, "a", encoding="utf-8") as fh:
+            fh.write(json.dumps(snap) + "\n")
+    return snap
+
+
+@atexit.register
+def _dump_at_exit() -> None:
+    if _enabled and METRICS_PATH and (_stages or _counters):
+        dump_metrics(METRICS_PATH)
@@ -1,20 +1,276 @@
-from embed import embed_resume
-from index import search_faiss
-from database import get_postings_by_ids
+import os
+import numpy as np
+from sqlalchemy import select
+from embed import embed_resume, embed_resumes
+from index import search_faiss, search_faiss_batch
+from lexical_index import search_lexical
+from metrics import timed, incr
+from database import engine, fetch_postings, Skill, JobSkill
 """
-placeholder recommender module
+Two-stage recommender: FAISS similarity search (phase 1), then a structured re-ranker (phase 2).
 """
 
-def recommend(resume):
-    scores, ids = phase1_recommend(resume)
+# Ordinal scale for `formatted_experience_level`
+EXPERIENCE_LEVELS = {
+    "internship": 0,
+    "entry level": 1,
+    "associate": 2,
+    "mid-senior level": 3,
+    "director": 4,
+    "executive": 5,
+}
 
-def phase1_recommend(resume):
+# Weight of each phase-2 signal. Signals the candidate gave no preference for are dropped.
+DEFAULT_WEIGHTS = {
+    "similarity": 1.0,
+    "salary": 0.3,
+    "experience": 0.3,
+    "remote": 0.2,
+    "location": 0.2,
+    "skills": 0.4,
+}
+
+# Fuse BM25 matches on posting text into phase 1 (set HYBRID_SEARCH=0 for embeddings only)
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "1") != "0"
+# Reciprocal rank fusion constant; 60 is the usual choice and damps the weight of the very top ranks
+RRF_K = 60
+
+def reciprocal_rank_fusion(rankings, weights=None, rrf_k: int = RRF_K):
+    """Fuse ranked id lists: each id scores sum(weight / (rrf_k + rank)), rank starting at 1.
+
+    Only ranks are used, so BM25 and cosine scores don't need to be on the same scale. -1
+    entries (FAISS padding) are ignored. Returns (scores, ids) sorted best first.
+    """
+    weights = weights or [1.0] * len(rankings)
+    ids, contributions = [], []
+    for ranking, weight in zip(rankings, weights):
+        ranking = np.asarray(ranking, dtype=np.int64).reshape(-1)
+        ranks = np.flatnonzero(ranking != -1)
+        ids.append(ranking[ranks])
+        contributions.append(weight / (rrf_k + 1.0 + ranks))
+    unique, inverse = np.unique(np.concatenate(ids), return_inverse=True)
+    scores = np.bincount(inverse, weights=np.concatenate(contributions), minlength=len(unique))
+    order = np.argsort(-scores, kind="stable")
+    return scores[order], unique[order]
+
+_warned_no_lexical_index = False
+
+def _hybrid(resume: str, dense_scores, dense_ids, k: int):
+    """Fuse one resume's FAISS results with its BM25 results into a top-k (scores, ids) pair.
+
+    Fused scores are divided by the best possible one, so 1.0 means ranked first by both and
+    the phase-2 similarity weight keeps its meaning. Falls back to the FAISS results if no
+    lexical index has been built.
+    """
+    global _warned_no_lexical_index
+    try:
+        _, lexical_ids = search_lexical(resume, k=k)
+    except FileNotFoundError:
+        if not _warned_no_lexical_index:
+            print("Warning: no lexical index found, using embedding search only (run build_lexical_index)")
+            _warned_no_lexical_index = True
+        return dense_scores, dense_ids
+    scores, ids = reciprocal_rank_fusion([dense_ids, lexical_ids])
+    scores, ids = scores[:k] / (2.0 / (RRF_K + 1.0)), ids[:k]
+    return scores.astype(np.float32), ids
+
+@timed("recommend")
+def recommend(resume, preferences: dict | None = None, k: int = 20):
+    """Recommend postings for a resume: FAISS top-k, re-ranked by `phase2_recommend`."""
+    scores, ids = phase1_recommend(resume, k=k)
+    keep = ids[0] != -1
+    return phase2_recommend(resume, ids[0][keep], scores=scores[0][keep], preferences=preferences)
+
+@timed("recommend.phase1")
+def phase1_recommend(resume, k: int = 20, hybrid: bool = HYBRID_SEARCH):
+    """FAISS top-k for a resume, fused with BM25 top-k over posting text when `hybrid`.
+    Returns (scores, ids) arrays of shape (1, k), padded with -1 ids."""
     embedding = embed_resume(resume)
-    scores, ids = search_faiss(embedding, k=20)
+    scores, ids = search_faiss(embedding, k=k)
+    if hybrid:
+        fused_scores, fused_ids = _hybrid(resume, scores[0], ids[0], k)
+        scores = np.full((1, k), -np.inf, dtype=np.float32)
+        ids = np.full((1, k), -1, dtype=np.int64)
+        scores[0, :len(fused_ids)], ids[0, :len(fused_ids)] = fused_scores, fused_ids
     return scores, ids
 
-def phase2_recommend(resume, candidate_ids):
-    postings = get_postings_by_ids(candidate_ids)
-    scores = []
-    ids = []
-    return scores, ids
\ No newline at end of file
+@timed("recommend.many")
+def recommend_many(resumes: list[str], k: int = 20, batch_size: int = 256, hybrid: bool = HYBRID_SEARCH):
+    """Phase-1 recommendations for a whole batch of resumes.
+
+    Resumes are embedded in batches and each batch is scored with one FAISS search over an
+    (M, d) query matrix, then fused with BM25 per resume when `hybrid`. Returns one
+    (scores, ids) pair of 1-D arrays per resume, in input order, with FAISS's -1 padding removed.
+    """
+    incr("recommend.many.resumes", len(resumes))
+    results = []
+    for i in range(0, len(resumes), batch_size):
+        batch = resumes[i:i + batch_size]
+        embeddings = embed_resumes(batch)
+        scores, ids = search_faiss_batch(np.vstack(embeddings), k=k)
+        for resume, row_scores, row_ids in zip(batch, scores, ids):
+            keep = row_ids != -1
+            row_scores, row_ids = row_scores[keep], row_ids[keep]
+            if hybrid:
+                row_scores, row_ids = _hybrid(resume, row_scores, row_ids, k)
+            results.append((row_scores, row_ids))
+    return results
+
+_skill_table = None
+
+def _load_skill_table():
+    """Skill vocabulary and per-job skill bitmasks from the `skills`/`job_skills` tables.
+
+    There are fewer than 64 skill categories, so each job's skills fit in one uint64 and
+    overlap is a bitwise AND plus popcount. Returns (skill_bits, skill_names, job_ids, masks):
+    dicts of skill_abr -> bit and skill_abr -> name, and the job ids (sorted, int64) with their
+    uint64 masks.
+    """
+    global _skill_table
+    if _skill_table is None:
+        import pandas as pd
+        with engine.connect() as conn:
+            skills = conn.execute(select(Skill.skill_abr, Skill.skill_name).order_by(Skill.skill_abr)).all()
+            job_skills = pd.DataFrame(conn.execute(select(JobSkill.job_id, JobSkill.skill_abr)).all(),
+                                      columns=["job_id", "skill_abr"])
+        skill_bits = {abr: i for i, (abr, _) in enumerate(skills)}
+        skill_names = dict(skills)
+        job_skills = job_skills.assign(
+            job_id=pd.to_numeric(job_skills["job_id"], errors="coerce"),
+            bit=job_skills["skill_abr"].map(skill_bits),
+        ).dropna()
+        # (job_id, skill_abr) is the table's primary key, so summing distinct single-bit masks is the same as OR-ing them
+        per_job = (
+            pd.DataFrame({
+                "job_id": job_skills["job_id"].astype(np.int64).to_numpy(),
+                "mask": np.left_shift(np.uint64(1), job_skills["bit"].astype(np.uint64).to_numpy()),
+            })
+            .groupby("job_id")["mask"]
+            .sum()
+        )
+        _skill_table = (skill_bits, skill_names, per_job.index.to_numpy(np.int64), per_job.to_numpy(np.uint64))
+    return _skill_table
+
+def skill_mask(skill_abrs) -> np.uint64:
+    """Bitmask for a list of skill abbreviations (e.g. ["IT", "ENG"])."""
+    skill_bits, _, _, _ = _load_skill_table()
+    mask = np.uint64(0)
+    for abr in skill_abrs:
+        if abr in skill_bits:
+            mask |= np.uint64(1) << np.uint64(skill_bits[abr])
+    return mask
+
+def job_skill_masks(job_ids) -> np.ndarray:
+    """uint64 skill masks for an array of job ids (0 for jobs without skills)."""
+    _, _, known_ids, known_masks = _load_skill_table()
+    job_ids = np.asarray(job_ids, dtype=np.int64)
+    if len(known_ids) == 0:
+        return np.zeros(len(job_ids), dtype=np.uint64)
+    where = np.minimum(np.searchsorted(known_ids, job_ids), len(known_ids) - 1)
+    return np.where(known_ids[where] == job_ids, known_masks[where], np.uint64(0))
+
+def _load_candidate_block(candidate_ids) -> dict:
+    """Column arrays of the fields phase 2 scores on, aligned with `candidate_ids`."""
+    import pandas as pd
+    candidate_ids = np.asarray(candidate_ids, dtype=np.int64)
+    frame = fetch_postings(candidate_ids, columns=[
+        "job_id", "normalized_salary", "formatted_experience_level", "remote_allowed", "location"], output="frame")
+    frame = frame.reindex(candidate_ids)
+    return {
+        "job_id": pd.to_numeric(frame["job_id"], errors="coerce").fillna(-1).to_numpy(np.int64),
+        "normalized_salary": pd.to_numeric(frame["normalized_salary"], errors="coerce").to_numpy(np.float64),
+        "experience_level": frame["formatted_experience_level"].str.lower().map(EXPERIENCE_LEVELS).to_numpy(np.float64),
+        "remote_allowed": pd.to_numeric(frame["remote_allowed"], errors="coerce").fillna(0).to_numpy() > 0,
+        "location": frame["location"].fillna("").str.lower().to_numpy(dtype=object),
+    }
+
+def score_candidates(block: dict, similarity, preferences: dict, weights: dict | None = None) -> np.ndarray:
+    """Combined phase-2 score for a block of candidates, as array math over the whole block.
+
+    Args:
+        block: Column arrays from `_load_candidate_block` (job_id, normalized_salary,
+            experience_level, remote_allowed, location), all of length k.
+        similarity: Phase-1 similarity scores, length k: cosine similarities from FAISS or
+            normalized fusion scores from hybrid search.
+        preferences: See `phase2_recommend`.
+        weights: Per-signal weights, defaults to DEFAULT_WEIGHTS.
+
+    Every signal is scaled to [0, 1]; postings missing a field get a neutral 0.5 for it.
+    Similarity is clipped to [0, 1], so a negative cosine counts as no similarity.
+    """
+    weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+    similarity = np.clip(np.nan_to_num(np.asarray(similarity, dtype=np.float64), nan=0.0), 0.0, 1.0)
+    total = weights["similarity"] * similarity
+
+    target = preferences.get("target_salary")
+    if target:
+        salary = np.clip(block["normalized_salary"] / float(target), 0.0, 1.0)
+        total += weights["salary"] * np.where(np.isnan(salary), 0.5, salary)
+
+    level = preferences.get("experience_level")
+    if level is not None:
+        wanted = EXPERIENCE_LEVELS.get(str(level).lower())
+        if wanted is not None:
+            distance = np.abs(block["experience_level"] - wanted) / max(EXPERIENCE_LEVELS.values())
+            total += weights["experience"] * np.where(np.isnan(distance), 0.5, 1.0 - distance)
+
+    if preferences.get("remote") is not None:
+        total += weights["remote"] * (block["remote_allowed"] == bool(preferences["remote"]))
+
+    location = preferences.get("location")
+    if location:
+        # "City, ST": same city scores 1, same state 0.5
+        location = location.lower().strip()
+        state = location.rsplit(",", 1)[-1].strip()
+        locations = block["location"].astype(str)
+        same_city = locations == location
+        same_state = np.char.endswith(locations, ", " + state)
+        total += weights["location"] * np.where(same_city, 1.0, np.where(same_state, 0.5, 0.0))
+
+    wanted_skills = preferences.get("skills")
+    if wanted_skills:
+        wanted_mask = skill_mask(wanted_skills)
+        if wanted_mask:
+            overlap = np.bitwise_count(job_skill_masks(block["job_id"]) & wanted_mask)
+            total += weights["skills"] * overlap / float(np.bitwise_count(wanted_mask))
+
+    return total
+
+def infer_skills(resume: str) -> list[str]:
+    """Skill abbreviations whose names appear in the resume text (e.g. "Sales", "Marketing")."""
+    _, skill_names, _, _ = _load_skill_table()
+    text = (resume or "").lower()
+    return [abr for abr, name in skill_names.items() if name.lower() in text]
+
+@timed("recommend.phase2")
+def phase2_recommend(resume, candidate_ids, scores=None, preferences: dict | None = None, weights: dict | None = None):
+    """Re-rank phase-1 candidates using structured posting signals.
+
+    Args:
+        resume: Resume text; used to infer skills when `preferences` has none.
+        candidate_ids: Posting ids from phase 1.
+        scores: Phase-1 similarity scores aligned with `candidate_ids` (zeros if omitted).
+        preferences: Optional candidate targets:
+            - target_salary: desired annual salary, compared with `normalized_salary`
+            - experience_level: e.g. "Entry level", compared with `formatted_experience_level`
+            - remote: True/False, compared with `remote_allowed`
+            - location: "City, ST", compared with `location`
+            - skills: skill abbreviations (the `skills` table), overlapped with the job's `job_skills`
+        weights: Overrides for DEFAULT_WEIGHTS.
+
+    Returns:
+        (scores, ids): numpy arrays sorted by combined score, best first.
+    """
+    candidate_ids = np.asarray(candidate_ids, dtype=np.int64)
+    if len(candidate_ids) == 0:
+        return np.empty(0, dtype=np.float64), candidate_ids
+    if scores is None:
+        scores = np.zeros(len(candidate_ids))
+    preferences = dict(preferences or {})
+    if not preferences.get("skills"):
+        preferences["skills"] = infer_skills(resume)
+
+    block = _load_candidate_block(candidate_ids)
+    combined = score_candidates(block, scores, preferences, weights)
+    order = np.argsort(-combined, kind="stable")
+    return combined[order], candidate_ids[order]
@@ -0,0 +1,27 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Point the module-level engine, caches and API client at throwaway locations before any
+# repo module is imported.
+_TMP = tempfile.mkdtemp(prefix="synapse-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMP, 'postings.db')}"
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+os.environ.setdefault("GEMINI_API_BASE_URL", "http://127.0.0.1:9/v1")
+os.environ["EMBEDDING_CACHE"] = "0"
+os.environ["LLM_CACHE"] = "0"
+os.environ["METRICS"] = "0"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def fresh_db():
+    """An empty database with the current schema."""
+    import database
+
+    database.Base.metadata.drop_all(database.engine)
+    database.init_db()
+    yield database
+    database.Base.metadata.drop_all(database.engine)
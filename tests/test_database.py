@@ -0,0 +1,76 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from sqlalchemy import text
+
+
+@pytest.mark.parametrize("profile, expected", [
+    ("default", {"journal_mode": "delete", "synchronous": 2, "temp_store": 0, "mmap_size": 0}),
+    ("performance", {"journal_mode": "wal", "synchronous": 1, "temp_store": 2, "mmap_size": 256 * 1024 * 1024,
+                     "cache_size": -64000}),
+    ("durable", {"journal_mode": "wal", "synchronous": 2, "temp_store": 2, "mmap_size": 256 * 1024 * 1024,
+                 "cache_size": -64000}),
+])
+def test_profiles_apply_their_pragmas(tmp_path, profile, expected):
+    import database
+
+    engine = database.make_engine(f"sqlite:///{tmp_path / 'profile.db'}", profile)
+    try:
+        with engine.connect() as conn:
+            applied = {name: conn.execute(text(f"PRAGMA {name}")).scalar() for name in expected}
+    finally:
+        engine.dispose()
+    assert applied == expected
+
+
+def test_default_profile_is_sqlite_defaults_unless_opted_in():
+    def profile_for(env):
+        code = "import database; print(database.DATABASE_PROFILE)"
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        return subprocess.run([sys.executable, "-c", code], cwd=root, env=env, capture_output=True,
+                              text=True, check=True).stdout.strip()
+
+    env = {k: v for k, v in os.environ.items() if k != "DATABASE_PROFILE"}
+    assert profile_for(env) == "default"
+    assert profile_for(dict(env, DATABASE_PROFILE="performance")) == "performance"
+
+
+@pytest.fixture
+def many_postings(fresh_db):
+    with fresh_db.engine.begin() as conn:
+        conn.execute(fresh_db.Posting.__table__.insert(), [
+            {"id": i, "job_id": str(i), "title": f"Job {i}", "description": "long text",
+             "work_type": "FULL_TIME" if i % 2 else "CONTRACT"} for i in range(1, 2001)
+        ])
+    return fresh_db
+
+
+def test_fetch_postings_keeps_the_requested_order(many_postings):
+    database = many_postings
+    # more ids than one IN (...) chunk, in rank order rather than id order, plus a missing id
+    wanted = list(range(2000, 0, -1))
+    wanted.insert(10, 999_999)
+
+    rows = database.fetch_postings(wanted, columns=["title"])
+    assert [row.id for row in rows] == list(range(2000, 0, -1))
+    assert rows[0].title == "Job 2000" and "description" not in rows[0]._fields
+
+    dicts = database.fetch_postings([7, 3], columns=["title", "work_type"], output="dicts")
+    assert dicts == [{"id": 7, "title": "Job 7", "work_type": "FULL_TIME"},
+                     {"id": 3, "title": "Job 3", "work_type": "FULL_TIME"}]
+    frame = database.fetch_postings([4, 2], columns=["title"], output="frame")
+    assert frame.index.tolist() == [4, 2] and frame["title"].tolist() == ["Job 4", "Job 2"]
+
+
+def test_iter_postings_pages_by_id(many_postings):
+    database = many_postings
+    batches = list(database.iter_postings(["title"], batch_size=300))
+    assert [len(batch) for batch in batches] == [300] * 6 + [200]
+    assert [row.id for batch in batches for row in batch] == list(range(1, 2001))
+
+    contracts = [row.id for batch in database.iter_postings(
+        ["work_type"], batch_size=128, where=database.Posting.work_type == "CONTRACT", min_id=1000)
+        for row in batch]
+    assert contracts == list(range(1002, 2001, 2))
@@ -0,0 +1,37 @@
+import itertools
+
+import numpy as np
+
+import embedding_cache
+from embedding_cache import EmbeddingCache
+
+
+def test_memory_hits_count_as_uses_for_eviction(tmp_path, monkeypatch):
+    clock = itertools.count(1000)
+    monkeypatch.setattr(embedding_cache.time, "time", lambda: float(next(clock)))
+    # room for three 16-byte vectors; a fourth evicts one
+    cache = EmbeddingCache(str(tmp_path / "cache.db"), max_bytes=60)
+    for key in ("a", "b", "c"):
+        cache.put(key, np.ones(4))
+
+    assert cache.get("a") is not None  # served from memory
+    cache.put("d", np.ones(4))
+
+    keys = {key for (key,) in cache._conn.execute("SELECT key FROM embeddings")}
+    assert keys == {"a", "c", "d"}
+
+
+def test_close_persists_memory_hits(tmp_path, monkeypatch):
+    clock = itertools.count(1000)
+    monkeypatch.setattr(embedding_cache.time, "time", lambda: float(next(clock)))
+    path = str(tmp_path / "cache.db")
+    cache = EmbeddingCache(path)
+    cache.put("a", np.ones(4))
+    (before,) = cache._conn.execute("SELECT last_used FROM embeddings").fetchone()
+    cache.get("a")
+    cache.close()
+
+    reopened = EmbeddingCache(path)
+    (after,) = reopened._conn.execute("SELECT last_used FROM embeddings").fetchone()
+    reopened.close()
+    assert after > before
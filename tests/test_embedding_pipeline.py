@@ -0,0 +1,99 @@
+import threading
+
+import numpy as np
+import pytest
+
+from embedding_store import EmbeddingStore
+
+
+def _embed(posts):
+    return [np.full(4, post.id, dtype=np.float32) for post in posts]
+
+
+@pytest.fixture
+def postings(fresh_db):
+    with fresh_db.engine.begin() as conn:
+        conn.execute(fresh_db.Posting.__table__.insert(),
+                     [{"id": i, "job_id": str(i), "title": f"Job {i}"} for i in range(1, 201)])
+    return fresh_db
+
+
+def _run_with_timeout(fn, timeout=30.0):
+    outcome = {}
+
+    def run():
+        try:
+            outcome["result"] = fn()
+        except BaseException as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "embed_all_postings deadlocked"
+    return outcome
+
+
+def test_embed_all_postings_fills_store_and_db(postings, tmp_path):
+    store = EmbeddingStore(str(tmp_path / "embeddings"))
+    outcome = _run_with_timeout(lambda: postings.embed_all_postings(
+        batch_size=7, workers=3, queue_size=1, store=store, embed_fn=_embed))
+
+    assert outcome == {"result": 200}
+    ids, embeddings = postings.load_embedding_matrix()
+    assert ids.tolist() == list(range(1, 201))
+    assert (embeddings[:, 0] == ids).all()
+    assert sorted(np.asarray(store.open()[0]).tolist()) == list(range(1, 201))
+
+
+def test_embed_all_postings_stops_when_the_writer_fails(postings, tmp_path):
+    class FailingStore(EmbeddingStore):
+        def append(self, ids, vectors, model=None):
+            raise OSError("disk full")
+
+    store = FailingStore(str(tmp_path / "embeddings"))
+    outcome = _run_with_timeout(lambda: postings.embed_all_postings(
+        batch_size=5, workers=2, queue_size=1, store=store, embed_fn=_embed))
+
+    assert isinstance(outcome.get("error"), OSError)
+    # nothing was committed for vectors the store never got
+    ids, _ = postings.load_embedding_matrix()
+    assert len(ids) == 0
+
+
+def test_embed_all_postings_resumes_after_an_interrupted_run(postings, tmp_path):
+    class CrashingStore(EmbeddingStore):
+        """Fails on the fourth batch, as if the process died part-way through the run."""
+        appends = 0
+
+        def append(self, ids, vectors, model=None):
+            CrashingStore.appends += 1
+            if CrashingStore.appends == 4:
+                raise KeyboardInterrupt
+            return super().append(ids, vectors, model=model)
+
+    path = str(tmp_path / "embeddings")
+    outcome = _run_with_timeout(lambda: postings.embed_all_postings(
+        batch_size=10, workers=2, queue_size=1, store=CrashingStore(path), embed_fn=_embed))
+    assert isinstance(outcome.get("error"), KeyboardInterrupt)
+    done_first, _ = postings.load_embedding_matrix()
+    assert 0 < len(done_first) < 200
+
+    embedded = []
+
+    def embed(posts):
+        embedded.extend(post.id for post in posts)
+        return _embed(posts)
+
+    store = EmbeddingStore(path)
+    outcome = _run_with_timeout(lambda: postings.embed_all_postings(
+        batch_size=10, workers=2, queue_size=1, store=store, embed_fn=embed))
+
+    # only what the first run did not commit is embedded again
+    assert outcome == {"result": 200 - len(done_first)}
+    assert not set(embedded) & set(done_first.tolist())
+    ids, embeddings = postings.load_embedding_matrix()
+    assert ids.tolist() == list(range(1, 201))
+    assert (embeddings[:, 0] == ids).all()
+    found, vectors = store.lookup(np.arange(1, 201))
+    assert found.all() and (vectors[:, 0] == np.arange(1, 201)).all()
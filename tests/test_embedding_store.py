@@ -0,0 +1,36 @@
+import numpy as np
+
+from embedding_store import EmbeddingStore
+
+
+def _vectors(n, dim=4, start=0):
+    return np.arange(start, start + n * dim, dtype=np.float32).reshape(n, dim)
+
+
+def test_append_keeps_the_latest_row_per_posting_and_survives_reopen(tmp_path):
+    path = str(tmp_path / "embeddings")
+    store = EmbeddingStore(path)
+    assert store.append([1, 2, 3], _vectors(3), model="m1") == 3
+    assert store.append([2, 4], _vectors(2, start=100), model="m2") == 5
+
+    assert store.latest_positions().tolist() == [0, 2, 3, 4]
+    ids = np.concatenate([block[0] for block in store.iter_blocks(block_size=2)])
+    assert ids.tolist() == [1, 3, 2, 4]
+
+    reopened = EmbeddingStore(path)
+    assert (reopened.count, reopened.dim, reopened.model) == (5, 4, "m2")
+    found, vectors = reopened.lookup([4, 2, 7, 1])
+    assert found.tolist() == [True, True, False, True]
+    np.testing.assert_array_equal(vectors, np.vstack([_vectors(2, start=100)[::-1], _vectors(1)]))
+
+
+def test_store_from_another_database_is_reset(tmp_path):
+    path = str(tmp_path / "embeddings")
+    EmbeddingStore(path, database="sqlite:////data/a.db").append([1, 2], _vectors(2))
+
+    assert EmbeddingStore(path, database="sqlite:////data/a.db").count == 2
+    other = EmbeddingStore(path, database="sqlite:////data/b.db")
+    assert other.count == 0
+    other.append([5], _vectors(1))
+    assert EmbeddingStore(path).count == 1
+    assert EmbeddingStore(path, database="sqlite:////data/a.db").count == 0
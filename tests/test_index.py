@@ -0,0 +1,210 @@
+import os
+
+import faiss
+import numpy as np
+import pytest
+
+from embedding_store import EmbeddingStore
+from index import base_index, init_faiss_index, update_faiss_index
+
+
+def _vectors(n, dim=16, seed=0):
+    vectors = np.random.default_rng(seed).standard_normal((n, dim)).astype("float32")
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def _top1(index, queries):
+    nlist = getattr(base_index(index), "nlist", None)
+    params = faiss.SearchParametersIVF(nprobe=nlist) if nlist else None
+    return index.search(queries, 1, params=params)[1][:, 0]
+
+
+@pytest.mark.parametrize("index_type", ["flat", "ivfflat", "ivfpq"])
+def test_update_returns_right_ids_after_replace(fresh_db, tmp_path, index_type):
+    store = EmbeddingStore(str(tmp_path / "embeddings"))
+    path = str(tmp_path / "faiss.index")
+    ids, original = np.arange(1, 4001), _vectors(4000)
+    store.append(ids, original)
+    options = {"nlist": 16, "pq_m": 8} if index_type == "ivfpq" else {"nlist": 16} if index_type == "ivfflat" else {}
+    init_faiss_index(store=store, path=path, index_type=index_type, **options)
+
+    # re-embed 100 existing postings and add 10 new ones
+    replaced_ids, new_ids = np.arange(1, 101), np.arange(4001, 4011)
+    replaced, new = _vectors(100, seed=1), _vectors(10, seed=2)
+    store.append(np.concatenate([replaced_ids, new_ids]), np.vstack([replaced, new]))
+    stats = update_faiss_index(store=store, path=path)
+
+    assert stats["rebuilt"] is False
+    assert stats["replaced"] == 100 and stats["added"] == 10
+    index = faiss.read_index(path)
+    assert index.ntotal == 4010
+    if index_type != "ivfpq":  # PQ codes are too lossy for exact top-1 checks
+        assert _top1(index, new).tolist() == new_ids.tolist()
+        assert _top1(index, replaced).tolist() == replaced_ids.tolist()
+        assert _top1(index, original[500:600]).tolist() == ids[500:600].tolist()
+    else:
+        top1 = _top1(index, new)
+        assert set(top1.tolist()) <= set(range(1, 4011))
+        assert np.isin(top1, new_ids).mean() >= 0.8
+
+
+def test_update_prunes_inactive_postings_only_when_asked(fresh_db, tmp_path):
+    store = EmbeddingStore(str(tmp_path / "embeddings"))
+    path = str(tmp_path / "faiss.index")
+    with fresh_db.engine.begin() as conn:
+        conn.execute(fresh_db.Posting.__table__.insert(), [
+            {"id": 1, "job_id": "1", "expiry": "1000", "closed_time": None},  # expired in 1970
+            {"id": 2, "job_id": "2", "expiry": None, "closed_time": "2000"},
+            {"id": 3, "job_id": "3", "expiry": None, "closed_time": None},
+        ])
+    store.append([1, 2, 3], _vectors(3))
+    init_faiss_index(store=store, path=path)
+
+    assert update_faiss_index(store=store, path=path)["removed"] == 0
+    assert faiss.read_index(path).ntotal == 3
+    assert update_faiss_index(store=store, path=path, prune_inactive=True)["removed"] == 2
+    assert faiss.vector_to_array(faiss.read_index(path).id_map).tolist() == [3]
+
+
+def test_attribute_selector_rejects_ids_past_the_bitmap(tmp_path):
+    from index import AttributeIndex
+
+    path = str(tmp_path / "attrs.npz")
+    np.savez(path, **{
+        "remote=1": np.array([3, 9, 15], dtype=np.int64),
+        "__salary_ids": np.zeros(0, dtype=np.int64),
+        "__salary_values": np.zeros(0, dtype=np.float64),
+        "__max_id": np.array([15], dtype=np.int64),
+    })
+    sel, matching = AttributeIndex(path).selector({"remote": True})
+
+    assert matching == 3
+    assert [i for i in range(64) if sel.is_member(i)] == [3, 9, 15]
+    # 16 bits fit in 2 bytes; everything past them must be rejected, not read out of bounds
+    assert not any(sel.is_member(i) for i in (16, 17, 23, 24, 1000))
+
+
+def test_attribute_filters_accept_numeric_values(fresh_db, tmp_path):
+    from index import AttributeIndex, build_attribute_index
+
+    with fresh_db.engine.begin() as conn:
+        conn.execute(fresh_db.Posting.__table__.insert(), [
+            {"id": 1, "job_id": "1", "fips": "08069"},
+            {"id": 2, "job_id": "2", "fips": "34021"},
+            {"id": 3, "job_id": "3", "fips": "6075.0"},
+        ])
+        conn.execute(fresh_db.JobIndustry.__table__.insert(), [
+            {"job_id": "1", "industry_id": 4},
+            {"job_id": "3", "industry_id": 4},
+        ])
+    path = str(tmp_path / "attrs.npz")
+    build_attribute_index(path)
+    attrs = AttributeIndex(path)
+
+    for fips in (8069, 8069.0, "8069", "08069"):
+        assert attrs.ids({"fips": fips}).tolist() == [1]
+    assert attrs.ids({"fips": 6075}).tolist() == [3]
+    assert attrs.ids({"industry_id": 4}).tolist() == attrs.ids({"industry_id": "4"}).tolist() == [1, 3]
+
+
+def test_attribute_index_is_built_lazily_without_auxiliary_tables(fresh_db, tmp_path):
+    from index import attribute_index_path, get_attribute_index
+
+    fresh_db.JobIndustry.__table__.drop(fresh_db.engine)
+    with fresh_db.engine.begin() as conn:
+        conn.execute(fresh_db.Posting.__table__.insert(), [
+            {"id": i, "job_id": str(i), "work_type": "FULL_TIME"} for i in (1, 2, 3)
+        ])
+    store = EmbeddingStore(str(tmp_path / "embeddings"))
+    path = str(tmp_path / "faiss.index")
+    store.append([1, 2, 3], _vectors(3))
+    init_faiss_index(store=store, path=path)
+    assert not os.path.exists(attribute_index_path(path))
+
+    attrs = get_attribute_index(attribute_index_path(path), path)
+    assert attrs.ids({"work_type": "FULL_TIME"}).tolist() == [1, 2, 3]
+    assert attrs.ids({"industry_id": 4}).tolist() == []
+
+    # an index update makes the attribute lists stale, so the next lookup rebuilds them
+    with fresh_db.engine.begin() as conn:
+        conn.execute(fresh_db.Posting.__table__.insert(), [{"id": 4, "job_id": "4", "work_type": "FULL_TIME"}])
+    store.append([4], _vectors(1, seed=1))
+    update_faiss_index(store=store, path=path)
+    attrs = get_attribute_index(attribute_index_path(path), path)
+    assert attrs.ids({"work_type": "FULL_TIME"}).tolist() == [1, 2, 3, 4]
+
+
+def test_rebuild_fallbacks_keep_the_index_type_and_options(fresh_db, tmp_path):
+    path = str(tmp_path / "faiss.index")
+    store = EmbeddingStore(str(tmp_path / "embeddings"))
+    store.append(np.arange(1, 201), _vectors(200))
+    init_faiss_index(store=store, path=path, index_type="hnsw", hnsw_m=8, ef_search=40)
+
+    # HNSW cannot remove the old vector of a re-embedded posting, so the update rebuilds
+    store.append([1], _vectors(1, seed=1))
+    assert update_faiss_index(store=store, path=path)["rebuilt"] is True
+    index = faiss.read_index(path)  # keep the IndexIDMap alive while its base index is used
+    hnsw = base_index(index)
+    assert isinstance(hnsw, faiss.IndexHNSWFlat)
+    assert hnsw.hnsw.efSearch == 40 and hnsw.hnsw.nb_neighbors(0) == 2 * 8
+
+    # a smaller store means it was reset, which also rebuilds
+    init_faiss_index(store=store, path=path, index_type="ivfflat", nlist=8)
+    reset = EmbeddingStore(str(tmp_path / "reset"))
+    reset.append(np.arange(1, 101), _vectors(100, seed=2))
+    assert update_faiss_index(store=reset, path=path)["rebuilt"] is True
+    index = faiss.read_index(path)
+    assert isinstance(index, faiss.IndexIVFFlat) and index.nlist == 8 and index.ntotal == 100
+
+
+@pytest.mark.parametrize("index_type, options", [
+    ("ivfflat", {"nlist": 16}),
+    ("hnsw", {"hnsw_m": 16}),
+    ("ivfpq", {"nlist": 16, "pq_m": 16}),
+])
+def test_approximate_indexes_match_flat_when_searched_exhaustively(fresh_db, tmp_path, index_type, options):
+    from index import FaissIndexManager
+
+    store = EmbeddingStore(str(tmp_path / "embeddings"))
+    store.append(np.arange(1, 2001), _vectors(2000))
+    queries = _vectors(20, seed=5)
+    results = {}
+    for kind, kind_options in (("flat", {}), (index_type, options)):
+        path = str(tmp_path / f"{kind}.index")
+        init_faiss_index(store=store, path=path, index_type=kind, **kind_options)
+        _, ids = FaissIndexManager(path).search(queries, 10, nprobe=16, ef_search=2000)
+        results[kind] = ids
+
+    if index_type == "ivfpq":  # PQ codes are approximate even when every list is probed
+        recall = np.mean([len(set(a) & set(b)) / 10 for a, b in zip(results["flat"], results[index_type])])
+        assert recall >= 0.9
+    else:
+        assert results[index_type].tolist() == results["flat"].tolist()
+
+
+@pytest.mark.parametrize("use_mmap", [False, True])
+def test_index_manager_reloads_when_the_file_changes(tmp_path, use_mmap):
+    from index import FaissIndexManager, write_index_atomic
+
+    def flat(ids, vectors):
+        index = faiss.IndexIDMap(faiss.IndexFlatIP(vectors.shape[1]))
+        index.add_with_ids(vectors, np.asarray(ids, dtype=np.int64))
+        return index
+
+    path = str(tmp_path / "faiss.index")
+    vectors = _vectors(10)
+    write_index_atomic(flat(range(1, 11), vectors), path)
+    manager = FaissIndexManager(path, use_mmap=use_mmap, check_interval=3600)
+    assert manager.search(vectors[:1], 1)[1][0, 0] == 1
+
+    write_index_atomic(flat(range(101, 111), vectors), path)
+    # not reloaded before the check interval has passed
+    assert manager.search(vectors[:1], 1)[1][0, 0] == 1
+    manager.check_interval = 0
+    assert manager.search(vectors[:1], 1)[1][0, 0] == 101
+    assert manager.reload() is False  # unchanged since
+
+    # a missing file keeps the loaded index serving
+    os.remove(path)
+    assert manager.search(vectors[:1], 1)[1][0, 0] == 101
@@ -0,0 +1,75 @@
+import pandas as pd
+
+from database import Benefit, Posting, Salary
+
+
+def test_bulk_import_postings_with_missing_columns(fresh_db, tmp_path):
+    # no med_salary, views, applies, company_id, ... columns at all
+    csv_path = tmp_path / "postings.csv"
+    pd.DataFrame({
+        "job_id": ["1", "2"],
+        "title": ["Data Engineer", "Nurse"],
+        "min_salary": ["100,000", None],
+        "max_salary": ["120000", None],
+    }).to_csv(csv_path, index=False)
+
+    assert fresh_db.bulk_import_postings_from_csv(str(csv_path)) == 2
+    with fresh_db.Session() as session:
+        rows = {p.job_id: p for p in session.query(Posting)}
+    assert rows["1"].normalized_salary == 110000.0
+    assert rows["1"].views is None and rows["1"].company_id is None
+    assert rows["2"].normalized_salary is None
+
+
+def test_bulk_import_postings_upserts_on_job_id(fresh_db, tmp_path):
+    csv_path = tmp_path / "postings.csv"
+    pd.DataFrame({"job_id": ["1"], "title": ["Old"], "company_id": ["1234.0"]}).to_csv(csv_path, index=False)
+    fresh_db.bulk_import_postings_from_csv(str(csv_path))
+    pd.DataFrame({"job_id": ["1"], "title": ["New"], "company_id": ["1234.0"]}).to_csv(csv_path, index=False)
+    fresh_db.bulk_import_postings_from_csv(str(csv_path))
+
+    with fresh_db.Session() as session:
+        postings = session.query(Posting).all()
+    assert [(p.title, p.company_id) for p in postings] == [("New", "1234")]
+
+
+def test_bulk_import_table_with_missing_and_empty_columns(fresh_db, tmp_path):
+    # no med_salary/compensation_type columns, and currency is empty throughout
+    csv_path = tmp_path / "salaries.csv"
+    pd.DataFrame({
+        "salary_id": ["1", "2", ""],
+        "job_id": ["10", "11", "12"],
+        "max_salary": ["90,000", None, "1"],
+        "min_salary": ["70000", "20", "1"],
+        "pay_period": ["YEARLY", "HOURLY", "YEARLY"],
+        "currency": [None, None, None],
+    }).to_csv(csv_path, index=False)
+    benefits_path = tmp_path / "benefits.csv"
+    pd.DataFrame({"job_id": ["10", "10"], "type": ["401(k)", "Dental"]}).to_csv(benefits_path, index=False)
+
+    assert fresh_db.bulk_import_table_from_csv(Salary, str(csv_path)) == 2  # the row without a salary_id is dropped
+    assert fresh_db.bulk_import_table_from_csv(Benefit, str(benefits_path)) == 2
+    assert fresh_db.get_salaries_for_jobs(["10", "11"]) == {
+        "10": [(70000.0, None, 90000.0, "YEARLY", None, None)],
+        "11": [(20.0, None, None, "HOURLY", None, None)],
+    }
+    assert fresh_db.get_benefits_for_jobs(["10"]) == {"10": ["401(k)", "Dental"]}
+
+
+
+def test_bulk_import_computes_normalized_salary_from_the_salary_columns(fresh_db, tmp_path):
+    # the CSV's own normalized_salary (e.g. an annualized hourly rate) is ignored, as in
+    # import_postings_from_csv: med, else the average of min and max, else min, else max
+    csv_path = tmp_path / "postings.csv"
+    pd.DataFrame({
+        "job_id": ["1", "2", "3", "4", "5"],
+        "med_salary": ["50", None, None, None, None],
+        "min_salary": [None, "100", "100", None, None],
+        "max_salary": [None, "200", None, "300", None],
+        "normalized_salary": ["104000", "150", "208000", "624000", "90000"],
+    }).to_csv(csv_path, index=False)
+
+    fresh_db.bulk_import_postings_from_csv(str(csv_path))
+    with fresh_db.Session() as session:
+        salaries = {p.job_id: p.normalized_salary for p in session.query(Posting)}
+    assert salaries == {"1": 50.0, "2": 150.0, "3": 100.0, "4": 300.0, "5": None}
@@ -0,0 +1,43 @@
+import numpy as np
+
+from lexical_index import BM25Index, build_lexical_index, search_lexical, update_lexical_index
+
+
+def test_update_keeps_inactive_postings_unless_pruning(fresh_db, tmp_path):
+    with fresh_db.engine.begin() as conn:
+        conn.execute(fresh_db.Posting.__table__.insert(), [
+            {"id": 1, "job_id": "1", "title": "Python developer", "expiry": "1000", "closed_time": None},
+            {"id": 2, "job_id": "2", "title": "Registered nurse", "expiry": None, "closed_time": "2000"},
+        ])
+    path = str(tmp_path / "lexical_index.npz")
+    build_lexical_index(path)
+    with fresh_db.engine.begin() as conn:
+        conn.execute(fresh_db.Posting.__table__.insert(), [
+            {"id": 3, "job_id": "3", "title": "Python data engineer", "expiry": "1000", "closed_time": None},
+        ])
+
+    assert update_lexical_index(path) == {"rebuilt": False, "added": 1, "removed": 0}
+    assert sorted(search_lexical("python", path=path)[1].tolist()) == [1, 3]
+    assert update_lexical_index(path, prune_inactive=True)["removed"] == 3
+    assert len(search_lexical("python", path=path)[1]) == 0
+
+
+def _assert_pruned_matches_exhaustive(index, query, k):
+    scores, ids = index.search(query, k=k)
+    full_scores, full_ids = index.search(query, k=k, prune=False)
+    assert ids.tolist() == full_ids.tolist()
+    np.testing.assert_allclose(scores, full_scores, rtol=1e-6)
+    return ids.tolist()
+
+
+def test_search_after_remove_ignores_tombstoned_documents():
+    index = BM25Index()
+    index.add([1, 2, 3, 4], ["python developer", "python nurse", "python sales", "java sales"])
+    index.remove([1, 2])
+
+    ids = _assert_pruned_matches_exhaustive(index, "python sales", k=2)
+    assert ids == [3, 4]
+
+    index.add([5], ["python sales"])
+    ids = _assert_pruned_matches_exhaustive(index, "python", k=10)
+    assert sorted(ids) == [3, 5]
@@ -0,0 +1,15 @@
+from llm_cache import LLMResponseCache, response_key
+
+
+def test_response_key_normalizes_numeric_parameters():
+    assert response_key("m", "p", 0, None, 256) == response_key("m", "p", 0.0, None, 256.0)
+    assert response_key("m", "p", 0, 1, None) == response_key("m", "p", "0", "1.0", None)
+    assert response_key("m", "p", 0, None, 256) != response_key("m", "p", 0, None, 257)
+
+
+def test_cache_hits_across_equal_temperatures(tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "llm_cache.db"))
+    cache.put("m", "prompt", "answer", temperature=0)
+    assert cache.get("m", "prompt", temperature=0.0) == "answer"
+    assert cache.get("m", "prompt", temperature=0.7) is None
+    cache.close()
@@ -0,0 +1,169 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import llm_starter_code
+from llm_starter_code import TokenBucket, aget_response, gather_responses
+
+
+class StubServer:
+    """OpenAI-compatible /chat/completions stub that answers with a scripted status sequence."""
+
+    def __init__(self, statuses=()):
+        self.statuses = list(statuses)
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                stub.requests.append((time.monotonic(), self.path, body))
+                status = stub.statuses.pop(0) if stub.statuses else 200
+                if status == 200:
+                    payload = {"id": "stub", "object": "chat.completion", "created": 0, "model": body["model"],
+                               "choices": [{"index": 0, "finish_reason": "stop",
+                                            "message": {"role": "assistant", "content": f"echo: {body['messages'][0]['content']}"}}]}
+                else:
+                    payload = {"error": {"message": f"status {status}", "type": "stub", "code": status}}
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    server = StubServer()
+    monkeypatch.setenv("GEMINI_API_BASE_URL", server.url)
+    monkeypatch.setattr(llm_starter_code, "_buckets", {})
+    yield server
+    server.close()
+
+
+def _run(coro):
+    async def run():
+        try:
+            return await coro
+        finally:
+            client = llm_starter_code._async_clients.pop(asyncio.get_running_loop(), None)
+            if client is not None:
+                await client.close()
+    return asyncio.run(run())
+
+
+def test_aget_response_retries_server_errors_and_rate_limits(stub):
+    stub.statuses = [500, 429]
+    result = _run(aget_response("stub-model", "hello", logging=False, cache=False, base_delay=0.01))
+
+    assert result == "echo: hello"
+    assert len(stub.requests) == 3
+    assert all(path == "/v1/chat/completions" for _, path, _ in stub.requests)
+
+
+def test_aget_response_gives_up_after_retries(stub):
+    stub.statuses = [503] * 3
+    result = _run(aget_response("stub-model", "hello", logging=False, cache=False, retries=3, base_delay=0.01))
+
+    assert result.startswith("ERROR: Failed after 3 retries")
+    assert len(stub.requests) == 3
+
+
+def test_gather_responses_keeps_order_and_respects_the_rate_limit(stub):
+    llm_starter_code._buckets["stub-model"] = TokenBucket(rate=20.0, capacity=1.0)
+    requests = [{"model_name": "stub-model", "prompt": f"p{i}"} for i in range(6)]
+    results = _run(gather_responses(requests, logging=False, cache=False))
+
+    assert results == [f"echo: p{i}" for i in range(6)]
+    times = sorted(t for t, _, _ in stub.requests)
+    # one token up front, then one every 1/20 s
+    assert times[-1] - times[0] >= 5 * 0.05 * 0.8
+
+
+def test_token_bucket_allows_a_burst_then_spaces_calls():
+    async def acquire_all(bucket, n):
+        start = time.monotonic()
+        for _ in range(n):
+            await bucket.acquire()
+        return time.monotonic() - start
+
+    assert asyncio.run(acquire_all(TokenBucket(rate=10.0, capacity=5.0), 5)) < 0.05
+    assert asyncio.run(acquire_all(TokenBucket(rate=10.0, capacity=1.0), 4)) >= 0.3 * 0.8
+
+
+def test_aget_response_uses_the_cache_off_the_event_loop(stub, monkeypatch, tmp_path):
+    from llm_cache import LLMResponseCache
+
+    threads = []
+
+    class RecordingCache(LLMResponseCache):
+        def get(self, *args, **kwargs):
+            threads.append(threading.current_thread())
+            return super().get(*args, **kwargs)
+
+        def put(self, *args, **kwargs):
+            threads.append(threading.current_thread())
+            return super().put(*args, **kwargs)
+
+    monkeypatch.setattr(llm_starter_code, "LLM_CACHE_ENABLED", True)
+    monkeypatch.setattr(llm_starter_code, "_response_cache", RecordingCache(str(tmp_path / "llm_cache.db")))
+    first = _run(aget_response("stub-model", "hello", temperature=0, logging=False))
+    second = _run(aget_response("stub-model", "hello", temperature=0.0, logging=False))
+
+    assert first == second == "echo: hello"
+    assert len(stub.requests) == 1
+    assert len(threads) == 3 and threading.main_thread() not in threads
+
+
+class FailingPutCache:
+    def __init__(self):
+        self.puts = 0
+
+    def get(self, *args, **kwargs):
+        return None
+
+    def put(self, *args, **kwargs):
+        self.puts += 1
+        raise OSError("disk full")
+
+
+def test_cache_write_failure_keeps_the_response(stub, monkeypatch):
+    monkeypatch.setattr(llm_starter_code.client, "base_url", stub.url)
+    monkeypatch.setattr(llm_starter_code, "LLM_CACHE_ENABLED", True)
+    failing = FailingPutCache()
+    monkeypatch.setattr(llm_starter_code, "_response_cache", failing)
+
+    assert llm_starter_code.get_response("stub-model", "sync", temperature=0, logging=False) == "echo: sync"
+    assert _run(aget_response("stub-model", "async", temperature=0, logging=False)) == "echo: async"
+    # one request each: the failed cache write was not treated as an API error and retried
+    assert len(stub.requests) == 2
+    assert failing.puts == 2
+
+
+def test_non_deterministic_calls_skip_the_cache(stub, monkeypatch):
+    monkeypatch.setattr(llm_starter_code.client, "base_url", stub.url)
+    monkeypatch.setattr(llm_starter_code, "LLM_CACHE_ENABLED", True)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("cache built for a non-deterministic call")
+
+    monkeypatch.setattr(llm_starter_code, "get_response_cache", fail)
+
+    assert llm_starter_code.get_response("stub-model", "sync", temperature=0.7, logging=False) == "echo: sync"
+    assert _run(aget_response("stub-model", "async", logging=False)) == "echo: async"
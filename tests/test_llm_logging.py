@@ -0,0 +1,85 @@
+import json
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+
+from llm_logging import LogStore, query_logged_responses, read_logged_responses, tail_logged_responses
+
+T0 = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def _entry(i, model="m"):
+    return {"timestamp": (T0 + timedelta(seconds=i)).isoformat() + "Z", "model": model, "prompt": f"p{i}"}
+
+
+def _flushers():
+    return [t for t in threading.enumerate() if t.name == "log-flusher"]
+
+
+def _write_log(path, n, rotate_at=None):
+    store = LogStore(str(path), flush_every=1000, flush_interval=3600)
+    for i in range(n):
+        store.append(_entry(i, model="a" if i % 2 else "b"))
+        if i == rotate_at:
+            store.rotate()
+    store.close()
+
+
+def test_reads_do_not_write_to_disk(tmp_path):
+    path = tmp_path / "history.jsonl"
+    _write_log(path, 10, rotate_at=3)
+    before = sorted(os.listdir(tmp_path))
+    flushers = len(_flushers())
+
+    assert [e["prompt"] for e in read_logged_responses(str(path))] == [f"p{i}" for i in range(10)]
+    assert [e["prompt"] for e in tail_logged_responses(str(path), n=3)] == ["p7", "p8", "p9"]
+    assert [e["prompt"] for e in tail_logged_responses(str(path), n=2, model="b")] == ["p6", "p8"]
+    start = (T0 + timedelta(seconds=2)).timestamp()
+    assert [e["prompt"] for e in query_logged_responses(str(path), start=start, limit=3)] == ["p2", "p3", "p4"]
+
+    assert sorted(os.listdir(tmp_path)) == before
+    assert len(_flushers()) == flushers
+
+
+def test_read_only_sees_lines_the_index_has_not_caught_up_with(tmp_path):
+    path = tmp_path / "history.jsonl"
+    _write_log(path, 4)
+    with open(path, "a", encoding="utf-8") as fh:
+        for i in (4, 5):
+            fh.write(json.dumps(_entry(i, model="c")) + "\n")
+    before = sorted(os.listdir(tmp_path))
+
+    assert [e["prompt"] for e in tail_logged_responses(str(path), n=3)] == ["p3", "p4", "p5"]
+    assert [e["prompt"] for e in query_logged_responses(str(path), model="c")] == ["p4", "p5"]
+    assert sorted(os.listdir(tmp_path)) == before
+
+
+def test_plain_jsonl_without_an_index(tmp_path):
+    path = tmp_path / "history.jsonl"
+    path.write_text("".join(json.dumps(_entry(i)) + "\n" for i in range(3)), encoding="utf-8")
+
+    assert [e["prompt"] for e in tail_logged_responses(str(path), n=2)] == ["p1", "p2"]
+    assert len(read_logged_responses(str(path))) == 3
+    assert os.listdir(tmp_path) == ["history.jsonl"]
+
+
+def test_rotated_and_gzipped_segments_stay_queryable(tmp_path):
+    path = tmp_path / "history.jsonl"
+    # flush every 4 records and rotate once the active segment passes 300 bytes
+    store = LogStore(str(path), flush_every=4, flush_interval=3600, max_bytes=300, max_age_seconds=None)
+    for i in range(40):
+        store.append(_entry(i, model="a" if i % 2 else "b"))
+    store.close()
+
+    files = os.listdir(tmp_path)
+    assert sum(name.endswith(".jsonl.gz") for name in files) >= 3
+    assert not any(name.endswith(".jsonl") and name != "history.jsonl" for name in files)
+
+    store = LogStore(str(path), read_only=True)
+    assert len(store.segments()) >= 4 and store.segments()[-1] == "history.jsonl"
+    assert [e["prompt"] for e in store.stream()] == [f"p{i}" for i in range(40)]
+    assert [e["prompt"] for e in store.tail(5)] == [f"p{i}" for i in range(35, 40)]
+    assert [e["prompt"] for e in store.tail(3, model="b")] == ["p34", "p36", "p38"]
+    start, end = (T0 + timedelta(seconds=5)).timestamp(), (T0 + timedelta(seconds=25)).timestamp()
+    assert [e["prompt"] for e in store.query(start=start, end=end, model="a")] == [f"p{i}" for i in range(5, 25, 2)]
+    store.close()
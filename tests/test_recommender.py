@@ -0,0 +1,103 @@
+import faiss
+import numpy as np
+import pytest
+
+import index
+import recommender
+from database import JobSkill, Posting, Skill
+
+# the p99 latency budget for re-ranking these is checked by `python benchmark.py rerank`,
+# which exits non-zero when it is exceeded; timing assertions here would be flaky on CI
+RERANK_K = 200
+
+
+@pytest.fixture
+def candidates(fresh_db):
+    rng = np.random.default_rng(0)
+    levels = list(recommender.EXPERIENCE_LEVELS)
+    cities = ["Princeton, NJ", "Newark, NJ", "Austin, TX", "Seattle, WA"]
+    postings = [{
+        "id": i, "job_id": str(1000 + i), "title": f"Job {i}",
+        "normalized_salary": float(rng.integers(30_000, 200_000)) if i % 7 else None,
+        "formatted_experience_level": levels[i % len(levels)].title(),
+        "remote_allowed": "1" if i % 3 == 0 else None,
+        "location": cities[i % len(cities)],
+    } for i in range(1, RERANK_K + 1)]
+    skills = [{"skill_abr": abr, "skill_name": name} for abr, name in
+              [("IT", "Information Technology"), ("SALE", "Sales"), ("MRKT", "Marketing"), ("ENG", "Engineering")]]
+    job_skills = [{"job_id": str(1000 + i), "skill_abr": skills[j]["skill_abr"]}
+                  for i in range(1, RERANK_K + 1) for j in range(4) if (i + j) % 3 == 0]
+    with fresh_db.engine.begin() as conn:
+        conn.execute(Posting.__table__.insert(), postings)
+        conn.execute(Skill.__table__.insert(), skills)
+        conn.execute(JobSkill.__table__.insert(), job_skills)
+    recommender._skill_table = None
+    yield np.arange(1, RERANK_K + 1, dtype=np.int64)
+    recommender._skill_table = None
+
+
+def test_phase2_rerank_orders_every_candidate(candidates):
+    similarity = np.random.default_rng(1).random(len(candidates))
+    preferences = {"target_salary": 90_000, "experience_level": "Entry level", "remote": True,
+                   "location": "Princeton, NJ", "skills": ["IT", "SALE", "MRKT"]}
+    scores, ids = recommender.phase2_recommend("", candidates, similarity, preferences)
+
+    assert sorted(ids.tolist()) == candidates.tolist()
+    assert np.all(np.diff(scores) <= 0)
+
+
+def test_similarity_is_clipped_before_blending():
+    block = {"job_id": np.array([1, 2, 3])}
+    scores = recommender.score_candidates(block, [-0.4, 0.5, 1.7], preferences={})
+    assert scores.tolist() == [0.0, 0.5, 1.0]
+
+
+def test_search_faiss_normalizes_queries(tmp_path):
+    vectors = np.random.default_rng(0).standard_normal((50, 8)).astype("float32")
+    faiss.normalize_L2(vectors)
+    flat = faiss.IndexIDMap(faiss.IndexFlatIP(8))
+    flat.add_with_ids(vectors, np.arange(1, 51))
+    path = str(tmp_path / "faiss.index")
+    index.write_index_atomic(flat, path)
+    index.get_index_manager(path)
+
+    query = vectors[9] * 7.5  # same direction, not unit length
+    scores, ids = index.search_faiss(query, k=3)
+    assert ids[0, 0] == 10 and scores[0, 0] == pytest.approx(1.0, abs=1e-5)
+    assert np.all(scores <= 1.0 + 1e-5)
+    assert np.linalg.norm(query) > 7  # the caller's vector is left as is
+
+    batch_scores, batch_ids = index.search_faiss_batch(np.vstack([query, -query]), k=3)
+    assert batch_ids[0, 0] == 10 and batch_scores[0, 0] == pytest.approx(1.0, abs=1e-5)
+    assert np.all(batch_scores >= -1.0 - 1e-5)
+
+
+def test_batch_search_and_recommend_many_match_single_queries(tmp_path, monkeypatch):
+    vectors = np.random.default_rng(0).standard_normal((40, 8)).astype("float32")
+    faiss.normalize_L2(vectors)
+    flat = faiss.IndexIDMap(faiss.IndexFlatIP(8))
+    flat.add_with_ids(vectors, np.arange(1, 41))
+    path = str(tmp_path / "faiss.index")
+    index.write_index_atomic(flat, path)
+    index.get_index_manager(path)
+
+    queries = np.random.default_rng(1).standard_normal((7, 8)).astype("float32")
+    batch_scores, batch_ids = index.search_faiss_batch(queries, k=5)
+    for query, row_scores, row_ids in zip(queries, batch_scores, batch_ids):
+        scores, ids = index.search_faiss(query, k=5)
+        assert row_ids.tolist() == ids[0].tolist()
+        np.testing.assert_allclose(row_scores, scores[0], rtol=1e-5)
+
+    # resumes are embedded to their query vector; more resumes than one batch, k above ntotal
+    resumes = [f"resume {i}" for i in range(len(queries))]
+    embedded = {resume: query for resume, query in zip(resumes, queries)}
+    monkeypatch.setattr(recommender, "embed_resume", lambda resume: embedded[resume])
+    monkeypatch.setattr(recommender, "embed_resumes", lambda batch: [embedded[r] for r in batch])
+    results = recommender.recommend_many(resumes, k=50, batch_size=3, hybrid=False)
+
+    assert len(results) == len(resumes)
+    for resume, (scores, ids) in zip(resumes, results):
+        single_scores, single_ids = recommender.phase1_recommend(resume, k=50, hybrid=False)
+        keep = single_ids[0] != -1
+        assert len(ids) == 40 and ids.tolist() == single_ids[0][keep].tolist()
+        np.testing.assert_allclose(scores, single_scores[0][keep], rtol=1e-5)
@@ -0,0 +1,28 @@
+from sqlalchemy import inspect, text
+
+
+def test_init_db_migrates_text_embeddings(fresh_db):
+    database = fresh_db
+    database.Base.metadata.drop_all(database.engine)
+    # a postings table from before embeddings were stored as float32 bytes
+    with database.engine.begin() as conn:
+        conn.execute(text("CREATE TABLE postings (id INTEGER PRIMARY KEY, job_id VARCHAR UNIQUE, title VARCHAR, "
+                          "description TEXT, skills_desc TEXT, embedding TEXT)"))
+        conn.execute(text("INSERT INTO postings (id, job_id, title, embedding) VALUES "
+                          "(1, 'a', 'Old', 'embedding_placeholder'), (2, 'b', 'New', NULL)"))
+
+    database.init_db()
+
+    columns = {c["name"] for c in inspect(database.engine).get_columns("postings")}
+    assert {"embedding_dim", "embedding_model"} <= columns
+    with database.engine.connect() as conn:
+        assert conn.execute(text("SELECT embedding FROM postings WHERE id = 1")).scalar() is None
+    ids, embeddings = database.load_embedding_matrix()
+    assert len(ids) == 0
+
+    with database.engine.begin() as conn:
+        conn.execute(database.Posting.__table__.update().where(database.Posting.id == 2).values(
+            embedding=database.encode_embedding([1.0, 2.0]), embedding_dim=2))
+    database.init_db()  # idempotent; blob embeddings are kept
+    ids, embeddings = database.load_embedding_matrix()
+    assert ids.tolist() == [2] and embeddings.tolist() == [[1.0, 2.0]]
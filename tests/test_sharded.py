@@ -0,0 +1,100 @@
+import faiss
+import numpy as np
+import pytest
+
+import index
+from embedding_store import EmbeddingStore
+
+K = 10
+
+
+def _vectors(n, dim=16, seed=0):
+    vectors = np.random.default_rng(seed).standard_normal((n, dim)).astype("float32")
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+@pytest.fixture(scope="module")
+def store(tmp_path_factory):
+    tmp = tmp_path_factory.mktemp("sharded")
+    rng = np.random.default_rng(0)
+    ids = rng.permutation(np.arange(1, 9001))[:3000]  # shuffled, gapped posting ids
+    store = EmbeddingStore(str(tmp / "embeddings"))
+    store.append(ids, _vectors(len(ids)))
+    redo = rng.choice(len(ids), size=30, replace=False)
+    store.append(ids[redo], _vectors(len(redo), seed=1))  # re-embedded; only the latest copy counts
+    return store
+
+
+def _build(store, tmp_path, num_shards):
+    path = str(tmp_path / f"sharded{num_shards}.index")
+    manifest = index.init_sharded_faiss_index(num_shards, store=store, path=path, index_type="flat")
+    return path, manifest
+
+
+def test_sharded_search_matches_single_shard(store, tmp_path):
+    queries = _vectors(50, seed=2)
+    one_path, one = _build(store, tmp_path, 1)
+    four_path, four = _build(store, tmp_path, 4)
+
+    assert len(one["shards"]) == 1 and len(four["shards"]) == 4
+    assert sum(s["count"] for s in four["shards"]) == one["shards"][0]["count"] == 3000
+    single, sharded = index.ShardedIndex(one_path), index.ShardedIndex(four_path)
+    try:
+        expected_scores, expected_ids = single.search(queries, K)
+        got_scores, got_ids = sharded.search(queries, K)
+    finally:
+        single.close()
+        sharded.close()
+
+    np.testing.assert_array_equal(got_ids, expected_ids)
+    np.testing.assert_allclose(got_scores, expected_scores, rtol=0, atol=1e-6)
+
+
+def test_sharded_search_matches_the_unsharded_index(store, fresh_db, tmp_path):
+    queries = _vectors(50, seed=3)
+    flat_path = str(tmp_path / "flat.index")
+    index.init_faiss_index(store=store, path=flat_path, index_type="flat")
+    sharded_path, _ = _build(store, tmp_path, 3)
+
+    expected_scores, expected_ids = faiss.read_index(flat_path).search(queries, K)
+    got_scores, got_ids = index.search_faiss_sharded(queries * 2.0, k=K, path=sharded_path)
+
+    np.testing.assert_array_equal(got_ids, expected_ids)
+    np.testing.assert_allclose(got_scores, expected_scores, rtol=0, atol=1e-5)
+
+
+def test_merge_topk_skips_padding():
+    a = (np.array([[0.9, 0.5, -3.4e38]], dtype=np.float32), np.array([[1, 2, -1]]))
+    b = (np.array([[0.7, -3.4e38, -3.4e38]], dtype=np.float32), np.array([[3, -1, -1]]))
+    scores, ids = index.merge_topk([a, b], 4)
+    assert ids.tolist() == [[1, 3, 2, -1]]
+    assert scores[0, :3].tolist() == pytest.approx([0.9, 0.7, 0.5])
+
+
+def test_reloading_shuts_down_the_previous_thread_pool(store, tmp_path):
+    import os
+    import threading
+
+    path, _ = _build(store, tmp_path, 2)
+    queries = _vectors(5, seed=4)
+    first = index.get_sharded_index(path)
+    first.search(queries, K)
+    threads = threading.active_count()
+
+    replaced = [first]
+    for i in range(5):
+        stat = os.stat(index.shard_manifest_path(path))
+        os.utime(index.shard_manifest_path(path), ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000 * (i + 1)))
+        current = index.get_sharded_index(path)
+        assert current is not replaced[-1]
+        current.search(queries, K)
+        replaced.append(current)
+
+    for old in replaced[:-1]:
+        old._pool.shutdown(wait=True)  # already shut down; wait for its workers to exit
+        assert old._pool._shutdown
+        # a search that raced with the reload still completes
+        assert old.search(queries, K)[1].shape == (5, K)
+    assert threading.active_count() <= threads
+    replaced[-1].close()